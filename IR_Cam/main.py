@@ -1,6 +1,7 @@
 import utime as time
 from machine import Pin, I2C
 from mlx90640.mlx_cam import MLX_Cam
+from mlx90640.bustune import tune, print_report
 
 # The test code sets up the sensor, then grabs and shows an image in a terminal
 # every ten and a half seconds or so.
@@ -15,12 +16,20 @@ if __name__ == "__main__":
     # Oops, it's not an STM32; assume generic machine.I2C for ESP32 and others
     except ImportError:
         # For ESP32 38-pin cheapo board from NodeMCU, KeeYees, etc.
+        stm32 = False
         i2c_bus = I2C(1, scl=Pin(22), sda=Pin(21))
 
     # OK, we do have an STM32, so just use the default pin assignments for I2C1
     else:
+        stm32 = True
         i2c_bus = I2C(1)
 
+    # Make a bus on the same pins at another clock, for the bus tuner
+    def make_bus(freq):
+        if stm32:
+            return I2C(1, freq=freq)
+        return I2C(1, scl=Pin(22), sda=Pin(21), freq=freq)
+
     print("MXL90640 Easy(ish) Driver Test")
 
     # Select MLX90640 camera I2C address, normally 0x33, and check the bus
@@ -33,7 +42,23 @@ if __name__ == "__main__":
 
     while True:
         try:
-            input1 = input("Enter 1 to take a picture: ")
+            input1 = input("Enter 1 to take a picture, 2 to tune the bus, "
+                           "3 for live preview: ")
+            if input1 == '3':
+                # Show images as fast as they come until Ctrl-C is pressed
+                try:
+                    while True:
+                        # no waiting dots, they'd be drawn over the preview
+                        image = camera.get_image(quiet=True)
+                        camera.live_preview(image.pix)
+                except KeyboardInterrupt:
+                    pass
+            if input1 == '2':
+                # Find the fastest reliable bus clock; pin the result in main.py
+                profile = tune(make_bus, i2c_address)
+                print_report(profile)
+                i2c_bus = profile.bus
+                camera = MLX_Cam(i2c_bus)
             if input1 == '1':
                 # Get and image and see how long it takes to grab that image
                 print("Click.", end='')
@@ -14,10 +14,11 @@
     This program defines four tasks, two of which control the movement of the pitch and yaw motors. The program
     begins once the user button on the microcontroller is pressed. The system then begins its first task, which
     turns the gun around by 180 degrees. The system then waits for 5 seconds and moves to the next task. The next task
-    uses the image produced by the IR camera to obtain the coordinates of the target (hottest pixel). These
-    coordinates are then converted to ticks using simple geometry and other calculations, and are set as the motors'
-    new setpoints. The motors then run until they reach the range of that setpoint. Once both motors are in position,
-    the final task is triggered, which fires the NERF gun.
+    uses the image produced by the IR camera to obtain the coordinates of the target (the peak of the largest warm
+    blob, or the hottest spot if no blob is warm enough). These coordinates are then converted to ticks using simple
+    geometry and other calculations, and are set as the motors' new setpoints. The motors then run until they reach
+    the range of that setpoint. Once both motors are in position, the final task is triggered, which fires the NERF
+    gun.
 
 
 @author Ben Elkayam
@@ -45,8 +46,7 @@
 import pyb
 import gc
 import utime as time
-from machine import Pin, I2C
-from math import atan, pi
+from machine import Pin, I2C, idle
 
 import task.cotask as cotask
 import task.task_share as task_share
@@ -54,10 +54,43 @@ from motor.encoder_reader import Encoder
 from motor.motor_driver import MotorDriver
 from motor.controller import Controller
 from mlx90640.mlx_cam import MLX_Cam
+from mlx90640.targeting import refine_hotspot
+from mlx90640.blobs import BlobDetector
+from mlx90640.background import BackgroundModel
+from mlx90640.tracker import Tracker
+from mlx90640.aiming import (observe, setpoints, AIM_LEAD_MS, AIM_MIN_UPDATES,
+                             AIM_MAX_IMAGES, TRACKER_GATE)
 
 NUM_PIXELS_COL = 32
 NUM_PIXELS_ROW = 24
 
+## I2C bus clock in Hz for the camera, as found by @c mlx90640.bustune, or
+#  @c None to use the default clock
+I2C_FREQ = None
+
+## Whether to turn the camera's FM+ I2C mode on or off, as found by
+#  @c mlx90640.bustune along with @c I2C_FREQ, or @c None to leave the
+#  camera's setting alone; it must be @c True for clocks above 400 kHz
+I2C_FMPLUS = None
+
+## Whether to time the camera readout and targeting at start-up and set the
+#  fastest refresh rate they keep up with, see @c MLX_Cam.auto_configure()
+CAMERA_AUTO_CONFIG = True
+
+## Rate in Hz at which the motor controllers are run, and the hardware timer
+#  which runs them
+CONTROL_HZ = 50
+CONTROL_TIMER = 6
+
+## Bits of the drive share, which tell the control timer task which motors
+#  to run
+DRIVE_PITCH = 1
+DRIVE_YAW = 2
+
+## File to record every camera image in, for replay on a PC with the tools in
+#  the repository's @c tools directory, or @c None not to record
+FRAME_LOG = None
+
 def button_press(pin):
     """!
     @brief      This is the callback function that is called when the interrupt
@@ -87,7 +120,8 @@ def move_pitch_motor(shares):
     @brief      This task moves the pitch motor until it reaches its setpoint.
     @details    This task has 2 states: IDLE (S0) and MOVING (S1). When this task is
                 in S0, the pitch motor is idle. When this task is in S1, the pitch
-                motor continuously runs and checks its position against its setpoint.
+                motor is run by the control_motors timer task while this task checks
+                its position against its setpoint.
                 When the position is within 10000 ticks of its setpoint, it checks
                 if the yaw motor has reached its position. If my_queue has any items
                 in it, then the yaw motor has reached its position and the system 
@@ -101,30 +135,31 @@ def move_pitch_motor(shares):
     while 1:
         if my_share.get() == 3: # MOVE STATE (S1)
             while 1:
-                controller1.run()
 #                 print(f"p_p: {controller1.encoder.position}, sp_p: {controller1.setpoint}")
 
                 if controller1.encoder.position in\
                  range(controller1.setpoint - 10000, controller1.setpoint + 10000):
                     print("reached pitch")
                     if my_queue.any():
+                        drive.put(0)
                         my_share.put(4)
                         break
-                yield
-            yield
+                yield 1
+            yield 0
         else: # IDLE STATE (S0)
-            yield
+            # sleep until the state changes
+            yield my_share
 
 def move_yaw_motor(shares):
     """!
     @brief      This task moves the yaw motor until it reaches its setpoint.
     @details    This task has 3 states: IDLE (S0), MOVING (S1), and 180 TURN (S2).
                 When this task is in S0, the yaw motor is idle. When this task is
-                in S1, the yaw motor continuously runs and checks its position
-                against its setpoint. When the position is within 100 ticks of its
-                setpoint, it puts 1 in my_queue, which lets the pitch motor know that
-                it has reached its position. When this task is in S2, a timer
-                starts and then the yaw motor runs until it has completed a 180 deg
+                in S1, the yaw motor is run by the control_motors timer task while
+                this task checks its position against its setpoint. When the position
+                is within 100 ticks of its setpoint, it puts 1 in my_queue, which lets
+                the pitch motor know that it has reached its position. When this task
+                is in S2, a timer starts and then the yaw motor runs until it has completed a 180 deg
                 turn. Once 5 seconds have past, the system transitions to the next task
                 (getting the coordinates for the hotspot from the IR Cam input)
     @param      shares A tuple of two shares, one for `my_share` and one for `my_queue`.
@@ -136,45 +171,87 @@ def move_yaw_motor(shares):
     while 1:
         if my_share.get() == 3: # MOVE STATE (S1)
             while 1:
-                controller2.run()
 #                 print(f"p_y: {controller2.encoder.position}, sp_y: {controller2.setpoint}")
 
                 if controller2.encoder.position in\
                  range(controller2.setpoint - 100, controller2.setpoint + 100):
                     print("reached yaw")
+                    drive.put(drive.get() & ~DRIVE_YAW)
                     if not my_queue.any():
                         my_queue.put(1)
                     break
-                yield
-            yield
+                yield 1
+            yield 0
         elif my_share.get() == 1: # 180 TURN STATE (S2)
             ## Start timer
             timer = time.ticks_ms()
+            drive.put(DRIVE_YAW)
             while 1:
-                controller2.run()
                 # Completes 180 deg turn
                 if controller2.encoder.position in range(29650, 30350):
 #                     print(f"timer = {timer}, {time.ticks_ms()}")
                     if time.ticks_diff(time.ticks_ms(), timer) >= 5000:
                         print("done with delay")
+                        # stop the control task driving the motor before
+                        # it's zeroed and turned off
+                        drive.put(0)
+                        my_share.put(2)
                         controller2.encoder.zero()
+                        tracker.reset()
                         motor2.set_duty_cycle(0)
-                        my_share.put(2)
                         break
-                yield
-            yield
+                yield 2
+            yield 0
         else: # IDLE STATE (S0)
-            yield
+            # sleep until the state changes
+            yield my_share
+
+def control_motors(shares):
+    """!
+    @brief      This timer task runs the motor controllers.
+    @details    This task is run CONTROL_HZ times a second by a hardware timer
+                rather than by the scheduler, so the motors are controlled on
+                time even while get_coordinates waits for the camera or
+                fire_round holds the trigger. The motors it runs are given by
+                the bits of the drive share, which only the cooperative tasks
+                write: both in the MOVE state until the yaw motor has reached
+                its setpoint, then only the pitch motor, and only the yaw motor
+                in the 180 TURN state. While the system is paused, the motors
+                are left alone. This task doesn't read share0 or q0; it runs
+                between any two bytecodes of the other tasks, even in the
+                middle of a put() with interrupts off, so it only reads the
+                drive share and button_count, each a single value which is read
+                in one step. Each run must be short, as it holds up everything
+                else.
+    @param      shares A tuple holding the drive share.
+    @return     None
+    """
+    # Get a reference to the share which has been passed to this task
+    drive, = shares
+
+    while 1:
+        bits = drive.get() if button_count else 0
+        if bits & DRIVE_PITCH:
+            controller1.run()
+        if bits & DRIVE_YAW:
+            controller2.run()
+        yield
 
 def get_coordinates(shares):
     """!
     @brief      Get the coordinates of the maximum value in the camera image.
     @details    This task has 2 states: IDLE (S0) and GET COORDINATES (S1).
                 When this task is in S0, the task does nothing. When this task
-                is in S1, this task retrieves the camera image, processes it, and calculates
-                the coordinates of the pixel with the maximum value. It then converts
-                these coordinates to distance and ticks, and sends them to the pitch and yaw
-                motor controllers. Once those values are sent, the transitions to the
+                is in S1, this task retrieves camera images (yielding to the other
+                tasks while the camera has no new data) and finds the warm blobs
+                in the raw pixel data, preferring blobs which moved since the last
+                image. The coordinates of the hottest spot of the
+                largest blob (or of the whole image, if that blob is too cold)
+                are refined to a fraction of a pixel, converted to encoder ticks
+                and given to the tracker. Once the tracker has seen the target in
+                AIM_MIN_UPDATES images (or AIM_MAX_IMAGES have been taken), it
+                predicts where the target will be once the motors get there, and
+                sends that to the pitch and yaw motor controllers. Once those values are sent, the transitions to the
                 next task (move motors).
     @param      shares A tuple of two shares, one for `my_share` and one for `my_queue`.
     @return     None
@@ -184,48 +261,55 @@ def get_coordinates(shares):
 
     while 1:
         if my_share.get() == 2: # GET COORDINATES STATE (S1)
-            max_val, max_row, max_col = 0, 0, 0
-            row, col = 1, 1
-
-            image = camera.get_image()
-#             camera.ascii_image(image.pix)
-            pix = camera.get_csv(image.pix, limits=(0, 99))
-            next(pix)
-        #     print(f"MAX: {max_val}")
-
-            while row < (NUM_PIXELS_ROW - 2):
-        #         print(f"MAX: {max_val}") 
-                line = next(pix).split(",")
-        #         print(line)
-                while col < (NUM_PIXELS_COL - 1):
-                    if int(line[col]) > max_val:
-                        avg = (int(line[col - 1]) + int(line[col]) + int(line[col + 1])) / 3
-                        if avg > max_val:
-#                             print(f"updated at {row}, {col} to value {avg}")
-                            max_val = avg
-                            max_row = row
-                            max_col = col
-                    col += 1
-                row += 1
-                col = 1
-#             print(f"val: {max_val}, row: {max_row}, col: {max_col}")
-
-            x_dist = (16 - max_col) * 2.8
-            y_dist = (12 - max_row) * 3.7
-#             print(f"x_dist: {x_dist}, y_dist: {y_dist}")
-            
-            x_ticks = int((atan(x_dist/180) * 60000) // (2 * pi)) + 320
-            y_ticks = int((atan(y_dist/180) * 528000) // (2 * pi))
-            
+            # the turret holds still while a few images are taken, so the
+            # tracker can see which way the target is moving
+            images = 0
+            background.reset()
+            while 1:
+                image = yield from camera.get_image_nonblocking()
+                # the time the image was taken and where the turret was
+                # pointing, before any of the processing below
+                now = time.ticks_ms()
+                position = (controller2.encoder.position,
+                            controller1.encoder.position)
+#                 camera.ascii_image(image.pix)
+                # aim at the peak of the largest warm blob, so a small hot
+                # object such as a lamp doesn't pull the turret away from a
+                # person, or at the hottest spot when no blob is warm enough;
+                # blobs which moved since the last image come first, so a
+                # heat source which stays put is passed over when something
+                # else moves
+                background.update(image.pix)
+                if not (background.fg_count and blobs.detect(
+                        image.pix, min(image.pix) + background.threshold,
+                        mask=background.mask)):
+                    blobs.detect(image.pix)
+                hotspot = blobs.target(image.pix)
+                # refine to a fraction of a pixel, in 1/SUBPIXEL_SCALE pixel
+                # units
+                max_row, max_col = refine_hotspot(image.pix, hotspot)
+#                 print(f"score: {hotspot.score}, row: {max_row}, col: {max_col}")
+                observe(tracker, max_row, max_col, now, position)
+                images += 1
+                if tracker.updates >= AIM_MIN_UPDATES or\
+                 images >= AIM_MAX_IMAGES:
+                    break
+
+            # aim where the target will be once the motors have moved rather
+            # than where it was; the setpoints are encoder positions, and the
+            # encoders aren't zeroed so that the tracker's ticks stay valid
+            x_ticks, y_ticks = setpoints(tracker, time.ticks_ms(), AIM_LEAD_MS)
+
 #             print(f"x: {x_ticks}, y: {y_ticks}")
-            controller1.encoder.zero()
-            controller2.encoder.zero()
             controller1.set_setpoint(y_ticks)
             controller2.set_setpoint(x_ticks)
+            # the control task may run the motors once they're set up
+            drive.put(DRIVE_PITCH | DRIVE_YAW)
             my_share.put(3)
             yield
         else: # IDLE STATE (S0)
-            yield
+            # sleep until the state changes
+            yield my_share
 
 def fire_round(shares):
     """!
@@ -256,7 +340,23 @@ def fire_round(shares):
             my_share.put(0)
             yield
         else: # IDLE STATE (S0)
-            yield
+            # sleep until the state changes
+            yield my_share
+
+def write_log():
+    """!
+    @brief      This task writes the camera's frame log to the file.
+    @details    The camera task only copies each image into the log's ring,
+                which takes no time; this task writes one waiting image per
+                run, so the file system never holds up the camera or the
+                motors for more than one write. It only runs when FRAME_LOG
+                is set.
+    @return     None
+    """
+    while 1:
+        if camera.log is not None:
+            camera.log.drain(1)
+        yield
 
 
 if __name__ == "__main__":
@@ -269,9 +369,16 @@ if __name__ == "__main__":
     ## Create pin for trigger fire
     trig_pin = Pin(Pin.board.PA4, Pin.OUT_PP)
 
-    ## Create a share to test function and diagnostic printouts
+    ## Create a share to test function and diagnostic printouts. Only the
+    #  cooperative tasks use it
     share0 = task_share.Share('h', thread_protect=False, name="Share 0")
 
+    ## Create a share holding the DRIVE_ bits of the motors which the control
+    #  timer task runs. The cooperative tasks write it and the timer task only
+    #  reads it; a put() or get() is a single store or load of one byte, so it
+    #  needs no protection
+    drive = task_share.Share('B', thread_protect=False, name="Drive")
+
     ## Create a queue to test function and diagnostic printouts
     q0 = task_share.Queue('h', 16, thread_protect=False, overwrite=False,
                           name="Queue 0")
@@ -288,7 +395,10 @@ if __name__ == "__main__":
 
     # OK, we do have an STM32, so just use the default pin assignments for I2C1
     else:
-        i2c_bus = I2C(1)
+        # the camera only takes FM+ clocks once it has been told to, so start
+        # at 400 kHz and speed up once the camera has been set up
+        i2c_bus = (I2C(1) if I2C_FREQ is None
+                   else I2C(1, freq=min(I2C_FREQ, 400000)))
 
     ## Select MLX90640 camera I2C address, normally 0x33, and check the bus
     i2c_address = 0x33
@@ -296,7 +406,33 @@ if __name__ == "__main__":
 #     print(f"I2C Scan: {scanhex}")
 
     ## Create the camera object and set it up in default mode
-    camera = MLX_Cam(i2c_bus)
+    camera = MLX_Cam(i2c_bus, fmplus=I2C_FMPLUS)
+    if I2C_FMPLUS and I2C_FREQ is not None and I2C_FREQ > 400000:
+        # on an STM32, I2C(1) gives back the same bus object the camera has,
+        # now at the faster clock
+        i2c_bus = I2C(1, freq=I2C_FREQ)
+
+    ## Blob detector which picks the target out of the camera image
+    blobs = BlobDetector()
+
+    ## Background model which tells warm blobs that move from ones that stay
+    #  put, learned afresh each time the turret holds still to aim
+    background = BackgroundModel()
+
+    ## Tracker which predicts where the target is going, in encoder ticks
+    #  (yaw, pitch)
+    tracker = Tracker(gate=TRACKER_GATE)
+
+    if CAMERA_AUTO_CONFIG:
+        # the targeting steps are timed along with the readout, as each
+        # image has to go through them before the next one is ready
+        def find_target(raw):
+            blobs.detect(raw.pix)
+            refine_hotspot(raw.pix, blobs.target(raw.pix))
+
+        profile = camera.auto_configure(find_target)
+        print(f"Camera at {profile.freq} Hz, {16 + profile.adc_resolution} bit"
+              f" ADC, {round(profile.load * 100)}% busy")
 
     ## Create motor 1 object (pitch)
     motor1 = MotorDriver(Pin.board.PC1, Pin.board.PA0, Pin.board.PA1, 5)
@@ -312,6 +448,10 @@ if __name__ == "__main__":
     ## Create encoder 2 object (yaw)
     encoder2 = Encoder(Pin.board.PB6, Pin.board.PB7, 4)
 
+    if FRAME_LOG is not None:
+        camera.start_log(FRAME_LOG,
+                         positions=lambda: (encoder2.position, encoder1.position))
+
     ## Once motor, encoder and params are collected they are used to create this controller 1 object (pitch)
     controller1 = Controller(kp1, sp1, motor1, encoder1)
 
@@ -328,22 +468,35 @@ if __name__ == "__main__":
     button_pin = pyb.ExtInt(Pin.board.PC13, pyb.ExtInt.IRQ_FALLING, Pin.PULL_UP, button_press)
 
 
-    # Create the tasks. If trace is enabled for any task, memory will be
-    # allocated for state transition tracing, and the application will run out
-    # of memory after a while and quit. Therefore, use tracing only for 
-    # debugging and set trace to False when it's not needed
+    ## Ring in which the tasks' state transitions are traced, interleaved.
+    #  It's allocated once and keeps the latest transitions, so tracing can
+    #  be left on while the turret runs
+    trace_ring = cotask.TraceRing(256)
+
+    # Create the tasks. The tasks run every 50 ms while active; while idle,
+    # they wait until share0 changes
     task1 = cotask.Task(move_pitch_motor, name="Task_1", priority=3, period=50,
-                        profile=True, trace=False, shares=(share0, q0))
+                        profile=True, trace=trace_ring, shares=(share0, q0))
     task2 = cotask.Task(move_yaw_motor, name="Task_2", priority=4, period=50,
-                        profile=True, trace=False, shares=(share0, q0))
+                        profile=True, trace=trace_ring, shares=(share0, q0))
     task3 = cotask.Task(get_coordinates, name="Task_3", priority=2, period=50,
-                        profile=True, trace=False, shares=(share0, q0))
+                        profile=True, trace=trace_ring, shares=(share0, q0))
     task4 = cotask.Task(fire_round, name="Task_4", priority=1, period=50,
-                        profile=True, trace=False, shares=(share0, q0))
+                        profile=True, trace=trace_ring, shares=(share0, q0))
+    ## The motor control task, run by a hardware timer
+    control = cotask.TimerTask(control_motors, timer=CONTROL_TIMER,
+                               freq=CONTROL_HZ, name="Control",
+                               profile=True, shares=(drive,))
     cotask.task_list.append(task1)
     cotask.task_list.append(task2)
     cotask.task_list.append(task3)
     cotask.task_list.append(task4)
+    cotask.task_list.append(control)
+    if FRAME_LOG is not None:
+        ## The frame log writer, the least urgent task
+        task5 = cotask.Task(write_log, name="Log", priority=0, period=200,
+                            profile=True, trace=trace_ring)
+        cotask.task_list.append(task5)
     
     # Put state number into shares. Initialized to state 1
     share0.put(1)
@@ -351,21 +504,29 @@ if __name__ == "__main__":
     # Run the memory garbage collector to ensure memory is as defragmented as
     # possible before the real-time scheduler is started
     gc.collect()
+    control.start()
 
-    # Run the scheduler with the chosen scheduling algorithm. Quit if ^C pressed
+    # Run the scheduler with the chosen scheduling algorithm. Quit if ^C pressed.
+    # The deadline scheduler sleeps until the next task is due, and while the
+    # system is paused we sleep until the button interrupt
     while True:
-        if button_count:
-            try:
-                cotask.task_list.pri_sched()
-            except KeyboardInterrupt:
-                motor1.set_duty_cycle(0)
-#                 print("motor 1 shut off")
-                motor2.set_duty_cycle(0)
-#                 print("motor 2 shut off")
-                break
+        try:
+            if button_count:
+                cotask.task_list.deadline_sched()
+            else:
+                idle()
+        except KeyboardInterrupt:
+            control.stop()
+            motor1.set_duty_cycle(0)
+#             print("motor 1 shut off")
+            motor2.set_duty_cycle(0)
+#             print("motor 2 shut off")
+            break
+
+    camera.stop_log()
 
     # Print a table of task data and a table of shared information data
     print('\n' + str (cotask.task_list))
     print(task_share.show_all())
-    print(task1.get_trace())
+    print(trace_ring.get_trace())
     print('')
@@ -11,6 +11,7 @@ from gc import collect, mem_free
 from ucollections import namedtuple
 from mlx90640.regmap import (
     REGISTER_MAP,
+    VOLATILE_REGISTERS,
     EEPROM_MAP,
     RegisterMap,
     CameraInterface,
@@ -18,7 +19,7 @@ from mlx90640.regmap import (
     EEPROM_ADDRESS,
     EEPROM_SIZE,
 )
-# from mlx90640.calibration import CameraCalibration, TEMP_K
+from mlx90640.calibration import TEMP_K
 from mlx90640.image import RawImage, Subpage, get_pattern_by_id
 
 
@@ -72,16 +73,22 @@ class MLX90640:
         """!
         """
         self.iface = CameraInterface(i2c, addr)
-        self.registers = RegisterMap(self.iface, REGISTER_MAP)
+        self.registers = RegisterMap(self.iface, REGISTER_MAP,
+                                     volatile=VOLATILE_REGISTERS)
         self.eeprom = RegisterMap(self.iface, EEPROM_MAP, readonly=True)
         self.calib = None
         self.raw = None
-#         self.image = None
+        self.image = None
         self.last_read = None
 
 
-    def setup(self, *, calib=None, raw=None, image=None):
+    def setup(self, *, calib=None, raw=None, image=None, calib_path=None,
+              fixed_point=False):
         """!
+        @param calib_path If given, the calibration is loaded from (or, the
+               first time, decoded and saved to) this file in flash
+        @param fixed_point If @c True, calibrated images are computed with
+               integer math only, in hundredths of a degree
         """
         # We've been having some memory allocation errors which usually happen
         # as this method runs. As a workaround, run gc.collect() several times
@@ -89,12 +96,28 @@ class MLX90640:
         # a bunch of free memory (~27KB or more on STM32L476) available
 #         collect()
 #         self.calib = calib or CameraCalibration(self.iface, self.eeprom)
+        if calib is not None:
+            self.calib = calib
+        elif calib_path is not None:
+            # imported here so the raw-only build doesn't pay for it
+            from mlx90640.calib_cache import load_or_decode
+            collect()
+            self.calib = load_or_decode(self.iface, self.eeprom, calib_path)
         collect()
 #         print(f"setup: {mem_free()}", end='')
         self.raw = raw or RawImage()
         collect()
 #         print(f" -> {mem_free()}")
-#         self.image = image or ProcessedImage(self.calib)
+        if image is not None:
+            self.image = image
+        elif self.calib is not None and fixed_point:
+            from mlx90640.fixedpoint import FixedPointImage
+            self.image = FixedPointImage(self.calib, pattern=self.get_pattern())
+            collect()
+        elif self.calib is not None:
+            from mlx90640.processing import ProcessedImage
+            self.image = ProcessedImage(self.calib, pattern=self.get_pattern())
+            collect()
 
 
     @property
@@ -120,57 +143,60 @@ class MLX90640:
         """!
         """
         self.registers['read_pattern'] = pat.pattern_id
+        if self.image is not None:
+            self.image.set_pattern(pat)
 
 
     def read_vdd(self):
         """!
-        Turned off to save memory for raw driver version.
+        Without calibration (raw driver), this is the uncompensated reading.
         """
         # supply voltage calculation (delta Vdd)
         # type: (self) -> float
+        if self.calib is None:
+            return float(self.registers['vdd_pix'])
         vdd_pix = self.registers['vdd_pix'] * self._adc_res_corr()
-#         return float(vdd_pix - self.calib.vdd_25)/self.calib.k_vdd
-        return float(vdd_pix)
+        return float(vdd_pix - self.calib.vdd_25)/self.calib.k_vdd
 
 
     def _adc_res_corr(self):
         """!
-        Turned off to save memory for raw driver version.
         """
         # type: (self) -> float
-#         res_exp = self.calib.res_ee - self.registers['adc_resolution']
-#         return 1 << res_exp
-        return 0
+        res_exp = self.calib.res_ee - self.registers['adc_resolution']
+        return 2.0**res_exp
 
 
     def read_ta(self):
         """!
-        Turned off to save memory for raw driver version.
+        Without calibration (raw driver), this is always 0.
         """
         # ambient temperature calculation (delta Ta in degC)
         # type: (self) -> float
+        if self.calib is None:
+            return 0.0
         v_ptat = self.registers['ta_ptat']
         v_be = self.registers['ta_vbe']
-#         v_ptat_art = v_ptat/(v_ptat*self.calib.alpha_ptat + v_be) * 262144
-# 
-#         v_ta = v_ptat_art/(1.0 + self.calib.kv_ptat*self.read_vdd() - self.calib.ptat_25)
+        v_ptat_art = v_ptat/(v_ptat*self.calib.alpha_ptat + v_be) * 262144
+
+        v_ta = v_ptat_art/(1.0 + self.calib.kv_ptat*self.read_vdd()) - self.calib.ptat_25
 
         # print('v_ptat: ', v_ptat)
         # print('v_be:', v_be)
         # print('v_ptat_art: ', v_ptat_art)
 
-#         return v_ta/self.calib.kt_ptat
-        return 0.0
+        return v_ta/self.calib.kt_ptat
 
 
     def read_gain(self):
         """!
-        Turned off to save memory for raw driver version.
+        Without calibration (raw driver), this is the raw gain register.
         """
         # gain calculation
         # type: (self) -> float
-#         return self.calib.gain / self.registers['gain']
-        return float(self.registers['gain'])
+        if self.calib is None:
+            return float(self.registers['gain'])
+        return self.calib.gain / self.registers['gain']
 
 
     # tr - temperature of reflected environment
@@ -184,13 +210,13 @@ class MLX90640:
         ta = self.read_ta()
 
         ta_abs = ta + 25
-#         if self.calib.emissivity == 1:
-        ta_r = (ta_abs + TEMP_K)**4
-#         else:
-#             tr = tr if tr is not None else ta_abs - 8
-#             ta_k4 = (ta_abs + TEMP_K)**4
-#             tr_k4 = (tr + TEMP_K)**4
-#             ta_r = tr_k4 - (tr_k4 - ta_k4)/self.calib.emissivity
+        if self.calib is None or self.calib.emissivity == 1:
+            ta_r = (ta_abs + TEMP_K)**4
+        else:
+            tr = tr if tr is not None else ta_abs - 8
+            ta_k4 = (ta_abs + TEMP_K)**4
+            tr_k4 = (tr + TEMP_K)**4
+            ta_r = tr_k4 - (tr_k4 - ta_k4)/self.calib.emissivity
 
         return CameraState(
             vdd = self.read_vdd(),
@@ -216,8 +242,11 @@ class MLX90640:
         return self.registers['last_subpage']
 
 
-    def read_image(self, sp_id = None):
+    def read_image(self, sp_id = None, image = None, window = None):
         """!
+        @param image The @c RawImage to read into, by default @c self.raw
+        @param window A tuple (row, col, rows, cols) in sensor coordinates to
+               read only that part of the subpage, or @c None for all of it
         """
         if not self.has_data:
             raise DataNotAvailableError
@@ -228,27 +257,34 @@ class MLX90640:
         subpage = Subpage(self.get_pattern(), sp_id)
         self.last_read = subpage
 
+        image = image or self.raw
         # print(f"read SP {subpage.id}")
-        self.raw.read(self.iface, subpage.sp_range())
+        if window is None:
+            image.read(self.iface, subpage.sp_range())
+        else:
+            image.read_window(self.iface, *window, subpage.pattern, subpage.id)
         self.registers['data_available'] = 0
-        return self.raw
-
-
-#     def process_image(self, sp_id = None, state = None):
-#         """!
-#         """
-#         if self.last_read is None:
-#             raise DataNotAvailableError
-# 
-#         subpage = self.last_read
-#         if sp_id is not None:
-#             subpage.id = sp_id
-# 
-#         state = state or self.read_state()
-# 
-#         # print(f"process SP {subpage.id}")
-#         raw_data = ((idx, self.raw[idx]) for idx in subpage.sp_range())
-#         self.image.update(raw_data, subpage, state)
-#         return self.image
+        return image
+
+
+    def process_image(self, sp_id = None, state = None, image = None):
+        """!
+        Convert the subpage read last into temperatures. Needs calibration,
+        see @c setup().
+        @param image The @c RawImage the subpage was read into, by default
+               @c self.raw
+        """
+        if self.image is None:
+            raise RuntimeError("process_image() needs calibration, see setup()")
+        if self.last_read is None:
+            raise DataNotAvailableError
+
+        subpage = self.last_read
+        if sp_id is not None:
+            subpage.id = sp_id
 
+        state = state or self.read_state()
 
+        # print(f"process SP {subpage.id}")
+        self.image.update((image or self.raw).pix, subpage, state)
+        return self.image
@@ -0,0 +1,84 @@
+"""!
+@file aiming.py
+This file contains the conversion from a target's position in a camera image
+to motor setpoints in encoder ticks.
+"""
+
+import utime as time
+from math import atan, pi
+from mlx90640.targeting import SUBPIXEL_SCALE
+
+## How far ahead, in milliseconds, to predict the target's position when
+#  aiming, roughly the time the motors take to get there
+AIM_LEAD_MS = const(500)
+
+## The number of detections the tracker must have taken of a target before
+#  its prediction is aimed at; with fewer it has no velocity to go on
+AIM_MIN_UPDATES = const(2)
+
+## The most images to look at before aiming, whether or not the tracker has
+#  had @c AIM_MIN_UPDATES detections by then
+AIM_MAX_IMAGES = const(6)
+
+## The tracker's gate in ticks (yaw, pitch), about 4 pixels along each axis
+TRACKER_GATE = (600, 7000)
+
+# distance across one pixel at the target, and to the target, in cm
+_CM_PER_COL = 2.8
+_CM_PER_ROW = 3.7
+_RANGE_CM = 180
+
+# encoder ticks per turn of the turret, and the yaw ticks the camera is off
+# centre by
+_YAW_TICKS_PER_REV = const(60000)
+_PITCH_TICKS_PER_REV = const(528000)
+_YAW_OFFSET = const(320)
+
+
+def pixel_to_ticks(row, col):
+    """! The turn from where the turret points to a spot in the image.
+    @param row, col The spot in display coordinates, in units of
+           1/SUBPIXEL_SCALE pixel as from @c targeting.refine_hotspot()
+    @returns A tuple (yaw, pitch) in encoder ticks
+    """
+    x_dist = (16 - col / SUBPIXEL_SCALE) * _CM_PER_COL
+    y_dist = (12 - row / SUBPIXEL_SCALE) * _CM_PER_ROW
+    yaw = int((atan(x_dist/_RANGE_CM) * _YAW_TICKS_PER_REV) // (2 * pi)) + _YAW_OFFSET
+    pitch = int((atan(y_dist/_RANGE_CM) * _PITCH_TICKS_PER_REV) // (2 * pi))
+    return yaw, pitch
+
+
+def observe(tracker, row, col, when, position=(0, 0)):
+    """! Add a detection to the tracker.
+    The tracker works in encoder ticks, so the turret may turn between
+    images; the encoders mustn't be zeroed while a target is tracked.
+    @param row, col The target in the image, as for @c pixel_to_ticks()
+    @param when The time the image was taken, from @c utime.ticks_ms()
+    @param position The encoder positions (yaw, pitch) when the image was
+           taken
+    @returns Whether the tracker took the detection
+    """
+    yaw, pitch = pixel_to_ticks(row, col)
+    return tracker.update(yaw + position[0], pitch + position[1], when)
+
+
+def setpoints(tracker, when, lead_ms=AIM_LEAD_MS):
+    """! Where to turn to so as to meet the tracked target.
+    @param when The time now, from @c utime.ticks_ms()
+    @param lead_ms How far ahead of @c when to aim
+    @returns A tuple (yaw, pitch) of encoder positions in ticks
+    """
+    yaw, pitch = tracker.predict(time.ticks_add(when, lead_ms))
+    return int(yaw), int(pitch)
+
+
+def aim(tracker, row, col, when, position=(0, 0), lead_ms=AIM_LEAD_MS):
+    """! Add a detection to the tracker and work out where to turn to, from
+    a single image; see @c observe() and @c setpoints().
+    @returns A tuple (yaw, pitch, accepted): the setpoints as encoder
+             positions in ticks, and whether the tracker took the detection
+    """
+    accepted = observe(tracker, row, col, when, position)
+    # a rejected detection just leaves the prediction in place
+    yaw, pitch = setpoints(tracker, when, lead_ms)
+    return yaw, pitch, accepted
@@ -0,0 +1,124 @@
+"""!
+@file autoconfig.py
+This file contains automatic selection of the MLX90640 refresh rate and ADC
+resolution, from timings measured on the bus in use.
+"""
+
+import utime as time
+from ucollections import namedtuple
+from mlx90640 import RefreshRate
+from mlx90640.calibration import IMAGE_SIZE
+from mlx90640.regmap import REG_SIZE
+
+# ADC resolution register values, for 16 to 19 bits
+ADC_16_BIT = const(0)
+ADC_17_BIT = const(1)
+ADC_18_BIT = const(2)
+ADC_19_BIT = const(3)
+
+# fraction of each refresh period which may be spent reading and processing
+DEFAULT_HEADROOM = 0.75
+
+# largest raw pixel value to allow at the chosen ADC resolution, half the
+# int16 range so that the scene can get twice as warm before pixels clip
+PEAK_LIMIT = const(16384)
+
+## Time taken to handle one subpage, in microseconds, the I2C throughput in
+#  bytes per second while reading it, and the largest raw pixel value seen
+#  along with the ADC resolution register value it was read at
+Throughput = namedtuple('Throughput', ('readout_us', 'process_us', 'bus_bps',
+                                       'peak', 'adc_resolution'))
+
+## A chosen camera configuration; @c refresh_rate and @c adc_resolution are
+#  register values, @c freq is the refresh rate in Hz and @c load is the
+#  fraction of each refresh period which the measured work takes up
+CameraProfile = namedtuple('CameraProfile',
+                           ('refresh_rate', 'adc_resolution', 'freq', 'load',
+                            'throughput'))
+
+
+def measure(camera, process=None, samples=4):
+    """! Time how long it takes to read one subpage and the camera state, and
+    optionally to process it. The pixel RAM can be read at any time, so this
+    doesn't wait for the camera to have new data.
+    @param camera An @c MLX90640 which has been set up
+    @param process A function called with the @c RawImage after each read, such
+           as the targeting code, or @c None to only time the readout
+    @param samples The number of subpages to time; the average is reported
+    @returns A @c Throughput
+    """
+    raw = camera.raw
+    pix = raw.pix
+    pattern = camera.get_pattern()
+    readout, processing, peak = 0, 0, 0
+    for sample in range(samples):
+        start = time.ticks_us()
+        raw.read(camera.iface, pattern.sp_range(sample & 1))
+        camera.read_state()
+        readout += time.ticks_diff(time.ticks_us(), start)
+
+        for idx in pattern.sp_range(sample & 1):
+            value = pix[idx] if pix[idx] >= 0 else -pix[idx]
+            if value > peak:
+                peak = value
+
+        if process is not None:
+            start = time.ticks_us()
+            process(raw)
+            processing += time.ticks_diff(time.ticks_us(), start)
+
+    readout_us = max(1, readout // samples)
+    bus_bps = IMAGE_SIZE * REG_SIZE * 1000000 // readout_us
+    return Throughput(readout_us, processing // samples, bus_bps, peak,
+                      camera.registers['adc_resolution'])
+
+
+def select_profile(throughput, *, headroom=DEFAULT_HEADROOM, max_rate=7,
+                   base_resolution=ADC_18_BIT, peak_limit=PEAK_LIMIT):
+    """! Choose the highest refresh rate at which the measured work fits in
+    @c headroom of each refresh period, and the finest ADC resolution, up to
+    @c base_resolution, at which the hottest pixel measured stays below
+    @c peak_limit; each bit of resolution doubles the raw values.
+    @param throughput A @c Throughput from @c measure()
+    @param max_rate The highest refresh rate register value to consider
+    @param base_resolution The finest ADC resolution to use, normally the one
+           the camera was calibrated at
+    @param peak_limit The largest raw pixel value to allow
+    @returns A @c CameraProfile; if even the slowest rate doesn't fit, the
+             slowest rate is chosen and its load is above @c headroom
+    """
+    work_us = throughput.readout_us + throughput.process_us
+    rate = RefreshRate.values[0]
+    for value in RefreshRate.values[:max_rate + 1]:
+        period_us = 1000000 / RefreshRate.get_freq(value)
+        if work_us <= headroom * period_us:
+            rate = value
+
+    resolution = base_resolution
+    while resolution > ADC_16_BIT and throughput.peak * 2.0**(
+            resolution - throughput.adc_resolution) > peak_limit:
+        resolution -= 1
+
+    freq = RefreshRate.get_freq(rate)
+    return CameraProfile(rate, resolution, freq, work_us * freq / 1000000,
+                         throughput)
+
+
+def apply_profile(camera, profile):
+    """! Write a profile's refresh rate and ADC resolution to the camera.
+    """
+    camera.registers['refresh_rate'] = profile.refresh_rate
+    camera.registers['adc_resolution'] = profile.adc_resolution
+
+
+def auto_configure(camera, process=None, *, samples=4,
+                   headroom=DEFAULT_HEADROOM, max_rate=7):
+    """! Measure, choose and apply a profile in one go.
+    @returns The @c CameraProfile which is now in use
+    """
+    throughput = measure(camera, process, samples)
+    base = camera.calib.res_ee if camera.calib is not None else ADC_18_BIT
+    profile = select_profile(throughput, headroom=headroom, max_rate=max_rate,
+                             base_resolution=base)
+    apply_profile(camera, profile)
+    return profile
@@ -0,0 +1,93 @@
+"""!
+@file background.py
+This file contains a running background model for MLX90640 images, used to
+tell moving targets from heat sources which stay put.
+"""
+
+import micropython
+from mlx90640.utils import array_filled
+from mlx90640.calibration import IMAGE_SIZE
+
+
+class BackgroundModel:
+    def __init__(self, threshold=40, shift=4, fg_shift=7):
+        """!
+        @param threshold The difference from the background, in raw pixel
+               units, above which a pixel counts as foreground
+        @param shift The background moves 1/2**shift of the way towards each
+               new background pixel value
+        @param fg_shift Foreground pixels are learned more slowly, at
+               1/2**fg_shift, so a warm object which stops moving fades into
+               the background after a while
+        """
+        self.threshold = threshold
+        self.shift = shift
+        self.fg_shift = fg_shift
+
+        ## Background value of each pixel
+        self.bg = array_filled('h', IMAGE_SIZE)
+        ## 1 for each pixel which differed from the background in the last
+        #  update, 0 otherwise
+        self.mask = bytearray(IMAGE_SIZE)
+        ## Number of foreground pixels in the last update
+        self.fg_count = 0
+        ## Sum of the foreground pixels' differences from the background in
+        #  the last update, a measure of how much is moving
+        self.motion = 0
+        self._primed = False
+
+    def reset(self):
+        """! Forget the background; the next update starts a new one. The
+        background only holds while the camera stays still, so call this after
+        the turret has turned.
+        """
+        self._primed = False
+
+    def update(self, pix, update_idx=None):
+        """! Compare an image with the background and learn from it.
+        @param pix The pixel array of an image, e.g. @c RawImage.pix
+        @param update_idx The pixels which have new values, such as the
+               subpage just read, by default all of them
+        @returns The motion score, also kept in @c motion
+        """
+        if not self._primed:
+            bg = self.bg
+            for idx in range(IMAGE_SIZE):
+                bg[idx] = pix[idx]
+                self.mask[idx] = 0
+            self._primed = True
+            self.fg_count, self.motion = 0, 0
+            return 0
+
+        self._update(pix, update_idx or range(IMAGE_SIZE))
+        return self.motion
+
+    @micropython.native
+    def _update(self, pix, update_idx):
+        bg = self.bg
+        mask = self.mask
+        threshold = self.threshold
+        shift = self.shift
+        fg_shift = self.fg_shift
+        fg_count, motion = 0, 0
+
+        for idx in update_idx:
+            value = pix[idx]
+            diff = value - bg[idx]
+            size = diff if diff >= 0 else -diff
+            if size > threshold:
+                mask[idx] = 1
+                fg_count += 1
+                motion += size
+                step = diff >> fg_shift
+            else:
+                mask[idx] = 0
+                step = diff >> shift
+            # nudge by at least one count so the background can catch up
+            # exactly rather than stall 2**shift counts away
+            if step == 0 and diff != 0:
+                step = 1 if diff > 0 else -1
+            bg[idx] += step
+
+        self.fg_count = fg_count
+        self.motion = motion
@@ -0,0 +1,254 @@
+"""!
+@file blobs.py
+This file contains a detector for warm blobs in MLX90640 images, and the
+choice of which one the turret aims at.
+"""
+
+import micropython
+from mlx90640.utils import array_filled
+from mlx90640.calibration import NUM_COLS, IMAGE_SIZE
+from mlx90640.targeting import (
+    Hotspot,
+    find_hotspot,
+    FIRST_ROW,
+    END_ROW,
+    FIRST_COL,
+    END_COL,
+    SUBPIXEL_SCALE,
+)
+
+# marks pixels which are below the threshold in the parent table
+_BACKGROUND = const(0xFFFF)
+
+# default threshold, as a fraction of the way from the coldest to the hottest
+# pixel, in 1/256
+DEFAULT_LEVEL = const(192)
+
+# default for how far a blob's peak must be above the coldest pixel to be a
+# target, in raw pixel units; how many degrees that is depends on the camera's
+# gain, offsets and ADC resolution, so check it against the real camera
+DEFAULT_MIN_PEAK = const(60)
+
+
+class BlobDetector:
+    def __init__(self, capacity=8, min_area=2, min_peak=DEFAULT_MIN_PEAK):
+        """!
+        @param capacity The most blobs reported per frame; further blobs, in
+               scan order, are counted in @c overflow but not reported
+        @param min_area Blobs with fewer pixels than this are dropped as noise
+        @param min_peak How far above the coldest pixel the largest blob's
+               peak must be for @c target() to aim at it, in pixel units
+        """
+        self.capacity = capacity
+        self.min_area = min_area
+        self.min_peak = min_peak
+
+        # union-find parent of each pixel, or _BACKGROUND
+        self._parent = array_filled('H', IMAGE_SIZE, _BACKGROUND)
+        ## Blob number of each pixel, or -1 for pixels in no reported blob
+        self.labels = array_filled('b', IMAGE_SIZE, -1)
+
+        ## Number of blobs found in the last frame
+        self.count = 0
+        ## Number of blobs which didn't fit in the table
+        self.overflow = 0
+        ## Threshold used for the last frame
+        self.threshold = 0
+        ## Minimum and maximum pixel values of the last frame
+        self.min_h = 0
+        self.max_h = 0
+
+        ## Per-blob statistics; positions are in display coordinates
+        self.area = array_filled('H', capacity)
+        self.peak = array_filled('h', capacity)
+        self.peak_row = array_filled('B', capacity)
+        self.peak_col = array_filled('B', capacity)
+        self.top = array_filled('B', capacity)
+        self.bottom = array_filled('B', capacity)
+        self.left = array_filled('B', capacity)
+        self.right = array_filled('B', capacity)
+        # sums of pixel rows and columns, for the centroids
+        self._row_sum = array_filled('H', capacity)
+        self._col_sum = array_filled('H', capacity)
+        self._tables = (self.area, self.peak, self.peak_row, self.peak_col,
+                        self.top, self.bottom, self.left, self.right,
+                        self._row_sum, self._col_sum)
+        # new blob numbers after dropping small blobs
+        self._remap = array_filled('b', capacity, -1)
+
+    def _find(self, idx):
+        # root of idx's tree, halving the path on the way
+        parent = self._parent
+        while parent[idx] != idx:
+            parent[idx] = parent[parent[idx]]
+            idx = parent[idx]
+        return idx
+
+    def _union(self, a, b):
+        # the smaller index becomes the root, so that each root is the first
+        # pixel of its blob in scan order
+        a = self._find(a)
+        b = self._find(b)
+        if a < b:
+            self._parent[b] = a
+        elif b < a:
+            self._parent[a] = b
+
+    def detect(self, pix, threshold=None, level=DEFAULT_LEVEL, mask=None):
+        """! Find the blobs of pixels above a threshold in an image.
+        @param pix The pixel array of an image, e.g. @c RawImage.pix
+        @param threshold The pixel value a pixel must exceed to be part of a
+               blob, or @c None to set it from @c level
+        @param level The threshold as a fraction of the image's value range
+               in 1/256, used if @c threshold is @c None
+        @param mask If given, only pixels whose entry in this bytearray is
+               nonzero can be part of a blob, e.g. @c BackgroundModel.mask to
+               find only moving targets
+        @returns The number of blobs found, also kept in @c count
+        """
+        self.min_h = min(pix)
+        self.max_h = max(pix)
+        if threshold is None:
+            threshold = self.min_h + (((self.max_h - self.min_h)*level) >> 8)
+        self.threshold = threshold
+        self._join(pix, threshold, mask)
+        self._label(pix)
+        return self.count
+
+    @micropython.native
+    def _join(self, pix, threshold, mask):
+        parent = self._parent
+        for idx in range(IMAGE_SIZE):
+            parent[idx] = _BACKGROUND
+
+        # in sensor order; only the neighbours which were already visited,
+        # the previous pixel in the row and the one above, need joining
+        for row in range(FIRST_ROW, END_ROW):
+            base = row*NUM_COLS
+            for col in range(NUM_COLS - END_COL, NUM_COLS - FIRST_COL):
+                idx = base + col
+                if pix[idx] <= threshold or (mask is not None and not mask[idx]):
+                    continue
+                parent[idx] = idx
+                if col > NUM_COLS - END_COL and parent[idx - 1] != _BACKGROUND:
+                    self._union(idx - 1, idx)
+                if row > FIRST_ROW and parent[idx - NUM_COLS] != _BACKGROUND:
+                    self._union(idx - NUM_COLS, idx)
+
+    @micropython.native
+    def _label(self, pix):
+        parent = self._parent
+        labels = self.labels
+        area = self.area
+        count, overflow = 0, 0
+
+        for idx in range(IMAGE_SIZE):
+            labels[idx] = -1
+            if parent[idx] == _BACKGROUND:
+                continue
+            root = self._find(idx)
+            row = idx // NUM_COLS
+            col = NUM_COLS - 1 - idx % NUM_COLS
+
+            if root == idx:
+                # first pixel of a new blob
+                if count == self.capacity:
+                    overflow += 1
+                    continue
+                slot = count
+                count += 1
+                area[slot] = 0
+                self.peak[slot] = pix[idx]
+                self.peak_row[slot], self.peak_col[slot] = row, col
+                self.top[slot] = self.bottom[slot] = row
+                self.left[slot] = self.right[slot] = col
+                self._row_sum[slot] = self._col_sum[slot] = 0
+            else:
+                slot = labels[root]
+                if slot < 0:
+                    continue
+
+            labels[idx] = slot
+            area[slot] += 1
+            self._row_sum[slot] += row
+            self._col_sum[slot] += col
+            if pix[idx] > self.peak[slot]:
+                self.peak[slot] = pix[idx]
+                self.peak_row[slot], self.peak_col[slot] = row, col
+            self.bottom[slot] = row
+            if col < self.left[slot]:
+                self.left[slot] = col
+            if col > self.right[slot]:
+                self.right[slot] = col
+
+        self.overflow = overflow
+        self.count = self._drop_small(count)
+
+    def _drop_small(self, count):
+        # move the blobs which are big enough to the front of the table and
+        # relabel the pixels to match
+        remap = self._remap
+        keep = 0
+        for slot in range(count):
+            if self.area[slot] < self.min_area:
+                remap[slot] = -1
+                continue
+            remap[slot] = keep
+            if keep != slot:
+                for table in self._tables:
+                    table[keep] = table[slot]
+            keep += 1
+
+        if keep != count:
+            labels = self.labels
+            for idx in range(IMAGE_SIZE):
+                if labels[idx] >= 0:
+                    labels[idx] = remap[labels[idx]]
+        return keep
+
+    def centroid(self, slot):
+        """! The centre of a blob.
+        @returns A tuple (row, col) in display coordinates, each in units of
+                 1/SUBPIXEL_SCALE pixel
+        """
+        area = self.area[slot]
+        return (self._row_sum[slot]*SUBPIXEL_SCALE // area,
+                self._col_sum[slot]*SUBPIXEL_SCALE // area)
+
+    def largest(self):
+        """! The number of the blob with the most pixels, or -1 if none.
+        """
+        best = -1
+        for slot in range(self.count):
+            if best < 0 or self.area[slot] > self.area[best]:
+                best = slot
+        return best
+
+    def hottest(self):
+        """! The number of the blob with the hottest peak, or -1 if none.
+        """
+        best = -1
+        for slot in range(self.count):
+            if best < 0 or self.peak[slot] > self.peak[best]:
+                best = slot
+        return best
+
+    def hotspot(self, slot):
+        """! The peak of a blob as a @c Hotspot, e.g. for
+        @c targeting.refine_hotspot().
+        """
+        return Hotspot(self.peak_row[slot], self.peak_col[slot],
+                       self.peak[slot], self.min_h, self.max_h)
+
+    def target(self, pix):
+        """! The spot to aim at in the image last given to @c detect(): the
+        peak of the largest blob, or the hottest spot of the whole image if
+        there is no blob or the largest one's peak is less than @c min_peak
+        above the coldest pixel.
+        @param pix The same pixel array as was given to @c detect()
+        @returns A @c Hotspot, e.g. for @c targeting.refine_hotspot()
+        """
+        slot = self.largest()
+        if slot >= 0 and self.peak[slot] - self.min_h >= self.min_peak:
+            return self.hotspot(slot)
+        return find_hotspot(pix)
@@ -0,0 +1,138 @@
+"""!
+@file bustune.py
+This file contains an I2C bus profiler for the MLX90640 camera driver, which
+finds the fastest clock the wiring reliably supports.
+"""
+
+import utime as time
+from ucollections import namedtuple
+from mlx90640.regmap import (
+    REGISTER_MAP,
+    RegisterMap,
+    CameraInterface,
+    REG_SIZE,
+    EEPROM_ADDRESS,
+    EEPROM_SIZE,
+)
+from mlx90640.calibration import read_eeprom
+
+# bus clocks to try, in Hz; the camera needs FM+ above 400 kHz
+CANDIDATE_FREQS = (100000, 400000, 600000, 800000, 1000000)
+FAST_MODE_MAX = const(400000)
+
+# number of single-register reads used to time transactions
+_TX_SAMPLES = const(32)
+
+## Measurements at one bus clock; the rates are 0 if the clock failed
+BusResult = namedtuple('BusResult', ('freq', 'ok', 'bytes_per_s', 'tx_per_s'))
+
+## The chosen bus setup, along with the results for every clock tried
+BusProfile = namedtuple('BusProfile', ('freq', 'fmplus', 'bus', 'results'))
+
+
+def set_fmplus(iface, enable, registers=None):
+    """! Turn FM+ on or off in the camera's I2C configuration register.
+    @param registers The register map of a camera driver on the same camera,
+           if there is one; its copy of the register is dropped so that it
+           doesn't write the old setting back
+    """
+    RegisterMap(iface, REGISTER_MAP)['fmplus_disable'] = 0 if enable else 1
+    if registers is not None:
+        registers.invalidate('fmplus_disable')
+
+
+def get_fmplus(iface):
+    """! Whether FM+ is on in the camera's I2C configuration register.
+    """
+    return not RegisterMap(iface, REGISTER_MAP)['fmplus_disable']
+
+
+def measure(iface, reference, passes=2, buf=None):
+    """! Check and time EEPROM read-back on one bus.
+    @param reference The EEPROM contents as read at a safe clock
+    @param passes The number of times the whole EEPROM is read back
+    @param buf A buffer the size of the EEPROM to read into, to save allocating
+    @returns A tuple (ok, bytes per second, transactions per second)
+    """
+    buf = buf or bytearray(EEPROM_SIZE * REG_SIZE)
+    elapsed = 0
+    try:
+        for _ in range(passes):
+            start = time.ticks_us()
+            iface.read_into(EEPROM_ADDRESS, buf)
+            elapsed += time.ticks_diff(time.ticks_us(), start)
+            if buf != reference:
+                return False, 0, 0
+
+        word = memoryview(buf)[:REG_SIZE]
+        start = time.ticks_us()
+        for _ in range(_TX_SAMPLES):
+            iface.read_into(EEPROM_ADDRESS, word)
+        tx_elapsed = time.ticks_diff(time.ticks_us(), start)
+    except OSError:
+        return False, 0, 0
+
+    bytes_per_s = len(buf) * passes * 1000000 // max(1, elapsed)
+    tx_per_s = _TX_SAMPLES * 1000000 // max(1, tx_elapsed)
+    return True, bytes_per_s, tx_per_s
+
+
+def tune(make_bus, addr=0x33, freqs=CANDIDATE_FREQS, *, fmplus=True,
+         passes=2, registers=None):
+    """! Find the fastest bus clock which reads the camera reliably.
+    @param make_bus A function which returns an I2C bus running at the clock
+           (in Hz) given to it, e.g. <tt>lambda freq: I2C(1, freq=freq)</tt>
+    @param freqs The clocks to try, slowest first; the first one is used to
+           read the reference copy of the EEPROM and must work
+    @param fmplus If @c False, clocks above 400 kHz are skipped
+    @param passes The number of EEPROM read-backs at each clock
+    @param registers The camera driver's register map, if one is already
+           talking to the camera, see @c set_fmplus()
+    @returns A @c BusProfile with a bus at the chosen clock. Clocks are tried
+             in order and tuning stops at the first one which fails.
+    """
+    bus = make_bus(freqs[0])
+    iface = CameraInterface(bus, addr)
+    reference = read_eeprom(iface)
+    buf = bytearray(len(reference))
+    # FM+ is on unless it has been turned off, and is left as it was found
+    # unless the chosen clock needs it
+    fmplus_was_on = get_fmplus(iface)
+
+    best, fmplus_on, results = freqs[0], fmplus_was_on, []
+    for freq in freqs:
+        if freq > FAST_MODE_MAX:
+            if not fmplus:
+                break
+            if not fmplus_on:
+                set_fmplus(iface, True, registers)
+                fmplus_on = True
+
+        bus = make_bus(freq)
+        iface = CameraInterface(bus, addr)
+        ok, bytes_per_s, tx_per_s = measure(iface, reference, passes, buf)
+        results.append(BusResult(freq, ok, bytes_per_s, tx_per_s))
+        if not ok:
+            break
+        best = freq
+
+    # leave the bus at the chosen clock, and FM+ only on if it was on
+    # before or is being used
+    bus = make_bus(best)
+    iface = CameraInterface(bus, addr)
+    if fmplus_on and not fmplus_was_on and best <= FAST_MODE_MAX:
+        set_fmplus(iface, False, registers)
+    return BusProfile(best, best > FAST_MODE_MAX, bus, tuple(results))
+
+
+def print_report(profile):
+    """! Print the results of @c tune() as a table, followed by the settings
+    to use.
+    """
+    print("    freq  ok     bytes/s       tx/s")
+    for res in profile.results:
+        print(f"{res.freq:8d}  {'yes' if res.ok else 'no ':3s}"
+              f" {res.bytes_per_s:11d} {res.tx_per_s:10d}")
+    # FM+ needn't be set up below FM+ clocks
+    fmplus = True if profile.fmplus else None
+    print(f"use I2C_FREQ = {profile.freq}, I2C_FMPLUS = {fmplus}")
@@ -0,0 +1,178 @@
+"""!
+@file calib_cache.py
+This file contains a cache in flash for decoded MLX90640 calibration data.
+"""
+
+import struct
+from array import array
+from mlx90640.utils import array_filled
+from mlx90640.calibration import CameraCalibration, IMAGE_SIZE
+
+try:
+    from binascii import crc32
+except ImportError:
+    crc32 = None
+
+CACHE_MAGIC = b'MLXC'
+CACHE_VERSION = const(1)
+
+# magic, version, use_tgc, device ID (3 words), outlier count, failed count,
+# checksum of everything after the header
+_HEADER_FMT = '<4sBB3HHHI'
+
+# number of entries in the scalar blocks, see _pack_scalars()
+_NUM_INTS = const(15)
+_NUM_FLOATS = const(26)
+
+DEVICE_ID_FIELDS = ('device_id_1', 'device_id_2', 'device_id_3')
+
+
+def read_device_id(eeprom):
+    """! Read the camera's unique device ID, three words of its EEPROM.
+    """
+    return tuple(eeprom[name] for name in DEVICE_ID_FIELDS)
+
+
+def _checksum(bufs):
+    if crc32 is not None:
+        crc = 0
+        for buf in bufs:
+            crc = crc32(buf, crc)
+        return crc
+
+    # Fletcher-32 over the raw bytes when binascii isn't built in
+    sum_1, sum_2 = 0, 0
+    for buf in bufs:
+        for byte in bytes(buf):
+            sum_1 = (sum_1 + byte) % 0xFFFF
+            sum_2 = (sum_2 + sum_1) % 0xFFFF
+    return sum_2 << 16 | sum_1
+
+
+def _pack_scalars(calib):
+    if calib.use_tgc:
+        pix_os_cp = calib.pix_os_cp
+        tgc = (calib.tgc, calib.kta_cp, calib.kv_cp) + calib.pix_alpha_cp
+    else:
+        pix_os_cp = (0, 0)
+        tgc = (0.0, 0.0, 0.0, 0.0, 0.0)
+
+    ints = array('l', (
+        calib.k_vdd, calib.vdd_25, calib.res_ee, calib.ptat_25, calib.gain,
+        calib.kta_scale_1, calib.kta_scale_2, calib.kv_scale, calib.ksto_scale,
+    ) + calib.ct + pix_os_cp)
+    floats = array('f', (
+        calib.emissivity, calib.kv_ptat, calib.kt_ptat, calib.alpha_ptat,
+        calib.ksta, calib.il_chess_c1, calib.il_chess_c2, calib.il_chess_c3,
+        calib.drift,
+    ) + calib.kv_avg[0] + calib.kv_avg[1] + calib.ksto + calib.alpha_ext + tgc)
+    return ints, floats
+
+
+def _unpack_scalars(calib, ints, floats):
+    (calib.k_vdd, calib.vdd_25, calib.res_ee, calib.ptat_25, calib.gain,
+     calib.kta_scale_1, calib.kta_scale_2, calib.kv_scale,
+     calib.ksto_scale) = ints[:9]
+    calib.ct = tuple(ints[9:13])
+
+    (calib.emissivity, calib.kv_ptat, calib.kt_ptat, calib.alpha_ptat,
+     calib.ksta, calib.il_chess_c1, calib.il_chess_c2, calib.il_chess_c3,
+     calib.drift) = floats[:9]
+    calib.kv_avg = (tuple(floats[9:11]), tuple(floats[11:13]))
+    calib.ksto = tuple(floats[13:17])
+    calib.alpha_ext = tuple(floats[17:21])
+
+    if calib.use_tgc:
+        calib.pix_os_cp = tuple(ints[13:15])
+        calib.tgc, calib.kta_cp, calib.kv_cp = floats[21:24]
+        calib.pix_alpha_cp = tuple(floats[24:26])
+
+
+def save(calib, path, device_id):
+    """! Write a decoded calibration to @c path, keyed by @c device_id.
+    """
+    ints, floats = _pack_scalars(calib)
+    outliers = array('H', calib.outliers)
+    failed = array('H', calib.failed)
+    bufs = (
+        ints, floats,
+        calib.pix_os_ref, calib.pix_alpha, calib.pix_kta, calib.il_offset,
+        outliers, failed,
+    )
+    header = struct.pack(
+        _HEADER_FMT, CACHE_MAGIC, CACHE_VERSION, int(calib.use_tgc),
+        device_id[0], device_id[1], device_id[2],
+        len(outliers), len(failed), _checksum(bufs),
+    )
+    with open(path, 'wb') as file:
+        file.write(header)
+        for buf in bufs:
+            file.write(buf)
+
+
+def load(path, device_id, *, use_tgc=False):
+    """! Read a calibration from @c path.
+    @returns A @c CameraCalibration, or @c None if there is no usable cache
+             for this camera
+    """
+    try:
+        file = open(path, 'rb')
+    except OSError:
+        return None
+
+    with file:
+        header = file.read(struct.calcsize(_HEADER_FMT))
+        if len(header) != struct.calcsize(_HEADER_FMT):
+            return None
+        (magic, version, cached_tgc, id_1, id_2, id_3,
+         num_outliers, num_failed, checksum) = struct.unpack(_HEADER_FMT, header)
+        if (magic != CACHE_MAGIC or version != CACHE_VERSION
+                or bool(cached_tgc) != use_tgc
+                or (id_1, id_2, id_3) != tuple(device_id)):
+            return None
+
+        # bypass __init__, which would decode the EEPROM
+        calib = CameraCalibration.__new__(CameraCalibration)
+        calib.use_tgc = use_tgc
+        ints = array_filled('l', _NUM_INTS)
+        floats = array_filled('f', _NUM_FLOATS, 0.0)
+        calib.pix_os_ref = array_filled('h', IMAGE_SIZE)
+        calib.pix_alpha = array_filled('f', IMAGE_SIZE, 0.0)
+        calib.pix_kta = array_filled('f', IMAGE_SIZE, 0.0)
+        calib.il_offset = array_filled('f', IMAGE_SIZE, 0.0)
+        outliers = array_filled('H', num_outliers)
+        failed = array_filled('H', num_failed)
+        bufs = (
+            ints, floats,
+            calib.pix_os_ref, calib.pix_alpha, calib.pix_kta, calib.il_offset,
+            outliers, failed,
+        )
+        # a short read leaves zeros behind, which the checksum will catch
+        for buf in bufs:
+            file.readinto(buf)
+
+    if _checksum(bufs) != checksum:
+        return None
+
+    _unpack_scalars(calib, ints, floats)
+    calib.outliers = tuple(outliers)
+    calib.failed = tuple(failed)
+    return calib
+
+
+def load_or_decode(iface, eeprom, path, *, emissivity=1, use_tgc=False):
+    """! Get the camera calibration from the cache at @c path if it matches
+    this camera, otherwise decode it from the EEPROM and refresh the cache.
+    Only the three device ID words are read from the EEPROM on a cache hit.
+    """
+    device_id = read_device_id(eeprom)
+    calib = load(path, device_id, use_tgc=use_tgc)
+    if calib is None:
+        calib = CameraCalibration(iface, eeprom,
+                                  emissivity=emissivity, use_tgc=use_tgc)
+        try:
+            save(calib, path, device_id)
+        except OSError:
+            pass # read-only or full filesystem; decode again next boot
+    calib.emissivity = emissivity
+    return calib
@@ -1,10 +1,9 @@
 from array import array
 from mlx90640.utils import (
-    Struct, 
-    StructProto,
-    field_desc,
+    array_filled,
+    twos_complement,
 )
-from mlx90640.regmap import REG_SIZE
+from mlx90640.regmap import REG_SIZE, EEPROM_ADDRESS, EEPROM_SIZE
 
 NUM_ROWS = const(24)
 NUM_COLS = const(32)
@@ -16,75 +15,57 @@ OCC_COLS_ADDRESS = const(0x2418)
 ACC_ROWS_ADDRESS = const(0x2422)
 ACC_COLS_ADDRESS = const(0x2428)
 
-CC_PROTO = StructProto((
-    field_desc('0', 4,  0, signed=True),
-    field_desc('1', 4,  4, signed=True),
-    field_desc('2', 4,  8, signed=True),
-    field_desc('3', 4, 12, signed=True),
-))
-
-def _read_cc_iter(iface, base, size):
-    buf = bytearray(REG_SIZE)
-    struct = Struct(buf, CC_PROTO)
+# largest number of EEPROM words fetched in a single I2C transaction
+EEPROM_BURST_SIZE = const(256)
+
+def read_eeprom(iface, burst_size=EEPROM_BURST_SIZE):
+    """ Copy the whole calibration EEPROM into one buffer using a few burst
+    reads. Words are stored big-endian in address order from EEPROM_ADDRESS.
+    """
+    data = bytearray(EEPROM_SIZE * REG_SIZE)
+    view = memoryview(data)
+    for start in range(0, EEPROM_SIZE, burst_size):
+        end = min(start + burst_size, EEPROM_SIZE)
+        iface.read_into(EEPROM_ADDRESS + start,
+                        view[start*REG_SIZE:end*REG_SIZE])
+    return data
+
+def _read_word(data, address):
+    pos = (address - EEPROM_ADDRESS) * REG_SIZE
+    return (data[pos] << 8) | data[pos + 1]
+
+def _read_cc_iter(data, base, size):
+    # 4-bit signed row/column coefficients, four to a word, lowest nibble first
     for addr_off in range(size // 4):
-        cc_addr = base + addr_off
-        iface.read_into(cc_addr, buf)
-        yield struct['0']
-        yield struct['1']
-        yield struct['2']
-        yield struct['3']
-
-def read_occ_rows(iface):
-    return _read_cc_iter(iface, OCC_ROWS_ADDRESS, NUM_ROWS)
-def read_occ_cols(iface):
-    return _read_cc_iter(iface, OCC_COLS_ADDRESS, NUM_COLS)
-
-def read_acc_rows(iface):
-    return _read_cc_iter(iface, ACC_ROWS_ADDRESS, NUM_ROWS)
-def read_acc_cols(iface):
-    return _read_cc_iter(iface, ACC_COLS_ADDRESS, NUM_COLS)
-
-PIX_CALIB_PROTO = StructProto((
-    field_desc('offset',  6, 10, signed=True),
-    field_desc('alpha',   6,  4, signed=True),
-    field_desc('kta',     3,  1, signed=True),
-    field_desc('outlier', 1,  0),
-))
-
+        word = _read_word(data, base + addr_off)
+        for shift in (0, 4, 8, 12):
+            yield twos_complement(4, (word >> shift) & 0xF)
+
+def read_occ_rows(data):
+    return _read_cc_iter(data, OCC_ROWS_ADDRESS, NUM_ROWS)
+def read_occ_cols(data):
+    return _read_cc_iter(data, OCC_COLS_ADDRESS, NUM_COLS)
+
+def read_acc_rows(data):
+    return _read_cc_iter(data, ACC_ROWS_ADDRESS, NUM_ROWS)
+def read_acc_cols(data):
+    return _read_cc_iter(data, ACC_COLS_ADDRESS, NUM_COLS)
+
+# per-pixel calibration words: offset in bits 15..10, alpha in bits 9..4, kta
+# in bits 3..1 (all signed) and the outlier flag in bit 0
 PIX_CALIB_ADDRESS = const(0x2440)
 
-
-class PixelCalibrationData:
-    def __init__(self, iface):
-        pix_count = NUM_ROWS * NUM_COLS
-        self._data = bytearray(pix_count * REG_SIZE)
-
-        failed = []
-        buf = bytearray(REG_SIZE)
-        for idx in range(pix_count):
-            offset = idx * REG_SIZE
-            iface.read_into(PIX_CALIB_ADDRESS + offset, buf)
-            if buf != bytes(REG_SIZE):
-                self._data[offset:offset+REG_SIZE] = buf
-            else:
-                failed.append(idx)
-        self.failed = tuple(failed)
-
-    def __len__(self):
-        return len(self._data)//REG_SIZE
-    def __getitem__(self, idx):
-        offset = idx * REG_SIZE
-        return Struct(self._data[offset:offset+REG_SIZE], PIX_CALIB_PROTO)
-    def __iter__(self):
-        for idx in range(len(self)):
-            yield self[idx]
-
 TEMP_K = 273.15
 
 class CameraCalibration:
-    def __init__(self, iface, eeprom, *, emissivity=1, use_tgc=False):
+    def __init__(self, iface, eeprom, *, emissivity=1, use_tgc=False, data=None):
         self.emissivity = emissivity
 
+        # read the whole EEPROM in one go; every eeprom[...] lookup below is
+        # then answered from the register map's shadow copy
+        data = data or read_eeprom(iface)
+        eeprom.load(EEPROM_ADDRESS, data)
+
         # restore VDD sensor parameters
         self.k_vdd = eeprom['k_vdd'] * 32
         self.vdd_25 = (eeprom['vdd_25'] - 256) * 32 - 8192
@@ -101,15 +82,12 @@ class CameraCalibration:
         # gain
         self.gain = eeprom['gain']
 
-        # pixel calibration data
-        self.pix_data = PixelCalibrationData(iface)
-        self.pix_os_ref = array('h', self._calc_pix_os_ref(iface, eeprom))
-        self.outliers = tuple(idx for idx, data in enumerate(self.pix_data) if data['outlier'])
-
         # IR data compensation
         self.kta_scale_1 = 1 << (eeprom['kta_scale_1'] + 8)
         self.kta_scale_2 = 1 << eeprom['kta_scale_2']
-        self.pix_kta = array('f', self._calc_pix_kta(eeprom))
+
+        # pixel calibration data: offset, sensitivity and kta in a single pass
+        self._decode_pixels(data, eeprom)
 
         self.kv_scale = 1 << eeprom['kv_scale']
         self.kv_avg = (
@@ -134,7 +112,6 @@ class CameraCalibration:
             self.kv_cp = eeprom['kv_cp'] / self.kv_scale
 
         # sensitivity normalization
-        self.pix_alpha = array('f', self._calc_pix_alpha_ref(iface, eeprom))
         self.ksta = eeprom['ksta'] / 8192.0
 
         if use_tgc:
@@ -173,58 +150,68 @@ class CameraCalibration:
         alpha_4 = alpha_3*(1.0 + ksto3*(ct4 - ct3))
         self.alpha_ext = (alpha_1, alpha_2, alpha_3, alpha_4)
 
-    def _calc_pix_os_ref(self, iface, eeprom):
+    def _decode_pixels(self, data, eeprom):
         offset_avg = eeprom['pix_os_average']
         occ_scale_row = 1 << eeprom['scale_occ_row']
         occ_scale_col = 1 << eeprom['scale_occ_col']
         occ_scale_rem = 1 << eeprom['scale_occ_rem']
+        occ_rows = tuple(read_occ_rows(data))
+        occ_cols = tuple(read_occ_cols(data))
 
-        occ_rows = tuple(read_occ_rows(iface))
-        occ_cols = tuple(read_occ_cols(iface))
-
-        for row in range(NUM_ROWS):
-            for col in range(NUM_COLS):
-                idx = row * NUM_COLS + col
-                yield (
-                    offset_avg
-                    + occ_rows[row] * occ_scale_row
-                    + occ_cols[col] * occ_scale_col
-                    + self.pix_data[idx]['offset'] * occ_scale_rem
-                )
-
-    def _calc_pix_alpha_ref(self, iface, eeprom):
         alpha_ref = eeprom['pix_sensitivity_average']
         alpha_scale = 1 << (eeprom['alpha_scale'] + 30)
         acc_scale_row = 1 << eeprom['scale_acc_row']
         acc_scale_col = 1 << eeprom['scale_acc_col']
         acc_scale_rem = 1 << eeprom['scale_acc_rem']
+        acc_rows = tuple(read_acc_rows(data))
+        acc_cols = tuple(read_acc_cols(data))
 
-        acc_rows = tuple(read_acc_rows(iface))
-        acc_cols = tuple(read_acc_cols(iface))
-
-        for row in range(NUM_ROWS):
-            for col in range(NUM_COLS):
-                idx = row * NUM_COLS + col
-                yield (
-                    alpha_ref
-                    + acc_rows[row] * acc_scale_row
-                    + acc_cols[col] * acc_scale_col
-                    + self.pix_data[idx]['alpha'] * acc_scale_rem
-                ) / alpha_scale
-
-    def _calc_pix_kta(self, eeprom):
         # index by [row % 2][col % 2]
         kta_avg = (
             (eeprom['kta_avg_re_ce'], eeprom['kta_avg_re_co']),
             (eeprom['kta_avg_ro_ce'], eeprom['kta_avg_ro_co']),
         )
 
+        self.pix_os_ref = array_filled('h', IMAGE_SIZE)
+        self.pix_alpha = array_filled('f', IMAGE_SIZE, 0.0)
+        self.pix_kta = array_filled('f', IMAGE_SIZE, 0.0)
+        outliers = []
+        failed = []
+
+        # decode the per-pixel words (see PIX_CALIB_ADDRESS) straight from the
+        # EEPROM image
+        pos = (PIX_CALIB_ADDRESS - EEPROM_ADDRESS) * REG_SIZE
+        idx = 0
         for row in range(NUM_ROWS):
+            os_row = offset_avg + occ_rows[row] * occ_scale_row
+            alpha_row = alpha_ref + acc_rows[row] * acc_scale_row
+            kta_row = kta_avg[row % 2]
             for col in range(NUM_COLS):
-                idx = row * NUM_COLS + col
-                kta_ee = self.pix_data[idx]['kta']
-                kta_rc = kta_avg[row % 2][col % 2]
-                yield (kta_rc + kta_ee * self.kta_scale_2)/self.kta_scale_1
+                word = (data[pos] << 8) | data[pos + 1]
+                pos += REG_SIZE
+                if word == 0:
+                    failed.append(idx)
+                if word & 0x1:
+                    outliers.append(idx)
+
+                self.pix_os_ref[idx] = (
+                    os_row
+                    + occ_cols[col] * occ_scale_col
+                    + twos_complement(6, word >> 10) * occ_scale_rem
+                )
+                self.pix_alpha[idx] = (
+                    alpha_row
+                    + acc_cols[col] * acc_scale_col
+                    + twos_complement(6, (word >> 4) & 0x3F) * acc_scale_rem
+                ) / alpha_scale
+                self.pix_kta[idx] = (
+                    kta_row[col % 2]
+                    + twos_complement(3, (word >> 1) & 0x7) * self.kta_scale_2
+                ) / self.kta_scale_1
+                idx += 1
+
+        self.outliers = tuple(outliers)
+        self.failed = tuple(failed)
 
     def _calc_il_offset(self):
         for idx in range(NUM_ROWS*NUM_COLS):
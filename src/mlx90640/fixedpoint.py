@@ -0,0 +1,218 @@
+"""!
+@file fixedpoint.py
+This file contains an integer-only image processing engine for the MLX90640
+camera driver, for microcontrollers without an FPU.
+"""
+
+from array import array
+from gc import collect
+from mlx90640.utils import array_filled
+from mlx90640.calibration import IMAGE_SIZE, TEMP_K
+from mlx90640.image import ChessPattern, InterleavedPattern
+
+# fixed-point scales, as powers of two. With a typical alpha, the per-pixel
+# loop's intermediate values stay below 2**30 for objects up to about 300 degC,
+# so they are small ints and the loop doesn't allocate; hotter pixels still
+# come out right, but allocate
+_KTA_Q = const(18)      # per-pixel kta
+_INV_ALPHA_Q = const(7) # per-pixel 1/(alpha * 16**4)
+_INV_ALPHA_FRAC = const(0x7F)   # fraction bits of the above
+_FAC_Q = const(12)      # per-frame factors near 1.0
+_TA_Q = const(4)        # ambient temperature delta
+_V_Q = const(2)         # compensated IR signal
+_KSTO_Q = const(20)     # Ksto coefficient
+
+# temperature in units of 1/32 K at 0 degC, see _fourth_root()
+_ZERO_C = const(8741)
+
+# output value for pixels which can't be computed (negative To**4)
+INVALID_TEMP = const(-32768)
+
+
+def _isqrt(n, guess):
+    # Newton's method for floor(sqrt(n)), starting from a guess; a guess close
+    # to the answer converges in one or two steps
+    if n <= 0:
+        return 0
+    if guess <= 0:
+        guess = n
+    x = (guess + n // guess) >> 1
+    while True:
+        y = (x + n // x) >> 1
+        if y >= x:
+            return x
+        x = y
+
+
+def _fourth_root(x, guess):
+    # temperature in 1/32 K for a fourth power x in units of 16**4 K**4, with
+    # guess in 1/32 K: sqrt(x * 2**8) is T**2/16, and sqrt of that times 2**14
+    # is 32*T
+    y = _isqrt(x << 8, (guess*guess) >> 14)
+    return _isqrt(y << 14, guess)
+
+
+class FixedPointImage:
+    def __init__(self, calib, *, pattern=ChessPattern):
+        self.calib = calib
+        self.pattern = pattern
+
+        collect()
+        ## Object temperature in hundredths of a degC, updated per subpage
+        self.buf = array_filled('h', IMAGE_SIZE, 2500)
+
+        # kta in Q18 and 1/alpha (with gradient compensation for the pixel's
+        # subpage) in Q7 units of 1/(16**4 K**4)
+        self._kta = array_filled('h', IMAGE_SIZE)
+        self._inv_alpha = array_filled('H', IMAGE_SIZE)
+        for idx in range(IMAGE_SIZE):
+            kta = round(calib.pix_kta[idx] * (1 << _KTA_Q))
+            self._kta[idx] = max(-32768, min(32767, kta))
+        self._fill_inv_alpha()
+
+        # interleaved pattern offsets in Q2, only needed for that pattern
+        self._il_offset = None
+        if pattern is InterleavedPattern:
+            self._fill_il_offset()
+
+        # per-frame factor for each kv quadrant in Q12, index by
+        # (row % 2)*2 + col % 2
+        self._kv_fac = array_filled('l', 4, 1 << _FAC_Q)
+        self._ksto = round(calib.ksto[1] * (1 << _KSTO_Q))
+        self._drift = round(calib.drift * 100)
+        collect()
+
+    def set_pattern(self, pattern):
+        """! Switch to another readout pattern, recomputing the tables which
+        depend on it.
+        """
+        if pattern is self.pattern:
+            return
+        self.pattern = pattern
+        if self.calib.use_tgc:
+            self._fill_inv_alpha()
+        if pattern is InterleavedPattern and self._il_offset is None:
+            self._fill_il_offset()
+
+    def _fill_inv_alpha(self):
+        calib = self.calib
+        for idx in range(IMAGE_SIZE):
+            alpha = calib.pix_alpha[idx]
+            if calib.use_tgc:
+                alpha -= calib.tgc*calib.pix_alpha_cp[self.pattern.get_sp(idx)]
+            inv_alpha = round((1 << _INV_ALPHA_Q) / (alpha * 65536.0))
+            self._inv_alpha[idx] = max(0, min(65535, inv_alpha))
+
+    def _fill_il_offset(self):
+        self._il_offset = array('b', (
+            max(-128, min(127, round(off * (1 << _V_Q))))
+            for off in self.calib.il_offset
+        ))
+
+    def update(self, pix_data, subpage, state):
+        """! Convert one subpage of raw data to temperatures in @c self.buf.
+        @param pix_data The raw pixel array, e.g. @c RawImage.pix
+        @param subpage The @c Subpage which was just read
+        @param state The @c CameraState read along with the subpage
+        """
+        if subpage.pattern is not self.pattern:
+            self.set_pattern(subpage.pattern)
+        calib = self.calib
+
+        # convert the camera state to fixed point, once per subpage
+        one = 1 << _FAC_Q
+        ta = round(state.ta * (1 << _TA_Q))
+        gain = round(state.gain * one)
+        kv_fac = self._kv_fac
+        kv_fac[0] = round((1 + calib.kv_avg[0][0]*state.vdd) * one)
+        kv_fac[1] = round((1 + calib.kv_avg[0][1]*state.vdd) * one)
+        kv_fac[2] = round((1 + calib.kv_avg[1][0]*state.vdd) * one)
+        kv_fac[3] = round((1 + calib.kv_avg[1][1]*state.vdd) * one)
+        inv_emissivity = round(one / calib.emissivity)
+        inv_ksta = round(one / (1 + calib.ksta*state.ta))
+        ta_r = round(state.ta_r / 65536.0)
+        tgc_os = 0
+        if calib.use_tgc:
+            tgc_os = round(calib.tgc*self._calc_os_cp(subpage, state) * (1 << _V_Q))
+
+        pix_os_ref = calib.pix_os_ref
+        kta_tab = self._kta
+        inv_alpha_tab = self._inv_alpha
+        il_offset = self._il_offset if subpage.pattern is InterleavedPattern else None
+        ksto = self._ksto
+        drift = self._drift
+        buf = self.buf
+
+        for idx in subpage.sp_range():
+            ## IR data compensation - offset, Vdd and Ta, result in Q2
+            os = pix_os_ref[idx]
+            kta_ta = (kta_tab[idx]*ta) >> (_KTA_Q + _TA_Q - _FAC_Q)
+            offset = os + ((os*kta_ta) >> _FAC_Q)
+            offset = (offset*kv_fac[(idx >> 4) & 0x2 | idx & 0x1]) >> (_FAC_Q - _V_Q)
+
+            v_ir = ((pix_data[idx]*gain) >> (_FAC_Q - _V_Q)) - offset
+            if il_offset is not None:
+                v_ir += il_offset[idx]
+
+            ## emissivity and IR data gradient compensation
+            if inv_emissivity != one:
+                v_ir = (v_ir*inv_emissivity) >> _FAC_Q
+            v_ir -= tgc_os
+
+            ## v_ir/alpha in units of 16**4 K**4; with a typical alpha of
+            ## 1.5e-7, inv_alpha is about 13000 and v_ir*inv_alpha can pass
+            ## 2**30, so the product is taken in two parts, split at the
+            ## binary point of inv_alpha, which give the same result
+            inv_alpha = (inv_alpha_tab[idx]*inv_ksta) >> _FAC_Q
+            q = (v_ir*(inv_alpha >> _INV_ALPHA_Q)
+                 + ((v_ir*(inv_alpha & _INV_ALPHA_FRAC)) >> _INV_ALPHA_Q)) >> _V_Q
+
+            ## Ksto correction: with s = (v_ir/alpha + Ta_r)**(1/4), the To
+            ## equation becomes q/(1 + x) + Ta_r with x = Ksto*(s - 273.15),
+            ## and q/(1 + x) = q - q*x/(1 + x). The pixel's previous
+            ## temperature seeds the roots, so they take only a step or two
+            to4 = q + ta_r
+            if to4 <= 0:
+                buf[idx] = INVALID_TEMP
+                continue
+            guess = ((buf[idx] + 27315)*32)//100
+            s = _fourth_root(to4, guess if guess > 0 else _ZERO_C)
+            x = (ksto*(s - _ZERO_C)) >> (_KSTO_Q - _FAC_Q + 5)
+            # q*x//(1 + x) a part at a time, as q*x passes 2**30 for hot
+            # pixels
+            div = one + x
+            to4 -= (q//div)*x + ((q % div)*x)//div
+            if to4 <= 0:
+                buf[idx] = INVALID_TEMP
+                continue
+
+            ## To in 1/32 K, then hundredths of degC
+            z = _fourth_root(to4, s)
+            to = ((z*25) >> 3) - 27315 + drift
+            buf[idx] = to if to < 32767 else 32767
+
+    def _calc_os_cp(self, subpage, state):
+        pix_os_cp = self.calib.pix_os_cp[subpage.id]
+        if subpage.pattern is InterleavedPattern:
+            pix_os_cp += self.calib.il_chess_c1
+        return state.gain_cp[subpage.id] - pix_os_cp*(1 + self.calib.kta_cp*state.ta)*(1 + self.calib.kv_cp*state.vdd)
+
+
+def accuracy_report(fixed, reference, update_idx=None):
+    """! Compare a @c FixedPointImage with a float @c ProcessedImage which was
+    updated with the same data.
+    @param update_idx The pixels to compare, by default all of them
+    @returns A tuple (maximum error, mean error, worst pixel index, count),
+             errors in hundredths of a degree
+    """
+    max_err, sum_err, worst, count = 0, 0, None, 0
+    for idx in update_idx or range(IMAGE_SIZE):
+        if fixed.buf[idx] == INVALID_TEMP:
+            continue
+        err = abs(fixed.buf[idx] - round(reference.buf[idx] * 100))
+        sum_err += err
+        count += 1
+        if worst is None or err > max_err:
+            max_err, worst = err, idx
+    mean_err = sum_err / count if count else 0.0
+    return max_err, mean_err, worst, count
@@ -0,0 +1,97 @@
+"""!
+@file framelog.py
+This file contains a recorder which logs MLX90640 images to a file, to be
+read on a PC with @c tools/framelog.py.
+"""
+
+import struct
+import utime as time
+from mlx90640.utils import array_filled
+from mlx90640.calibration import NUM_ROWS, NUM_COLS, IMAGE_SIZE
+
+LOG_MAGIC = b'MLXF'
+LOG_VERSION = const(1)
+
+# file header: magic, version, rows, columns and record header size
+HEADER_FMT = '<4sHHHH'
+# record header: sequence number, ticks_ms() timestamp, last subpage read,
+# flags and encoder positions (yaw, pitch); the raw pixels follow in sensor
+# order, as in RawImage.pix
+RECORD_FMT = '<IIBBxxll'
+
+# record flags
+FLAG_WINDOW = const(0x01)   # only a window of the image was read
+
+
+class FrameLogWriter:
+    def __init__(self, path, depth=4):
+        """!
+        @param path The file to write, which is replaced if it exists
+        @param depth The number of images which can wait to be written; each
+               takes about 1.5 kB
+        """
+        self._file = open(path, 'wb')
+        self._file.write(struct.pack(HEADER_FMT, LOG_MAGIC, LOG_VERSION,
+                                     NUM_ROWS, NUM_COLS,
+                                     struct.calcsize(RECORD_FMT)))
+        self._records = [bytearray(struct.calcsize(RECORD_FMT))
+                         for _ in range(depth)]
+        self._pix = [array_filled('h', IMAGE_SIZE) for _ in range(depth)]
+        # next slot to fill, and the number of filled slots not yet written
+        self._head = 0
+        self._pending = 0
+        ## Number of images given to @c write() so far; records are numbered
+        #  by this, so dropped images leave gaps
+        self.count = 0
+        ## Number of images dropped because the ring was full
+        self.dropped = 0
+
+    def write(self, pix, subpage, timestamp=None, positions=(0, 0), flags=0):
+        """! Add one image to the log. The image is copied, and written to
+        the file by a later @c drain().
+        @param pix The pixel array of the image, e.g. @c RawImage.pix
+        @param subpage The last subpage which was read into it
+        @param timestamp The time the image was taken, by default now
+               (@c ticks_ms())
+        @param positions The encoder positions (yaw, pitch) at that time
+        @returns @c False if the image was dropped as the ring was full
+        """
+        depth = len(self._records)
+        self.count += 1
+        if self._pending == depth:
+            self.dropped += 1
+            return False
+        if timestamp is None:
+            timestamp = time.ticks_ms()
+        slot = self._head
+        struct.pack_into(RECORD_FMT, self._records[slot], 0, self.count - 1,
+                         timestamp, subpage, flags, positions[0], positions[1])
+        self._pix[slot][:] = pix
+        self._head = (slot + 1) % depth
+        self._pending += 1
+        return True
+
+    def drain(self, limit=None):
+        """! Write waiting images to the file, oldest first. Each one is
+        about 1.5 kB, so with a @c limit of 1 this can be called from a task
+        without holding the others up for long.
+        @param limit The most images to write, or @c None for all of them
+        @returns The number of images still waiting
+        """
+        depth = len(self._records)
+        while self._pending and (limit is None or limit > 0):
+            slot = (self._head - self._pending) % depth
+            self._file.write(self._records[slot])
+            self._file.write(self._pix[slot])
+            self._pending -= 1
+            if limit is not None:
+                limit -= 1
+        return self._pending
+
+    def flush(self):
+        self.drain()
+        self._file.flush()
+
+    def close(self):
+        self.drain()
+        self._file.close()
@@ -0,0 +1,114 @@
+"""!
+@file framering.py
+This file contains a ring of preallocated frame buffers for the MLX90640
+camera driver.
+"""
+
+import utime as time
+from mlx90640.calibration import IMAGE_SIZE
+from mlx90640.regmap import REG_SIZE
+from mlx90640.image import RawImage, PIX_BURST_SIZE
+
+# frame states
+FRAME_FREE = const(0)
+FRAME_WRITING = const(1)
+FRAME_READY = const(2)
+FRAME_READING = const(3)
+
+
+class Frame(RawImage):
+    def __init__(self, index, burst_size=PIX_BURST_SIZE, staging=None):
+        super().__init__(burst_size, staging)
+        ## Position of the frame in its ring
+        self.index = index
+        ## Sequence number, counting up from 0 with each published frame
+        self.seq = -1
+        ## Capture time from @c utime.ticks_us()
+        self.timestamp = 0
+
+
+class FrameRing:
+    def __init__(self, count=2, burst_size=PIX_BURST_SIZE, staging=None):
+        """!
+        @param count Number of frames; two are enough for one capture task and
+               one consumer, more let the consumer fall further behind
+        @param staging A burst read buffer to share with other images which are
+               never read at the same time, or @c None to allocate one
+        """
+        if count < 2:
+            raise ValueError("a frame ring needs at least 2 frames")
+
+        # all frames are filled by the same capture path, one at a time, so
+        # they can share a single staging buffer
+        staging = staging or bytearray(IMAGE_SIZE * REG_SIZE)
+        self.frames = tuple(
+            Frame(idx, burst_size, staging) for idx in range(count)
+        )
+        self._state = bytearray(count)
+        self._latest = None
+        self._next_seq = 0
+
+    def acquire_write(self):
+        """!
+        Get a frame to capture into. The frame starts out as a copy of the
+        newest published frame, so that a frame which is filled one subpage
+        at a time is complete. An unread frame may be reused, which drops it.
+        @returns A @c Frame, or @c None if every frame is being read
+        """
+        state = self._state
+        latest = self._latest
+        frame = None
+        for candidate in self.frames:
+            if state[candidate.index] == FRAME_FREE:
+                frame = candidate
+                # prefer any frame other than the newest one
+                if candidate is not latest:
+                    break
+        if frame is None:
+            for candidate in self.frames:
+                if state[candidate.index] == FRAME_READY:
+                    frame = candidate
+                    break
+            else:
+                return None
+
+        if latest is not None and frame is not latest:
+            memoryview(frame.pix)[:] = memoryview(latest.pix)
+        state[frame.index] = FRAME_WRITING
+        return frame
+
+    def publish(self, frame, timestamp=None):
+        """!
+        Hand a filled frame over to the consumer. An older frame which has
+        been published but not read yet is freed, as it's now out of date.
+        @param timestamp The capture time, by default now (@c ticks_us())
+        """
+        state = self._state
+        latest = self._latest
+        if latest is not None and latest is not frame \
+                and state[latest.index] == FRAME_READY:
+            state[latest.index] = FRAME_FREE
+
+        frame.seq = self._next_seq
+        self._next_seq += 1
+        frame.timestamp = time.ticks_us() if timestamp is None else timestamp
+        state[frame.index] = FRAME_READY
+        self._latest = frame
+
+    def acquire_read(self):
+        """!
+        Get the newest published frame which hasn't been read yet.
+        @returns A @c Frame, or @c None if there is no new frame
+        """
+        latest = self._latest
+        if latest is None or self._state[latest.index] != FRAME_READY:
+            return None
+        self._state[latest.index] = FRAME_READING
+        return latest
+
+    def release(self, frame):
+        """!
+        Give back a frame obtained from @c acquire_read() or, to abandon a
+        capture, from @c acquire_write().
+        """
+        self._state[frame.index] = FRAME_FREE
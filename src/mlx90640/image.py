@@ -9,7 +9,6 @@ not calibrated data, in order to save memory.
 """
 
 import math
-import struct
 from array import array
 from ucollections import namedtuple
 from mlx90640.utils import (
@@ -20,18 +19,20 @@ from mlx90640.utils import (
 )
 
 from mlx90640.regmap import REG_SIZE
-from mlx90640.calibration import NUM_COLS, IMAGE_SIZE, TEMP_K
+from mlx90640.calibration import NUM_ROWS, NUM_COLS, IMAGE_SIZE, TEMP_K
+from mlx90640.indexmap import subpage_map, window_map
 
-PIX_STRUCT_FMT = '>h'
 PIX_DATA_ADDRESS = const(0x0400)
 
+# largest number of pixel words fetched in a single I2C transaction (8 rows);
+# the camera auto-increments the RAM address, so one burst covers many pixels
+PIX_BURST_SIZE = const(256)
+
 class _BasePattern:
     @classmethod
     def sp_range(cls, sp_id):
-        return (
-            idx for idx, sp in enumerate(cls.iter_sp()) 
-            if sp == sp_id
-        )
+        # cached table of the pixel indices in the subpage
+        return subpage_map(cls, sp_id)
 
     @classmethod
     def iter_sp(cls):
@@ -73,18 +74,61 @@ class Subpage:
 ## Image Buffers
 
 class RawImage:
-    def __init__(self):
+    def __init__(self, burst_size=PIX_BURST_SIZE, staging=None):
         self.pix = array_filled('h', IMAGE_SIZE)
+        # staging area for burst reads of the pixel RAM, allocated once; images
+        # which are never read at the same time may share one
+        self.burst_size = burst_size
+        self.staging = staging or bytearray(IMAGE_SIZE * REG_SIZE)
+        self._view = memoryview(self.staging)
 
     def __getitem__(self, idx):
         return self.pix[idx]
 
     def read(self, iface, update_idx = None):
-        buf = bytearray(REG_SIZE)
-        update_idx = update_idx or range(IMAGE_SIZE)
-        for offset in update_idx:
-            iface.read_into(PIX_DATA_ADDRESS + offset, buf)
-            self.pix[offset] = struct.unpack(PIX_STRUCT_FMT, buf)[0]
+        self.read_block(iface, 0, IMAGE_SIZE)
+        self.unpack(update_idx or range(IMAGE_SIZE))
+
+    def read_window(self, iface, row, col, rows, cols, pattern=None, sp_id=None):
+        # read only a rectangle of the sensor (unmirrored coordinates), one
+        # burst per row, and update the pixels of the given subpage within it;
+        # the rest of the image keeps its previous values
+        # the ends are found before the start is clipped, so that a window
+        # hanging over the top or left edge keeps its size on the sensor
+        row_end = min(row + rows, NUM_ROWS)
+        col_end = min(col + cols, NUM_COLS)
+        row = max(row, 0)
+        col = max(col, 0)
+        if row >= row_end or col >= col_end:
+            return
+        for r in range(row, row_end):
+            self.read_block(iface, r*NUM_COLS + col, col_end - col)
+        self.unpack(window_map(row, col, row_end - row, col_end - col,
+                               pattern, sp_id))
+
+    def read_block(self, iface, start, count):
+        # copy a contiguous run of pixel words into the staging buffer using as
+        # few transactions as the burst size allows
+        view = self._view
+        end = start + count
+        while start < end:
+            size = min(end - start, self.burst_size)
+            iface.read_into(
+                PIX_DATA_ADDRESS + start,
+                view[start*REG_SIZE:(start + size)*REG_SIZE]
+            )
+            start += size
+
+    def unpack(self, update_idx):
+        # decode big-endian int16 words from the staging buffer in place
+        buf = self._view
+        pix = self.pix
+        for idx in update_idx:
+            pos = idx * REG_SIZE
+            value = (buf[pos] << 8) | buf[pos + 1]
+            if value & 0x8000:
+                value -= 0x10000
+            pix[idx] = value
 
 
 ImageLimits = namedtuple('ScaleLimits', ('min_h', 'max_h', 'min_idx', 'max_idx'))
@@ -96,123 +140,4 @@ _INTERP_NEIGHBOURS = tuple(
     if row != 0 or col != 0
 )
 
-# class ProcessedImage:
-#     def __init__(self, calib):
-#         # pix_data should be a sequence of ints
-#         self.calib = calib
-#         self.v_ir = array_filled('f', IMAGE_SIZE, 0.0)
-#         self.alpha = array_filled('f', IMAGE_SIZE, 1.0)
-#         self.buf = array_filled('f', IMAGE_SIZE, 1.0)
-# 
-#     def update(self, pix_data, subpage, state):
-#         if self.calib.use_tgc:
-#             pix_os_cp = self._calc_os_cp(subpage, state)
-#             pix_alpha_cp = self.calib.pix_alpha_cp[subpage.id]
-# 
-#         for idx, raw in pix_data:
-#             ## IR data compensation - offset, Vdd, and Ta
-#             kta = self.calib.pix_kta[idx]
-# 
-#             row, col = divmod(idx, NUM_COLS)
-#             kv = self.calib.kv_avg[row % 2][col % 2]
-#             
-#             offset = self.calib.pix_os_ref[idx]
-#             offset *= (1 + kta*state.ta)*(1 + kv*state.vdd)
-# 
-#             v_os = raw*state.gain - offset
-#             if subpage.pattern is InterleavedPattern:
-#                 v_os += self.calib.il_offset[idx]
-#             v_ir = v_os / self.calib.emissivity
-# 
-#             ## IR data gradient compensation
-#             if self.calib.use_tgc:
-#                 v_ir -= self.calib.tgc*pix_os_cp
-# 
-#             # preserve v_ir for temperature calculations
-#             self.v_ir[idx] = v_ir
-# 
-#             alpha = self._calc_alpha(idx, state.ta)
-#             self.buf[idx] = v_ir/alpha
-# 
-#     def _calc_os_cp(self, subpage, state):
-#         pix_os_cp = self.calib.pix_os_cp[subpage.id]
-#         if subpage.pattern is InterleavedPattern:
-#             pix_os_cp += self.calib.il_chess_c1
-#         return state.gain_cp[subpage.id] - pix_os_cp*(1 + self.calib.kta_cp*state.ta)*(1 + self.calib.kv_cp*state.vdd)
-# 
-#     def _calc_os_cp2(self, pattern, state):
-#         pix_os_cp = list(self.calib.pix_os_cp)
-#         if pattern is InterleavedPattern:
-#             for i in range(len(pix_os_cp)):
-#                 pix_os_cp[i] += self.calib.il_chess_c1
-# 
-#         k = (1 + self.calib.kta_cp*state.ta)*(1 + self.calib.kv_cp*state.vdd)
-#         return [
-#             gain_cp_sp - pix_os_cp_sp*k
-#             for pix_os_cp_sp, gain_cp_sp in zip(pix_os_cp, state.gain_cp)
-#         ]
-# 
-#     def _calc_alpha(self, idx, ta):
-#         alpha = self.calib.pix_alpha[idx]
-#         if self.calib.use_tgc:
-#             alpha -= self.calib.tgc*pix_alpha_cp
-#         alpha *= (1 + self.calib.ksta*ta)
-#         return alpha
-# 
-#     def _calc_to(self, idx, alpha, ta_r):
-#         v_ir = self.v_ir[idx]
-# 
-#         s_x = v_ir*(alpha**3) + ta_r*(alpha**4)
-#         s_x = math.sqrt(math.sqrt(s_x))*self.calib.ksto[1]
-# 
-#         to = v_ir/(alpha*(1 - TEMP_K*self.calib.ksto[1]) + s_x) + ta_r
-#         to = math.sqrt(math.sqrt(to)) - TEMP_K
-#         return to + self.calib.drift
-# 
-#     def calc_temperature(self, idx, state):
-#         alpha = self._calc_alpha(idx, state.ta)
-#         return self._calc_to(idx, alpha, state.ta_r)
-# 
-#     def calc_temperature_ext(self, idx, state):
-#         v_ir = self.v_ir[idx]
-#         alpha = self._calc_alpha(idx, state.ta)
-#         to = self._calc_to(idx, alpha, state.ta_r)
-# 
-#         band = self._get_range_band(to)
-#         if band < 0:
-#             return self.calib.ct[0]
-# 
-#         alpha_ext = self.calib.alpha_ext[band]
-#         ksto_ext = self.calib.ksto[band]
-#         ct = self.calib.ct[band]
-#         to_ext = v_ir/(alpha*alpha_ext*(1 + ksto_ext*(to - ct))) + state.ta_r
-#         to_ext = math.sqrt(math.sqrt(to_ext)) - TEMP_K
-#         return to_ext  + self.calib.drift
-# 
-#     def _get_range_band(self, t):
-#         return sum(1 for ct in self.calib.ct if t >= ct) - 1
-# 
-#     def calc_limits(self, *, exclude_idx=()):
-#         # find min/max in place to keep mem usage down
-#         min_h, min_idx = None, None
-#         max_h, max_idx = None, None
-#         for idx, h in enumerate(self.buf):
-#             if idx in exclude_idx:
-#                 continue
-#             if min_h is None or h < min_h:
-#                 min_h, min_idx = h, idx
-#             if max_h is None or h > max_h:
-#                 max_h, max_idx = h, idx
-#         return ImageLimits(min_h, max_h, min_idx, max_idx)
-# 
-#     def interpolate_bad_pixels(self, bad_pixels):
-#         for bad_idx in bad_pixels:
-#             count = 0
-#             total = 0
-#             for offset in _INTERP_NEIGHBOURS:
-#                 idx = bad_idx + offset
-#                 if idx in range(IMAGE_SIZE) and idx not in bad_pixels:
-#                     count += 1
-#                     total += self.buf[idx]
-#             if count > 0:
-#                 self.buf[bad_idx] = total/count
+# the calibrated ProcessedImage lives in mlx90640.processing
@@ -0,0 +1,78 @@
+"""!
+@file indexmap.py
+This file contains cached pixel index tables for the MLX90640 camera driver.
+"""
+
+from array import array
+from mlx90640.calibration import NUM_ROWS, NUM_COLS, IMAGE_SIZE
+
+# window tables are cheap to build but may be requested for many different
+# rectangles, so only a handful are kept around at a time
+_WINDOW_CACHE_SIZE = const(4)
+
+_subpage_maps = {}
+_display_maps = {}
+_window_maps = {}
+
+
+def subpage_map(pattern, sp_id):
+    """! Indices of the pixels which belong to subpage @c sp_id of @c pattern.
+    """
+    key = pattern.pattern_id << 1 | sp_id
+    idx_map = _subpage_maps.get(key)
+    if idx_map is None:
+        idx_map = array('H', (
+            idx for idx in range(IMAGE_SIZE)
+            if pattern.get_sp(idx) == sp_id
+        ))
+        _subpage_maps[key] = idx_map
+    return idx_map
+
+
+def display_map(width=NUM_COLS, height=NUM_ROWS):
+    """! Pixel indices in display order, which is row by row with each row
+    mirrored left to right so the image looks the way the scene does.
+    """
+    key = width << 8 | height
+    idx_map = _display_maps.get(key)
+    if idx_map is None:
+        idx_map = array('H', (
+            row * width + (width - col - 1)
+            for row in range(height)
+            for col in range(width)
+        ))
+        _display_maps[key] = idx_map
+    return idx_map
+
+
+def window_map(row, col, rows, cols, pattern=None, sp_id=None):
+    """! Indices of the pixels inside a rectangular window of the sensor,
+    given in sensor (unmirrored) coordinates and clipped to the image. If a
+    pattern and subpage are given, only pixels of that subpage are included.
+    """
+    row_end = min(row + rows, NUM_ROWS)
+    col_end = min(col + cols, NUM_COLS)
+    row = max(row, 0)
+    col = max(col, 0)
+
+    key = (row, col, row_end, col_end, pattern, sp_id)
+    idx_map = _window_maps.get(key)
+    if idx_map is None:
+        idx_map = array('H', (
+            r * NUM_COLS + c
+            for r in range(row, row_end)
+            for c in range(col, col_end)
+            if pattern is None or pattern.get_sp(r * NUM_COLS + c) == sp_id
+        ))
+        if len(_window_maps) >= _WINDOW_CACHE_SIZE:
+            _window_maps.clear()
+        _window_maps[key] = idx_map
+    return idx_map
+
+
+def clear_cache():
+    """! Drop all cached tables, e.g. to reclaim memory.
+    """
+    _subpage_maps.clear()
+    _display_maps.clear()
+    _window_maps.clear()
@@ -27,6 +27,12 @@ from machine import Pin, I2C
 from mlx90640 import MLX90640
 from mlx90640.calibration import NUM_ROWS, NUM_COLS, IMAGE_SIZE, TEMP_K
 from mlx90640.image import ChessPattern, InterleavedPattern
+from mlx90640.indexmap import display_map
+from mlx90640.framering import FrameRing
+from mlx90640.autoconfig import auto_configure, DEFAULT_HEADROOM
+from mlx90640.targeting import find_hotspot
+from mlx90640.framelog import FrameLogWriter, FLAG_WINDOW
+from mlx90640.preview import Preview
 
 class MLX_Cam:
     """!
@@ -35,7 +41,7 @@ class MLX_Cam:
     """
 
     def __init__(self, i2c, address=0x33, pattern=ChessPattern,
-                 width=NUM_COLS, height=NUM_ROWS):
+                 width=NUM_COLS, height=NUM_ROWS, frames=0, fmplus=None):
         """!
         @brief   Set up an MLX90640 camera.
         @param   i2c An I2C bus which has been set up to talk to the camera;
@@ -45,6 +51,11 @@ class MLX_Cam:
                  the pixels at a time (default ChessPattern)
         @param   width The width of the image in pixels; leave it at default
         @param   height The height of the image in pixels; leave it at default
+        @param   frames The number of frames in a ring for pipelined capture
+                 with @c capture_frame(), or 0 for no ring (default 0)
+        @param   fmplus @c True or @c False to turn the camera's FM+ I2C mode on
+                 or off, as chosen by @c mlx90640.bustune for the bus clock, or
+                 @c None to leave it as it is (default None)
         """
         ## The I2C bus to which the camera is attached
         self._i2c = i2c
@@ -59,12 +70,151 @@ class MLX_Cam:
 
         # The MLX90640 object that does the work
         self._camera = MLX90640(i2c, address)
+        if fmplus is not None:
+            self._camera.registers['fmplus_disable'] = 0 if fmplus else 1
         self._camera.set_pattern(pattern)
         self._camera.setup()
 
         ## A local reference to the image object within the camera driver
         self._image = self._camera.raw
 
+        ## How often, in milliseconds, to ask the camera whether a new subpage
+        #  is ready when acquiring without blocking
+        self.poll_ms = self._poll_interval()
+
+        ## The profile chosen by @c auto_configure(), or @c None if the camera
+        #  is running at its power-on settings
+        self.profile = None
+
+        ## Window which images are read through, as (row, col, rows, cols) in
+        #  sensor coordinates, or @c None to read whole images
+        self._window = None
+        ## Every this many images, a whole image is read despite the window
+        self.full_every = 0
+        # images read through the window since the last whole one
+        self._since_full = 0
+
+        # live preview renderer, created when first used
+        self._preview = None
+
+        ## Log which every image read is recorded in, or @c None
+        self.log = None
+        # function which returns the encoder positions for the log
+        self._log_positions = None
+
+        ## Preallocated frames shared between capture and processing tasks, or
+        #  @c None if they aren't being used
+        self.frames = None
+        if frames:
+            self.frames = FrameRing(frames, staging=self._image.staging)
+
+
+    def _poll_interval(self):
+        """!
+        @brief   Work out a polling interval from the camera's refresh rate.
+        @details A new subpage becomes ready once per refresh period; polling
+                 four times per period finds it without much delay while
+                 leaving the I2C bus and the CPU alone most of the time.
+        """
+        return int(1000 / (self._camera.refresh_rate * 4))
+
+
+    def auto_configure(self, process=None, headroom=DEFAULT_HEADROOM):
+        """!
+        @brief   Set the fastest refresh rate which this I2C bus and the
+                 processing code can keep up with, and an ADC resolution to
+                 suit the scene.
+        @details Reading a subpage (and running @c process on it, if given) is
+                 timed on the real bus, then the highest refresh rate at which
+                 that takes no more than @c headroom of each refresh period is
+                 written to the camera, along with the finest ADC resolution
+                 at which the hottest pixel read stays well clear of clipping.
+                 The polling interval is updated to match. The result is kept
+                 in @c profile.
+        @param   process A function which is called with the raw image, such as
+                 the targeting code, to include its run time in the budget
+        @param   headroom The fraction of each refresh period which may be used
+        @returns The chosen profile, whose @c throughput field holds the
+                 measured readout and processing times in microseconds, the
+                 bus throughput in bytes per second and the hottest pixel
+        """
+        self.profile = auto_configure(self._camera, process,
+                                      headroom=headroom)
+        self.poll_ms = self._poll_interval()
+        return self.profile
+
+
+    def set_window(self, row, col, rows, cols, full_every=8):
+        """!
+        @brief   Read only a window of the image, such as the area around the
+                 last target, to cut the time spent on the I2C bus.
+        @details Pixels outside the window keep their old values. A whole image
+                 is still read every @c full_every images so that new targets
+                 elsewhere are seen.
+        @param   row The top row of the window
+        @param   col The left column of the window, in the same mirrored
+                 orientation as the displayed image and @c get_csv() columns
+        @param   rows The height of the window in pixels
+        @param   cols The width of the window in pixels
+        @param   full_every Read a whole image after this many windowed ones
+        """
+        self._window = (row, self._width - col - cols, rows, cols)
+        self.full_every = full_every
+        self._since_full = 0
+
+
+    def clear_window(self):
+        """!
+        @brief   Go back to reading whole images.
+        """
+        self._window = None
+
+
+    def _next_window(self):
+        """!
+        @brief   Get the window for the next image, or @c None for a whole one.
+        """
+        if self._window is None or self._since_full >= self.full_every:
+            self._since_full = 0
+            return None
+        self._since_full += 1
+        return self._window
+
+
+    def start_log(self, path, positions=None):
+        """!
+        @brief   Record every image read from now on in a frame log file.
+        @details The log can be read on a PC and fed through the targeting
+                 code with the tools in the repository's @c tools directory.
+        @param   path The log file to write, which is replaced if it exists
+        @param   positions A function which returns the encoder positions
+                 (yaw, pitch) to record with each image, or @c None
+        """
+        self.stop_log()
+        self.log = FrameLogWriter(path)
+        self._log_positions = positions
+
+
+    def stop_log(self):
+        """!
+        @brief   Stop recording images and close the log file.
+        """
+        if self.log is not None:
+            self.log.close()
+            self.log = None
+
+
+    def _log_image(self, image, window):
+        """!
+        @brief   Add an image which has just been read to the log, if logging.
+        """
+        if self.log is None:
+            return
+        positions = self._log_positions() if self._log_positions else (0, 0)
+        self.log.write(image.pix, self._camera.last_read.id,
+                       positions=positions,
+                       flags=FLAG_WINDOW if window is not None else 0)
+
 
     def ascii_image(self, array, pixel="██", textcolor="0;180;0"):
         """!
@@ -100,14 +250,33 @@ class MLX_Cam:
         """
         minny = min(array)
         scale = 255.0 / (max(array) - minny)
+        order = display_map(self._width, self._height)
+        pos = 0
         for row in range(self._height):
             for col in range(self._width):
-                pix = int((array[row * self._width + (self._width - col - 1)]
-                           - minny) * scale)
+                pix = int((array[order[pos]] - minny) * scale)
+                pos += 1
                 print(f"\033[38;2;{pix};{pix};{pix}m{pixel}", end='')
             print(f"\033[38;2;{textcolor}m")
 
 
+    def live_preview(self, array):
+        """!
+        @brief   Show camera data on an ANSI terminal quickly enough to keep up
+                 with the camera.
+        @details Unlike @c ascii_image(), the whole image is sent in one write,
+                 and after the first call only the pixels whose shade changed
+                 are redrawn. The image is drawn at the top left of the screen,
+                 which is cleared on the first call. Scaling is automatic, from
+                 the coldest to the hottest pixel.
+        @param   array An array of (self._width * self._height) pixel values
+        @returns The number of pixels which were redrawn
+        """
+        if self._preview is None:
+            self._preview = Preview(self._width, self._height)
+        return self._preview.show(array)
+
+
     ## A "standard" set of characters of different densities to make ASCII art
     asc = " -.:=+*#%@"
 
@@ -122,11 +291,13 @@ class MLX_Cam:
         """
         scale = len(MLX_Cam.asc) / (max(array) - min(array))
         offset = -min(array)
+        order = display_map(self._width, self._height)
+        pos = 0
         for row in range(self._height):
             line = ""
             for col in range(self._width):
-                pix = int((array[row * self._width + (self._width - col - 1)]
-                           + offset) * scale)
+                pix = int((array[order[pos]] + offset) * scale)
+                pos += 1
                 try:
                     the_char = MLX_Cam.asc[pix]
                     print(f"{the_char}{the_char}", end='')
@@ -152,11 +323,13 @@ class MLX_Cam:
         else:
             offset = 0.0
             scale = 1.0
+        order = display_map(self._width, self._height)
+        pos = 0
         for row in range(self._height):
             line = ""
             for col in range(self._width):
-                pix = int((array[row * self._width + (self._width - col - 1)]
-                          + offset) * scale)
+                pix = int((array[order[pos]] + offset) * scale)
+                pos += 1
                 if col:
                     line += ","
                 line += f"{pix}"
@@ -164,7 +337,21 @@ class MLX_Cam:
         return
 
 
-    def get_image(self):
+    def find_hotspot(self, image=None):
+        """!
+        @brief   Find the hottest spot in an image without converting it to text.
+        @details The search is done on the raw pixel values. Each pixel is
+                 smoothed with its left and right neighbours, and the border
+                 rows and columns are left out. Rows and columns are in the
+                 same mirrored orientation as @c get_csv().
+        @param   image The image to search, by default the camera's own image
+        @returns A @c Hotspot with the row, column and score of the spot along
+                 with the minimum and maximum pixel values of the image
+        """
+        return find_hotspot((image or self._image).pix)
+
+
+    def get_image(self, quiet=False):
         """!
         @brief   Get one image from a MLX90640 camera.
         @details Grab one image from the given camera and return it. Both
@@ -173,12 +360,99 @@ class MLX_Cam:
                  combination is sketchy and not fully tested). It is assumed
                  that the camera is in the ChessPattern (default) mode as it
                  probably should be.
+        @param   quiet If @c True, don't print a dot each time the camera
+                 isn't ready yet, e.g. while a preview is on the screen
         @returns A reference to the image object we've just filled with data
         """
+        window = self._next_window()
         for subpage in (0, 1):
             while not self._camera.has_data:
                 time.sleep_ms(50)
-                print('.', end='')
-            image = self._camera.read_image(subpage)
+                if not quiet:
+                    print('.', end='')
+            image = self._camera.read_image(subpage, window=window)
+
+        self._log_image(image, window)
+        return image
+
+
+    def get_image_nonblocking(self):
+        """!
+        @brief   Get one image from the camera without blocking other tasks.
+        @details This generator does the same job as @c get_image(), but
+                 whenever the camera doesn't have a new subpage ready it
+                 yields so the scheduler can run other tasks, such as motor
+                 control, in the meantime. The camera is asked for data at
+                 most once every @c poll_ms milliseconds. Use it from within a
+                 task as follows:
+                 @code
+                 image = yield from camera.get_image_nonblocking()
+                 @endcode
+        @returns A reference to the image object we've just filled with data
+        """
+        window = self._next_window()
+        for subpage in (0, 1):
+            yield from self._wait_for_data()
+            image = self._camera.read_image(subpage, window=window)
+
+        self._log_image(image, window)
+        return image
 
-        return image
\ No newline at end of file
+
+    def _wait_for_data(self):
+        """!
+        @brief   Yield until the camera has a new subpage, asking it every
+                 @c poll_ms milliseconds.
+        """
+        while not self._camera.has_data:
+            last_poll = time.ticks_ms()
+            while time.ticks_diff(time.ticks_ms(), last_poll) < self.poll_ms:
+                yield
+
+
+    def capture_frame(self):
+        """!
+        @brief   Capture one image into the frame ring without blocking other
+                 tasks.
+        @details Both subpages are read into a free frame of the ring, which is
+                 then published with a sequence number and a timestamp for a
+                 processing task to pick up with @c latest_frame(). Frames which
+                 are being processed are never written to. The camera must have
+                 been created with @c frames set. Use it from within a task as
+                 follows:
+                 @code
+                 frame = yield from camera.capture_frame()
+                 @endcode
+        @returns The frame which was just published, or @c None if every frame
+                 is still held by the processing side
+        """
+        frame = self.frames.acquire_write()
+        if frame is None:
+            return None
+
+        window = self._next_window()
+        for subpage in (0, 1):
+            yield from self._wait_for_data()
+            self._camera.read_image(subpage, image=frame, window=window)
+
+        self.frames.publish(frame)
+        self._log_image(frame, window)
+        return frame
+
+
+    def latest_frame(self):
+        """!
+        @brief   Get the newest captured frame for processing.
+        @details The frame won't be written to until it's handed back with
+                 @c release_frame(). Its @c seq and @c timestamp attributes
+                 tell when it was captured.
+        @returns A frame, or @c None if nothing new has been captured
+        """
+        return self.frames.acquire_read()
+
+
+    def release_frame(self, frame):
+        """!
+        @brief   Hand a frame from @c latest_frame() back to the ring.
+        """
+        self.frames.release(frame)
@@ -0,0 +1,115 @@
+"""!
+@file preview.py
+This file contains a live preview of MLX90640 images on an ANSI terminal.
+"""
+
+import sys
+from mlx90640.calibration import NUM_ROWS, NUM_COLS
+from mlx90640.indexmap import display_map
+
+# first and number of grey levels in the 256-colour palette
+_GREY_BASE = const(232)
+_GREY_LEVELS = const(24)
+
+# no shade has been drawn in a cell yet
+_UNDRAWN = const(0xFF)
+
+# largest escape sequence for one cell: cursor position, colour and 2 spaces
+_CELL_BYTES = const(22)
+
+
+class Preview:
+    def __init__(self, width=NUM_COLS, height=NUM_ROWS, buf_size=4096):
+        """!
+        @param buf_size The size of the output buffer in bytes. A frame which
+               needs more, such as the first one, is written in several parts.
+        """
+        self.width = width
+        self.height = height
+        self._order = display_map(width, height)
+        self._shades = bytearray(width * height)
+        self._buf = bytearray(max(buf_size, 2*_CELL_BYTES))
+        self._view = memoryview(self._buf)
+        self._out = getattr(sys.stdout, 'buffer', sys.stdout)
+        self.reset()
+
+    def reset(self):
+        """! Clear the screen and redraw everything on the next frame.
+        """
+        for idx in range(len(self._shades)):
+            self._shades[idx] = _UNDRAWN
+        self._clear = True
+
+    def _put(self, pos, data):
+        # copy bytes into the buffer
+        end = pos + len(data)
+        self._buf[pos:end] = data
+        return end
+
+    def _put_int(self, pos, value):
+        # decimal digits of a small non-negative int, without making a string
+        buf = self._buf
+        if value >= 100:
+            buf[pos] = 0x30 + value // 100
+            pos += 1
+        if value >= 10:
+            buf[pos] = 0x30 + value // 10 % 10
+            pos += 1
+        buf[pos] = 0x30 + value % 10
+        return pos + 1
+
+    def _flush(self, pos):
+        if pos:
+            self._out.write(self._view[:pos])
+        return 0
+
+    def show(self, array):
+        """! Draw an image, updating only the cells which have changed.
+        @param array The pixel values, e.g. @c RawImage.pix
+        @returns The number of cells redrawn
+        """
+        min_h = min(array)
+        span = max(array) - min_h
+        if span == 0:
+            span = 1
+        order = self._order
+        shades = self._shades
+        # room for one more cell and the trailer
+        limit = len(self._buf) - 2*_CELL_BYTES
+        pos = 0
+        if self._clear:
+            pos = self._put(pos, b'\x1b[2J')
+            self._clear = False
+
+        cell, drawn = 0, 0
+        last_cell, last_shade = -2, -1
+        for row in range(self.height):
+            for col in range(self.width):
+                shade = (array[order[cell]] - min_h) * (_GREY_LEVELS - 1) // span
+                if shade != shades[cell]:
+                    shades[cell] = shade
+                    drawn += 1
+                    if pos > limit:
+                        pos = self._flush(pos)
+                    # the cursor is already in place after the previous cell
+                    if cell != last_cell + 1 or col == 0:
+                        pos = self._put(pos, b'\x1b[')
+                        pos = self._put_int(pos, row + 1)
+                        pos = self._put(pos, b';')
+                        pos = self._put_int(pos, 2*col + 1)
+                        pos = self._put(pos, b'H')
+                    if shade != last_shade:
+                        pos = self._put(pos, b'\x1b[48;5;')
+                        pos = self._put_int(pos, _GREY_BASE + shade)
+                        pos = self._put(pos, b'm')
+                        last_shade = shade
+                    pos = self._put(pos, b'  ')
+                    last_cell = cell
+                cell += 1
+
+        # leave the cursor below the image with the colours reset
+        pos = self._put(pos, b'\x1b[0m\x1b[')
+        pos = self._put_int(pos, self.height + 1)
+        pos = self._put(pos, b';1H')
+        self._flush(pos)
+        return drawn
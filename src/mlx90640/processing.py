@@ -0,0 +1,171 @@
+"""!
+@file processing.py
+This file contains the calibrated image processing engine for the MLX90640
+camera driver.
+"""
+
+import math
+from gc import collect
+from mlx90640.utils import array_filled
+from mlx90640.calibration import NUM_COLS, IMAGE_SIZE, TEMP_K
+from mlx90640.image import (
+    ChessPattern,
+    InterleavedPattern,
+    ImageLimits,
+    _INTERP_NEIGHBOURS,
+)
+
+# bytes taken by one table of per-pixel floats
+_TABLE_SIZE = const(4 * 768)
+
+# default cap on the heap used by the engine's own buffers (output plus
+# precomputed tables); the calibration arrays it reads are not counted
+DEFAULT_BUDGET = const(3 * 4 * 768)
+
+
+class ProcessedImage:
+    def __init__(self, calib, *, pattern=ChessPattern, budget=DEFAULT_BUDGET):
+        # budget is the maximum number of bytes the engine may allocate
+        if budget < _TABLE_SIZE:
+            raise MemoryError("budget too small for the output buffer")
+
+        self.calib = calib
+        self.pattern = pattern
+        self.budget = budget
+
+        collect()
+        ## Object temperature in degC for every pixel, updated per subpage
+        self.buf = array_filled('f', IMAGE_SIZE, 0.0)
+        used = _TABLE_SIZE
+
+        # 1/alpha, with the gradient compensation for the pixel's subpage
+        # folded in; saves a subtraction and a division per pixel
+        self._inv_alpha = None
+        if used + _TABLE_SIZE <= budget:
+            self._inv_alpha = array_filled('f', IMAGE_SIZE, 0.0)
+            self._fill_inv_alpha()
+            used += _TABLE_SIZE
+
+        # offset times kta, so the Ta compensation is one multiply-add
+        self._os_kta = None
+        if used + _TABLE_SIZE <= budget:
+            self._os_kta = array_filled('f', IMAGE_SIZE, 0.0)
+            for idx in range(IMAGE_SIZE):
+                self._os_kta[idx] = calib.pix_os_ref[idx]*calib.pix_kta[idx]
+            used += _TABLE_SIZE
+
+        self.footprint = used
+
+        # per-frame factor for each kv quadrant, index by (row % 2)*2 + col % 2
+        self._kv_fac = array_filled('f', 4, 1.0)
+        collect()
+
+    def set_pattern(self, pattern):
+        """! Switch to another readout pattern. With gradient compensation,
+        the 1/alpha table depends on the pattern and is recomputed.
+        """
+        if pattern is self.pattern:
+            return
+        self.pattern = pattern
+        if self._inv_alpha is not None and self.calib.use_tgc:
+            self._fill_inv_alpha()
+
+    def _fill_inv_alpha(self):
+        for idx in range(IMAGE_SIZE):
+            self._inv_alpha[idx] = 1.0/self._pix_alpha(idx)
+
+    def _pix_alpha(self, idx):
+        alpha = self.calib.pix_alpha[idx]
+        if self.calib.use_tgc:
+            sp_id = self.pattern.get_sp(idx)
+            alpha -= self.calib.tgc*self.calib.pix_alpha_cp[sp_id]
+        return alpha
+
+    def update(self, pix_data, subpage, state):
+        """! Convert one subpage of raw data to temperatures in @c self.buf.
+        @param pix_data The raw pixel array, e.g. @c RawImage.pix
+        @param subpage The @c Subpage which was just read
+        @param state The @c CameraState read along with the subpage
+        """
+        if subpage.pattern is not self.pattern:
+            self.set_pattern(subpage.pattern)
+        calib = self.calib
+        pix_os_ref = calib.pix_os_ref
+        pix_kta = calib.pix_kta
+        os_kta = self._os_kta
+        inv_alpha = self._inv_alpha
+        il_offset = calib.il_offset if subpage.pattern is InterleavedPattern else None
+        buf = self.buf
+
+        ta = state.ta
+        ta_r = state.ta_r
+        gain = state.gain
+
+        kv_fac = self._kv_fac
+        kv_fac[0] = 1 + calib.kv_avg[0][0]*state.vdd
+        kv_fac[1] = 1 + calib.kv_avg[0][1]*state.vdd
+        kv_fac[2] = 1 + calib.kv_avg[1][0]*state.vdd
+        kv_fac[3] = 1 + calib.kv_avg[1][1]*state.vdd
+
+        # everything which is the same for every pixel in this subpage
+        inv_emissivity = 1.0/calib.emissivity
+        tgc_os = calib.tgc*self._calc_os_cp(subpage, state) if calib.use_tgc else 0.0
+        inv_ksta = 1.0/(1 + calib.ksta*ta)
+        ksto = calib.ksto[1]
+        sqrt = math.sqrt
+
+        for idx in subpage.sp_range():
+            ## IR data compensation - offset, Vdd and Ta
+            if os_kta is None:
+                offset = pix_os_ref[idx]*(1 + pix_kta[idx]*ta)
+            else:
+                offset = pix_os_ref[idx] + os_kta[idx]*ta
+            offset *= kv_fac[(idx >> 4) & 0x2 | idx & 0x1]
+
+            v_os = pix_data[idx]*gain - offset
+            if il_offset is not None:
+                v_os += il_offset[idx]
+
+            ## IR data gradient compensation
+            v_ir = v_os*inv_emissivity - tgc_os
+
+            ## To calculation; alpha^3*v_ir + alpha^4*ta_r from the datasheet
+            ## is rewritten as alpha^4*(v_ir/alpha + ta_r)
+            if inv_alpha is None:
+                q = v_ir*inv_ksta/self._pix_alpha(idx)
+            else:
+                q = v_ir*inv_ksta*inv_alpha[idx]
+            s_x = sqrt(sqrt(q + ta_r))
+            to = q/(1 + ksto*(s_x - TEMP_K)) + ta_r
+            buf[idx] = sqrt(sqrt(to)) - TEMP_K + calib.drift
+
+    def _calc_os_cp(self, subpage, state):
+        pix_os_cp = self.calib.pix_os_cp[subpage.id]
+        if subpage.pattern is InterleavedPattern:
+            pix_os_cp += self.calib.il_chess_c1
+        return state.gain_cp[subpage.id] - pix_os_cp*(1 + self.calib.kta_cp*state.ta)*(1 + self.calib.kv_cp*state.vdd)
+
+    def calc_limits(self, *, exclude_idx=()):
+        # find min/max in place to keep mem usage down
+        min_h, min_idx = None, None
+        max_h, max_idx = None, None
+        for idx, h in enumerate(self.buf):
+            if idx in exclude_idx:
+                continue
+            if min_h is None or h < min_h:
+                min_h, min_idx = h, idx
+            if max_h is None or h > max_h:
+                max_h, max_idx = h, idx
+        return ImageLimits(min_h, max_h, min_idx, max_idx)
+
+    def interpolate_bad_pixels(self, bad_pixels):
+        for bad_idx in bad_pixels:
+            count = 0
+            total = 0
+            for offset in _INTERP_NEIGHBOURS:
+                idx = bad_idx + offset
+                if idx in range(IMAGE_SIZE) and idx not in bad_pixels:
+                    count += 1
+                    total += self.buf[idx]
+            if count > 0:
+                self.buf[bad_idx] = total/count
@@ -1,13 +1,17 @@
 """ MLX90640 register mapping
 """
 
+try:
+    from micropython import const
+except ImportError:
+    const = lambda value: value
+
 from mlx90640.utils import (
     field_desc,
     FieldDesc,
+    FieldAccessor,
     FD_BYTE,
     FD_WORD,
-    Struct,
-    StructProto,
 )
 
 
@@ -32,9 +36,9 @@ REGISTER_MAP = {
         field_desc('read_pattern',      1, 12),
     ),
 
-    # I2C Config Register
+    # I2C Config Register; FM+ is on while its bit is 0, as it is by default
     0x800F : (
-        field_desc('fmplus_enable',     1, 0),
+        field_desc('fmplus_disable',    1, 0),
         field_desc('i2c_levels',        1, 1),
         field_desc('sda_current_limit', 1, 2),
     ),
@@ -49,12 +53,22 @@ REGISTER_MAP = {
     0x072A : field_desc('vdd_pix',      FD_WORD, signed=True),
 }
 
+# Registers which the camera updates on its own. These always have to be read
+# from the device, everything else can be served from the shadow copy.
+VOLATILE_REGISTERS = (
+    0x8000, # status register
+    0x0700, 0x0708, 0x070A, 0x0720, 0x0728, 0x072A, # measured values in RAM
+)
+
 # Calibration Data
 EEPROM_ADDRESS = const(0x2400)
 EEPROM_SIZE    = const(0x340)
 
 # From table on page 21
 EEPROM_MAP = {
+    0x2407 : field_desc('device_id_1', FD_WORD),
+    0x2408 : field_desc('device_id_2', FD_WORD),
+    0x2409 : field_desc('device_id_3', FD_WORD),
     0x2410 : (
         field_desc('k_ptat',         4, 12),
         field_desc('scale_occ_row',  4,  8),
@@ -155,25 +169,30 @@ class CameraInterface:
 class ReadOnlyError(Exception): pass
 
 class RegisterMap:
-    def __init__(self, iface, register_map, readonly=False):
+    def __init__(self, iface, register_map, readonly=False, volatile=()):
         # register_map should be a dict of { I2C address : FieldDesc(s) }
+        # volatile is a collection of addresses which must never be cached
         self.iface = iface
         self.readonly = readonly
         self._fields = self._build_lookup(register_map)
+        # each register once, however many fields it holds
+        self._addresses = tuple(register_map)
+        self._volatile = set(volatile)
+        # shadow copies of registers, { I2C address : buffer }
+        self._shadow = {}
 
     @staticmethod
     def _build_lookup(register_map):
+        # { field name : (I2C address, FieldAccessor) }
         lookup = {}
         for address, fields in register_map.items():
             if isinstance(fields, FieldDesc):
                 fields = (fields,)
 
-            proto = StructProto(fields)
             for fld in fields:
                 if fld.name in lookup:
                     raise ValueError(f"duplicate field name: {fld.name}")
-                lookup[fld.name] = (address, proto)
-
+                lookup[fld.name] = (address, FieldAccessor(fld))
         return lookup
 
     def __iter__(self):
@@ -183,21 +202,56 @@ class RegisterMap:
     def __contains__(self, name):
         return name in self._fields
 
-    def __getitem__(self, name):
-        address, proto = self._fields[name]
+    def _load(self, address):
+        # get the shadow copy of a register, reading it from the device if it
+        # hasn't been read yet or if it is volatile
+        buf = self._shadow.get(address)
+        if buf is None:
+            buf = bytearray(REG_SIZE)
+            self.iface.read_into(address, buf)
+            self._shadow[address] = buf
+        elif address in self._volatile:
+            self.iface.read_into(address, buf)
+        return buf
+
+    def load(self, base, data):
+        # fill the shadow copies from a dump of consecutive registers starting
+        # at address base, e.g. an image of the whole EEPROM
+        for address in self._addresses:
+            offset = (address - base) * REG_SIZE
+            if offset < 0 or offset + REG_SIZE > len(data):
+                continue
+            buf = self._shadow.get(address)
+            if buf is None:
+                buf = bytearray(REG_SIZE)
+                self._shadow[address] = buf
+            buf[0] = data[offset]
+            buf[1] = data[offset + 1]
 
-        buf = self.iface.read(address)
-        struct = Struct(buf, proto)
-        return struct[name]
+    def invalidate(self, name=None):
+        # forget the shadow copy of the register holding the named field, or
+        # of all registers, so that the next access reads the device again
+        if name is None:
+            self._shadow.clear()
+            return
+        address, _ = self._fields[name]
+        self._shadow.pop(address, None)
+
+    def __getitem__(self, name):
+        address, field = self._fields[name]
+        return field.get(self._load(address))
 
     def __setitem__(self, name, value):
         if self.readonly:
             raise ReadOnlyError(f"can't write to '{name}': not permitted")
 
-        address, proto = self._fields[name]
+        address, field = self._fields[name]
 
-        buf = bytearray(REG_SIZE)
-        self.iface.read_into(address, buf)
-        struct = Struct(buf, proto)
-        struct[name] = value
-        self.iface.write(address, buf)
+        # write-through: the shadow copy is modified and then sent as a whole
+        buf = self._load(address)
+        field.set(buf, value)
+        try:
+            self.iface.write(address, buf)
+        except OSError:
+            self._shadow.pop(address, None)
+            raise
@@ -0,0 +1,97 @@
+"""!
+@file targeting.py
+This file contains target extraction for the MLX90640 camera driver.
+"""
+
+import micropython
+from ucollections import namedtuple
+from mlx90640.calibration import NUM_ROWS, NUM_COLS
+
+# rows and columns which may hold a target; the bottom two rows are skipped as
+# they mostly see the turret itself
+FIRST_ROW = const(1)
+END_ROW = const(NUM_ROWS - 2)
+FIRST_COL = const(1)
+END_COL = const(NUM_COLS - 1)
+
+## The hottest spot in an image: its position in display coordinates, its
+#  score (sum of the pixel and its left and right neighbours) and the minimum
+#  and maximum pixel values of the whole image
+Hotspot = namedtuple('Hotspot', ('row', 'col', 'score', 'min_h', 'max_h'))
+
+
+@micropython.native
+def _scan(pix, baseline):
+    # best 3-pixel horizontal sum in the target area, considering only pixels
+    # hotter than a third of the best sum so far, like the original search
+    best, best_row, best_col = baseline, 0, 0
+    for row in range(FIRST_ROW, END_ROW):
+        # display column col is sensor column NUM_COLS - 1 - col
+        idx = row*NUM_COLS + NUM_COLS - 1 - FIRST_COL
+        for col in range(FIRST_COL, END_COL):
+            value = pix[idx]
+            if value*3 > best:
+                total = pix[idx - 1] + value + pix[idx + 1]
+                if total > best:
+                    best, best_row, best_col = total, row, col
+            idx -= 1
+    return best, best_row, best_col
+
+
+def find_hotspot(pix):
+    """! Find the hottest spot in an image, smoothing each pixel with its left
+    and right neighbours.
+    @param pix The pixel array of an image, e.g. @c RawImage.pix
+    @returns A @c Hotspot; if no pixel is hotter than the coldest one, its
+             position is (0, 0) and its score is 0
+    """
+    min_h = min(pix)
+    max_h = max(pix)
+    best, row, col = _scan(pix, 3*min_h)
+    if row == 0:
+        best = 0
+    return Hotspot(row, col, best, min_h, max_h)
+
+
+# fractional positions from refine_hotspot() are in units of 1/SUBPIXEL_SCALE
+# of a pixel
+SUBPIXEL_SCALE = const(256)
+
+
+def _peak_offset(left, centre, right):
+    # vertex of the parabola through three equally spaced samples, relative to
+    # the centre sample, in 1/SUBPIXEL_SCALE pixel; 0 unless centre is a peak
+    curve = left - 2*centre + right
+    if curve >= 0:
+        return 0
+    half = SUBPIXEL_SCALE // 2
+    offset = ((right - left) * half) // -curve
+    return -half if offset < -half else half if offset > half else offset
+
+
+@micropython.native
+def refine_hotspot(pix, hotspot):
+    """! Refine the position of a hotspot to a fraction of a pixel by fitting
+    a parabola through the column and row sums of its 3x3 neighbourhood.
+    Only nine pixels are read whatever the image.
+    @param pix The pixel array which @c hotspot was found in
+    @param hotspot A @c Hotspot from @c find_hotspot()
+    @returns A tuple (row, col) in display coordinates, each in units of
+             1/SUBPIXEL_SCALE pixel
+    """
+    row, col = hotspot.row, hotspot.col
+    if row == 0:
+        # no hotspot; row 0 is outside the target area
+        return row*SUBPIXEL_SCALE, col*SUBPIXEL_SCALE
+
+    # display columns col - 1, col, col + 1 are sensor columns idx + 1, idx,
+    # idx - 1
+    idx = row*NUM_COLS + NUM_COLS - 1 - col
+    up = pix[idx - NUM_COLS + 1] + pix[idx - NUM_COLS] + pix[idx - NUM_COLS - 1]
+    mid = pix[idx + 1] + pix[idx] + pix[idx - 1]
+    down = pix[idx + NUM_COLS + 1] + pix[idx + NUM_COLS] + pix[idx + NUM_COLS - 1]
+    left = pix[idx - NUM_COLS + 1] + pix[idx + 1] + pix[idx + NUM_COLS + 1]
+    centre = pix[idx - NUM_COLS] + pix[idx] + pix[idx + NUM_COLS]
+    right = pix[idx - NUM_COLS - 1] + pix[idx - 1] + pix[idx + NUM_COLS - 1]
+    return (row*SUBPIXEL_SCALE + _peak_offset(up, mid, down),
+            col*SUBPIXEL_SCALE + _peak_offset(left, centre, right))
@@ -0,0 +1,97 @@
+"""!
+@file tracker.py
+This file contains a small predictive tracker for targets found in MLX90640
+images.
+"""
+
+import utime as time
+
+
+class Tracker:
+    def __init__(self, alpha=0.5, beta=0.2, gate=(4.0, 4.0), max_misses=2):
+        """!
+        @param alpha How much of the difference between a detection and the
+               prediction is taken into the position, 0 to 1
+        @param beta How much of that difference, per second, is taken into the
+               velocity, usually well below @c alpha
+        @param gate The largest believable difference between a detection and
+               the prediction along each axis
+        @param max_misses The number of detections in a row which may be
+               rejected before tracking starts over at the next one
+        """
+        self.alpha = alpha
+        self.beta = beta
+        self.gate = gate
+        self.max_misses = max_misses
+
+        ## Filtered position and velocity (units per second) along each axis
+        self.x, self.y = 0.0, 0.0
+        self.vx, self.vy = 0.0, 0.0
+        ## Time of the last accepted detection
+        self.time = 0
+        ## Whether the tracker has a target
+        self.valid = False
+        ## The number of detections rejected in a row
+        self.misses = 0
+        ## The number of detections taken since tracking last started
+        self.updates = 0
+
+    def reset(self):
+        """! Forget the target, e.g. when the camera has been turned away.
+        """
+        self.valid = False
+        self.misses = 0
+        self.updates = 0
+
+    def shift(self, dx, dy):
+        """! Move the tracker's frame of reference, e.g. by minus the amount
+        the turret has just turned when positions are relative to the turret.
+        """
+        self.x += dx
+        self.y += dy
+
+    def predict(self, when):
+        """! Predict the target's position at a given time.
+        @param when A time from @c utime.ticks_ms(), normally in the future
+        @returns A tuple (x, y)
+        """
+        dt = time.ticks_diff(when, self.time) / 1000
+        return self.x + self.vx*dt, self.y + self.vy*dt
+
+    def update(self, x, y, when):
+        """! Add a detection of the target. The second detection of a track
+        sets the velocity straight from the first two, so that a prediction
+        can be made after two images; later ones are filtered.
+        @param when The time the image with the detection was taken
+        @returns @c True if the detection was used, @c False if it was rejected
+                 by the gate
+        """
+        if not self.valid or self.misses >= self.max_misses:
+            self.x, self.y = x, y
+            self.vx, self.vy = 0.0, 0.0
+            self.time = when
+            self.valid = True
+            self.misses = 0
+            self.updates = 1
+            return True
+
+        dt = time.ticks_diff(when, self.time) / 1000
+        px, py = self.predict(when)
+        rx, ry = x - px, y - py
+        if (rx/self.gate[0])**2 + (ry/self.gate[1])**2 > 1.0:
+            self.misses += 1
+            return False
+
+        if self.updates == 1 and dt > 0:
+            self.x, self.y = x, y
+            self.vx, self.vy = rx/dt, ry/dt
+        else:
+            self.x = px + self.alpha*rx
+            self.y = py + self.alpha*ry
+            if dt > 0:
+                self.vx += self.beta*rx/dt
+                self.vy += self.beta*ry/dt
+        self.time = when
+        self.misses = 0
+        self.updates += 1
+        return True
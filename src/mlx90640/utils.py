@@ -2,17 +2,10 @@
 """
 
 from array import array
-from ucollections import namedtuple
-from uctypes import (
-    INT8, UINT8,
-    INT16, UINT16,
-    BFUINT16,
-    BF_POS,
-    BF_LEN,
-    BIG_ENDIAN,
-    addressof,
-    struct as uc_struct,
-)
+try:
+    from ucollections import namedtuple
+except ImportError:
+    from collections import namedtuple
 
 def array_filled(typecode, length, fill=0):
     return array(typecode, (fill for i in range(length)))
@@ -27,45 +20,66 @@ def twos_complement(bits, value):
 FD_BYTE = object()
 FD_WORD = object()
 
-FieldDesc = namedtuple('FieldDesc', ('name', 'layout', 'signed_bits'))
+# A field of a 16-bit big-endian register: the register value is shifted right
+# by shift and masked with mask to get the field, which is sign-extended if
+# signed_bits is set.
+FieldDesc = namedtuple('FieldDesc', ('name', 'shift', 'mask', 'signed_bits'))
 def field_desc(name, bits, pos=0, signed=False):
     if bits is FD_WORD:
-        layout = 0 | (INT16 if signed else UINT16)
-        return FieldDesc(name, layout, None)
-    
+        return FieldDesc(name, 0, 0xFFFF, 16 if signed else None)
+
     if bits is FD_BYTE:
-        layout = pos | (INT8 if signed else UINT8)
-        return FieldDesc(name, layout, None)
+        # pos is the byte offset within the register buffer, so byte 0 is the
+        # high byte
+        return FieldDesc(name, 8 if pos == 0 else 0, 0xFF,
+                         8 if signed else None)
+
+    return FieldDesc(name, pos, (1 << bits) - 1, bits if signed else None)
 
-    layout = 0 | BFUINT16 | pos << BF_POS | bits << BF_LEN
-    return FieldDesc(name, layout, bits if signed else None)
+
+class FieldAccessor:
+    # reader and writer for one field, compiled from its FieldDesc once so
+    # that each access is a few integer operations on the register buffer
+    def __init__(self, fld):
+        self.name = fld.name
+        self.shift = fld.shift
+        self.mask = fld.mask
+        # sign bit, and the amount to subtract when it's set
+        if fld.signed_bits is not None:
+            self.sign = 1 << (fld.signed_bits - 1)
+            self.span = 1 << fld.signed_bits
+        else:
+            self.sign = 0
+            self.span = 0
+
+    def get(self, buf):
+        value = (((buf[0] << 8) | buf[1]) >> self.shift) & self.mask
+        if value & self.sign:
+            value -= self.span
+        return value
+
+    def set(self, buf, value):
+        mask = self.mask << self.shift
+        word = ((buf[0] << 8) | buf[1]) & ~mask | (value << self.shift) & mask
+        buf[0] = (word >> 8) & 0xFF
+        buf[1] = word & 0xFF
 
 
 class StructProto:
     # data needed to create a Struct
     # can be instantiated once and reused between Struct instances
     def __init__(self, fields):
-        self.layout = {}
-        self.signed = {}
+        self.fields = {}
         for fld in fields:
-            self.layout[fld.name] = fld.layout
-            if fld.signed_bits is not None:
-                self.signed[fld.name] = fld.signed_bits
+            self.fields[fld.name] = FieldAccessor(fld)
 
 class Struct:
     def __init__(self, buf, proto):
-        self._signed = proto.signed
-        self._struct = uc_struct(addressof(buf), proto.layout, BIG_ENDIAN)
+        self._buf = buf
+        self._fields = proto.fields
 
     def __getitem__(self, name):
-        value = getattr(self._struct, name)
-        signed = self._signed.get(name)
-        if signed is not None:
-            return twos_complement(signed, value)
-        return value
+        return self._fields[name].get(self._buf)
 
     def __setitem__(self, name, value):
-        signed = self._signed.get(name)
-        if signed is not None:
-            value = twos_complement(signed, value)
-        setattr(self._struct, name, value)
+        self._fields[name].set(self._buf, value)
@@ -16,6 +16,7 @@
 @package motor_driver       Contains our motor driver tools and interfaces with the encoder.
 """
 import pyb, utime
+from array import array
 from pyb import Pin as Pin
 from motor.encoder_reader import Encoder
 from motor.motor_driver import MotorDriver
@@ -35,7 +36,7 @@ class Controller:
         @brief      Create a controller object.
         @details    The constructor method initializes the Controller object with the given proportional gain kp,
                     target position setpoint, MotorDriver object motor, and Encoder object encoder. It also initializes
-                    the motor_data attribute as a tuple of (0,0), the time attribute as the current time in milliseconds,
+                    the motor_data attribute as an array of [0, 0], the time attribute as the current time in milliseconds,
                     and prints a message indicating that the Controller object has been created with the given kp and setpoint.
         @param      self The object itself
         @param      kp Proportional gain
@@ -45,10 +46,15 @@ class Controller:
         @return     None
         """
         self.kp = kp
+        # kp in 1/256ths, so that run() only needs integer math and can be run
+        # from a timer without allocating
+        self._kp_q8 = int(kp * 256)
         self.setpoint = setpoint
         self.motor = motor
         self.encoder = encoder
-        self.motor_data = (0,0)
+        ## Total run time in milliseconds and the last position, updated in
+        #  place by run()
+        self.motor_data = array('l', [0, 0])
         self.time = utime.ticks_ms()
         print(f"Creating controller with KP {self.kp} and setpoint {self.setpoint}")
 
@@ -57,24 +63,26 @@ class Controller:
         @brief      Runs the controller.
         @details    Reads the encoder position, calculates the control output using a proportional control law,
                     and sets the duty cycle of the motor. The method also updates the motor data and returns
-                    a flag indicating if the motor data has been updated.
+                    a flag indicating if the motor data has been updated. Only integer math is used, so a run
+                    doesn't allocate memory.
         @param      self The object itself
         @return     A flag indicating if the motor data has been updated (0 or 1).
         """
         ##Debugging flag
         flag = 0
         ## Time difference from which the motor runs its controller processes 
-        delta_time = utime.ticks_ms() - self.time
+        delta_time = utime.ticks_diff(utime.ticks_ms(), self.time)
         
         #Loop handles motor updating its controller information
         if delta_time >= 10:
             self.encoder.read()
             ## Is the value sent to the motor driver after being scaled by Kp
-            output = self.kp * (self.setpoint - self.encoder.position)
+            output = (self._kp_q8 * (self.setpoint - self.encoder.position)) >> 8
             self.motor.set_duty_cycle(output)
             
             self.time = utime.ticks_ms()
-            self.motor_data = (delta_time + self.motor_data[0], self.encoder.position)
+            self.motor_data[0] += delta_time
+            self.motor_data[1] = self.encoder.position
             flag = 1
         
         return flag
@@ -97,4 +105,5 @@ class Controller:
         @param      kp Proportional gain
         @return     None
         """
-        self.kp = kp
\ No newline at end of file
+        self.kp = kp
+        self._kp_q8 = int(kp * 256)
\ No newline at end of file
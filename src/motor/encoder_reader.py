@@ -52,7 +52,7 @@ class Encoder:
         @brief      Reads and updates the encoder's position.
         @details    The read method retrieves the delta between the current and previous reading from the timer's counter,
                     checks for overflow or underflow in the readings, updates the old_delta and prev_position, and
-                    calculates the encoder's current position. The method then prints the updated position.
+                    calculates the encoder's current position.
         @param      self The object itself
         @return     None
         """
@@ -73,7 +73,6 @@ class Encoder:
         self.old_delta = new_delta
         self.prev_position = self.position
         self.position -= delta_1
-        print(self.position)
 
     def zero(self):
         """!
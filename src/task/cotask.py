@@ -28,6 +28,236 @@ SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
 import gc                              # Memory allocation garbage collector
 import utime                           # Micropython version of time library
 import micropython                     # This shuts up incorrect warnings
+import struct                          # Packs histogram export headers
+from array import array                # Preallocated histogram buckets
+from machine import idle               # Sleeps the CPU until an interrupt
+from machine import disable_irq, enable_irq  # Guard the list of go() tasks
+
+# Hardware timers are used to run a TimerTask; on boards other than STM32,
+# give TimerTask a machine.Timer object instead of a timer number
+try:
+    from pyb import Timer
+except ImportError:
+    Timer = None
+
+
+## The number of buckets in each run time and lateness histogram. Bucket 0
+#  counts times of 0 microseconds, bucket @c b from 1 up counts times from
+#  2**(b-1) up to but not including 2**b microseconds, and the last bucket
+#  also counts everything longer.
+HIST_BUCKETS = 20
+
+## Header of the histograms written by @c TaskList.write_histograms(): magic
+#  @c b'CTHS', format version, number of buckets per histogram and number of
+#  tasks. Each task then has a one-byte name length, the name, and its run
+#  time and lateness histograms as little-endian 32-bit counts.
+HIST_HEADER_FMT = '<4sBBB'
+HIST_MAGIC = b'CTHS'
+HIST_VERSION = 1
+
+
+@micropython.native
+def hist_bucket(usec):
+    """!
+    Find the histogram bucket for a time, without allocating memory.
+    @param usec A time in microseconds
+    @return The index of the bucket which counts that time
+    """
+    bucket = 0
+    while usec > 0 and bucket < HIST_BUCKETS - 1:
+        usec >>= 1
+        bucket += 1
+    return bucket
+
+
+def hist_percentile(hist, percent):
+    """!
+    Find the bucket which holds a given percentile of the times counted in a
+    histogram.
+    @param hist A run time or lateness histogram of a task
+    @param percent The percentile, such as 50 for the median or 99
+    @return The index of the bucket, or @c None if the histogram is empty
+    """
+    total = sum(hist)
+    if not total:
+        return None
+    count = 0
+    for bucket in range(HIST_BUCKETS):
+        count += hist[bucket]
+        if count * 100 >= total * percent:
+            return bucket
+    return HIST_BUCKETS - 1
+
+
+def _hist_label(bucket):
+    # the range of times in a bucket, given by its upper limit
+    if bucket == HIST_BUCKETS - 1:
+        return '>=' + str(1 << (bucket - 1))
+    return '<' + str(1 << bucket)
+
+
+## The number of transitions kept by a task's own trace when tracing is
+#  turned on with @c trace=True
+TRACE_SIZE = 128
+
+
+class TraceRing:
+    """!
+    A fixed-size record of state transitions of one or more tasks.
+    Each transition is stored as a time stamp from @c utime.ticks_us(), the
+    task, and the states from and to which it went, in arrays which are
+    allocated when the ring is created; when the ring is full, the oldest
+    transitions are overwritten. Recording therefore never allocates memory,
+    so tracing can be left on indefinitely. A ring may be given to several
+    tasks to see their transitions interleaved in the order they happened:
+      @code
+          ring = cotask.TraceRing (256)
+          task1 = cotask.Task (task1_fun, name = 'Task 1', period = 50,
+                               trace = ring)
+          task2 = cotask.Task (task2_fun, name = 'Task 2', period = 20,
+                               trace = ring)
+          ...
+          print (ring.get_trace ())
+      @endcode
+    Times are shown from when the ring was created or cleared. Each entry
+    keeps the time since the one before it, so times stay exact however long
+    the ring runs, as long as no two transitions in a row are more than about
+    9 minutes apart, the range of @c utime.ticks_diff() in microseconds.
+    A @c TimerTask may share a ring with cooperative tasks. It can run, and
+    record, between another task's time stamp and its @c record(), so a
+    transition stamped earlier than the one before it is shown at the time of
+    that one, keeping the order in which they were recorded.
+    States must be integers from -32768 to 32767. A bare @c yield leaves the
+    state as it was, and any other value is recorded as -1.
+    """
+
+    def __init__(self, size=TRACE_SIZE):
+        """!
+        Create a trace ring.
+        @param size The number of transitions which the ring holds
+        """
+        self._size = size
+        # microseconds from the transition before each one
+        self._gaps = array('I', [0] * size)
+        self._tasks = array('B', [0] * size)
+        self._from = array('h', [0] * size)
+        self._to = array('h', [0] * size)
+
+        # Index of the slot to be written next
+        self._next = 0
+
+        ## The number of transitions recorded, including those overwritten
+        self.count = 0
+
+        ## The tasks which record in this ring, in order of registration
+        self.tasks = []
+
+        # time of the last transition recorded, and the time since the ring
+        # was started of the one before the oldest kept, in whole seconds and
+        # microseconds so it stays a small integer
+        self._last = utime.ticks_us()
+        self._base_s = 0
+        self._base_us = 0
+
+
+    def register(self, task):
+        """!
+        Add a task to those which record in this ring. This is done by the
+        task's constructor.
+        @param task The task
+        @return The number which identifies the task in the ring
+        """
+        self.tasks.append(task)
+        return len(self.tasks) - 1
+
+
+    @micropython.native
+    def record(self, stamp, task_num, from_state, to_state):
+        """!
+        Record one transition, overwriting the oldest one if the ring is full.
+        @param stamp The time of the transition from @c utime.ticks_us()
+        @param task_num The task's number from @c register()
+        @param from_state The state from which the task went
+        @param to_state The state to which the task went
+        """
+        idx = self._next
+        if self.count >= self._size:
+            # the oldest transition is overwritten, so the base moves to it
+            base_us = self._base_us + self._gaps[idx]
+            if base_us >= 1000000:
+                self._base_s += base_us // 1000000
+                base_us %= 1000000
+            self._base_us = base_us
+        gap = utime.ticks_diff(stamp, self._last)
+        if gap < 0:
+            # stamped before the transition recorded last, see above
+            gap = 0
+        else:
+            self._last = stamp
+        self._gaps[idx] = gap
+        self._tasks[idx] = task_num
+        self._from[idx] = from_state
+        self._to[idx] = to_state
+        idx += 1
+        if idx >= self._size:
+            idx = 0
+        self._next = idx
+        self.count += 1
+
+
+    def clear(self):
+        """!
+        Forget all recorded transitions and restart the clock.
+        """
+        self._next = 0
+        self.count = 0
+        self._last = utime.ticks_us()
+        self._base_s = 0
+        self._base_us = 0
+
+
+    def items(self, task_num=None):
+        """!
+        Get the transitions held in the ring, oldest first.
+        @param task_num A task's number from @c register() to get only that
+               task's transitions, or @c None to get those of all tasks
+        @return A generator of tuples (seconds since the ring was created or
+                cleared, task number, from state, to state)
+        """
+        kept = min(self.count, self._size)
+        idx = self._next - kept
+        if idx < 0:
+            idx += self._size
+        # add up the gaps in whole microseconds, so no rounding builds up
+        seconds, usec = self._base_s, self._base_us
+        for _ in range(kept):
+            usec += self._gaps[idx]
+            if usec >= 1000000:
+                seconds += usec // 1000000
+                usec %= 1000000
+            total_time = seconds + usec / 1000000.0
+            if task_num is None or self._tasks[idx] == task_num:
+                yield (total_time, self._tasks[idx], self._from[idx],
+                       self._to[idx])
+            idx += 1
+            if idx >= self._size:
+                idx = 0
+
+
+    def get_trace(self):
+        """!
+        Make a string showing the transitions of all tasks in the ring,
+        interleaved in the order in which they happened.
+        @return A possibly quite large string showing state transitions
+        """
+        tr_str = 'Trace of ' + ', '.join(task.name for task in self.tasks)
+        tr_str += ':\n'
+        if self.count > self._size:
+            tr_str += f'({self.count - self._size} older transitions lost)\n'
+        for when, task_num, from_state, to_state in self.items():
+            tr_str += '{: 12.6f}: {:<16s}{: 2d} -> {:d}\n'.format(when,
+                self.tasks[task_num].name, from_state, to_state)
+        return tr_str
 
 
 class Task:
@@ -80,8 +310,12 @@ class Task:
                The time can be given in a @c float or @c int; it will be 
                converted to microseconds for internal use by the scheduler.
         @param profile Set to @c True to enable run-time profiling 
-        @param trace Set to @c True to generate a list of transitions between
-               states. @b Note: This slows things down and allocates memory.
+        @param trace Set to @c True to record transitions between states in
+               a @c TraceRing of @c TRACE_SIZE transitions, to a number to
+               record that many, or to a @c TraceRing shared with other
+               tasks. The ring is allocated here and keeps the latest
+               transitions, so tracing doesn't allocate memory as the task
+               runs, but it does slow things down a little.
         @param shares A list or tuple of shares and queues used by this task.
                If no list is given, no shares are passed to the task
         """
@@ -115,22 +349,45 @@ class Task:
         # Flag which causes the task to be profiled, in which the execution
         #  time of the @c run() method is measured and basic statistics kept. 
         self._prof = profile
+
+        # Histograms of run time and lateness in microseconds, allocated once
+        # here so that profiling doesn't use memory while the task runs
+        if profile:
+            self._run_hist = array('I', [0] * HIST_BUCKETS)
+            self._late_hist = array('I', [0] * HIST_BUCKETS)
+        else:
+            self._run_hist = None
+            self._late_hist = None
         self.reset_profile()
 
         # The previous state in which the task last ran. It is used to watch
         # for and track state transitions.
         self._prev_state = 0
 
-        # If transition tracing has been enabled, create an empty list in 
-        # which to store transition (time, to-state) stamps
+        # If transition tracing has been enabled, set up the ring in which
+        # to store transition (time, from-state, to-state) stamps
+        if trace is True:
+            trace = TraceRing(TRACE_SIZE)
+        elif trace and not isinstance(trace, TraceRing):
+            trace = TraceRing(int(trace))
         self._trace = trace
-        self._tr_data = []
-        self._prev_time = utime.ticks_us()
+        self._tr_num = trace.register(self) if trace else 0
 
         ## Flag which is set true when the task is ready to be run by the
         #  scheduler
         self.go_flag = False
 
+        # The share or queue on which the task is waiting, or None if it isn't
+        self._waiting = None
+
+        # Whether the task is in the task list's deadline heap
+        self._in_heap = False
+
+        # The task list this task is in, and whether the task is in its list
+        # of tasks triggered by go()
+        self._task_list = None
+        self._go_queued = False
+
 
     def schedule(self) -> bool:
         """!
@@ -152,6 +409,13 @@ class Task:
             # Run the method belonging to the state which should be run next
             curr_state = next(self._run_gen)
 
+            # A task which yields a share or queue rather than a state waits
+            # until something is put into it, and its state hasn't changed
+            if hasattr(curr_state, 'park'):
+                if curr_state.park(self):
+                    self._waiting = curr_state
+                curr_state = self._prev_state
+
             # If profiling or tracing, save timing data
             if self._prof or self._trace:
                 etime = utime.ticks_us()
@@ -164,22 +428,20 @@ class Task:
                     self._run_sum += runt
                     if runt > self._slowest:
                         self._slowest = runt
+                    self._run_hist[hist_bucket(runt)] += 1
 
             # If transition logic tracing is on, record a transition; if not,
-            # ignore the state. If out of memory, switch tracing off and 
-            # run the memory allocation garbage collector
+            # ignore the state
             if self._trace:
-                try:
-                    if curr_state != self._prev_state:
-                        self._tr_data.append(
-                            (utime.ticks_diff(etime, self._prev_time),
-                             curr_state))
-                except MemoryError:
-                    self._trace = False
-                    gc.collect()
-
+                # a bare yield leaves the state as it was
+                if curr_state is None:
+                    curr_state = self._prev_state
+                elif not isinstance(curr_state, int):
+                    curr_state = -1
+                if curr_state != self._prev_state:
+                    self._trace.record(etime, self._tr_num, self._prev_state,
+                                       curr_state)
                 self._prev_state = curr_state
-                self._prev_time = etime
 
             return True
 
@@ -196,6 +458,10 @@ class Task:
         go. This method may be overridden in descendent classes to implement
         some other behavior.
         """
+        # A task waiting on a share or queue isn't run until it's woken
+        if self._waiting is not None:
+            return False
+
         # If this task uses a timer, check if it's time to run run() again. If
         # so, set go flag and set the timer to go off at the next run time
         if self.period != None:
@@ -210,6 +476,7 @@ class Task:
                     self._late_sum += late
                     if late > self._latest:
                         self._latest = late
+                    self._late_hist[hist_bucket(late)] += 1
 
         # If the task doesn't use a timer, we rely on go_flag to signal ready
         return self.go_flag
@@ -238,25 +505,69 @@ class Task:
         self._slowest = 0
         self._late_sum = 0
         self._latest = 0
+        if self._prof:
+            for bucket in range(HIST_BUCKETS):
+                self._run_hist[bucket] = 0
+                self._late_hist[bucket] = 0
+
+
+    def get_histograms(self):
+        """!
+        This method returns a string showing the task's run time and lateness
+        histograms, if the task is profiled. Each line gives the buckets in
+        which the median, 90th and 99th percentile times fall, then the count
+        in each bucket which isn't empty, labelled with the bucket's upper
+        limit in microseconds.
+        @return A string with one line per histogram
+        """
+        if not self._prof:
+            return f"{self.name:<16s} not profiled"
+        hists = [('run', self._run_hist)]
+        if self.period != None:
+            hists.append(('late', self._late_hist))
+        lines = []
+        for label, hist in hists:
+            line = f"{self.name:<16s}{label:<5s}"
+            for percent in (50, 90, 99):
+                bucket = hist_percentile(hist, percent)
+                line += f"{'-' if bucket is None else _hist_label(bucket):>9s}"
+            line += ' '
+            for bucket in range(HIST_BUCKETS):
+                if hist[bucket]:
+                    line += f" {_hist_label(bucket)}:{hist[bucket]}"
+            lines.append(line)
+        return '\n'.join(lines)
+
+
+    def write_histograms(self, stream):
+        """!
+        This method writes the task's name and histograms in the compact
+        binary form described at @c HIST_HEADER_FMT. It's normally called by
+        @c TaskList.write_histograms().
+        @param stream A file or other stream opened for binary writing
+        """
+        name = self.name.encode()[:255]
+        stream.write(bytes((len(name),)))
+        stream.write(name)
+        stream.write(self._run_hist)
+        stream.write(self._late_hist)
 
 
     def get_trace(self):
         """!
         This method returns a string containing the task's transition trace.
         The trace is a set of tuples, each of which contains a time and the
-        states from and to which the system transitioned. 
+        states from and to which the system transitioned. Only the latest
+        transitions which fit in the task's trace ring are shown; if the ring
+        is shared with other tasks, see also @c TraceRing.get_trace().
         @return A possibly quite large string showing state transitions
         """
         tr_str = 'Task ' + self.name + ':'
         if self._trace:
             tr_str += '\n'
-            last_state = 0
-            total_time = 0.0
-            for item in self._tr_data:
-                total_time += item[0] / 1000000.0
-                tr_str += '{: 12.6f}: {: 2d} -> {:d}\n'.format (total_time, 
-                    last_state, item[1])
-                last_state = item[1]
+            for item in self._trace.items(self._tr_num):
+                tr_str += '{: 12.6f}: {: 2d} -> {:d}\n'.format (item[0],
+                    item[2], item[3])
         else:
             tr_str += ' not traced'
         return tr_str
@@ -269,6 +580,23 @@ class Task:
         another task which has data that this task needs to process soon.
         """
         self.go_flag = True
+        if self._task_list is not None:
+            self._task_list._queue_go(self)
+
+
+    def wake(self):
+        """!
+        Method called by a share or queue on which this task is waiting when
+        data is put into it. The task is run as soon as feasible and, if it's
+        run by a timer, then one period after that. This may be called from an
+        interrupt service routine.
+        """
+        self._waiting = None
+        self.go_flag = True
+        if self.period != None:
+            self._next_run = utime.ticks_add(utime.ticks_us(), self.period)
+        if self._task_list is not None:
+            self._task_list._queue_go(self)
 
 
     def __repr__(self):
@@ -293,6 +621,188 @@ class Task:
         return rst
 
 
+# =============================================================================
+
+class TimerTask(Task):
+    """!
+    A task which is run at a fixed rate by a hardware timer, regardless of
+    what the cooperatively scheduled tasks are doing.
+    On each timer tick, the timer's interrupt service routine asks
+    MicroPython, with @c micropython.schedule(), to run the task as soon as
+    the code now running finishes its current bytecode instruction. The task
+    therefore runs on time even while a cooperative task waits in
+    @c pyb.delay(), which runs scheduled functions while it waits, though not
+    during a single long call into C such as an I2C transfer. The cooperative
+    tasks run in the time left over. The task's generator is written like that
+    of any other task, but each run must be short, well under the timer
+    period, and shouldn't allocate memory, since a garbage collection in it
+    would delay it and everything else; when profiling, the most memory
+    allocated in one run is recorded so this can be checked.
+    The task can run between any two bytecodes of a cooperative task, and
+    @c disable_irq() doesn't hold off a function which has already been
+    scheduled, so @c thread_protect on a share or queue doesn't keep the
+    timer task out of the middle of a @c put() or @c get(). Data shared with
+    cooperative tasks should be single values which are written by one side
+    only and read or written in one step, such as a @c Share which the timer
+    task only reads. Example:
+      @code
+          def control_fun ():
+              while True:
+                  controller.run ()
+                  yield
+          control = cotask.TimerTask (control_fun, timer = 6, freq = 100,
+                                      name = 'Control', profile = True)
+          cotask.task_list.append (control)
+          control.start ()
+          while True:
+              cotask.task_list.pri_sched ()
+      @endcode
+    If the task hasn't run yet when the next tick comes, that tick is skipped
+    and counted in @c missed.
+    """
+
+    def __init__(self, run_fun, timer, freq, name="NoName", profile=False,
+                 trace=False, shares=()):
+        """!
+        Initialize a timer task. The timer isn't started until @c start() is
+        called.
+        @param run_fun The function which implements the task's code, a
+               generator as for @c Task
+        @param timer The number of the @c pyb.Timer to use, or a timer object
+               with a @c callback() method which has already been set up to
+               tick at @c freq
+        @param freq The number of times per second that the task runs
+        @param name The name of the task
+        @param profile Set to @c True to enable run-time profiling; lateness
+               is the time from the timer tick until the task runs
+        @param trace Tracing of state transitions, as for @c Task
+        @param shares A list or tuple of shares and queues used by this task
+        """
+        super().__init__(run_fun, name=name, priority=0, period=1000 / freq,
+                         profile=profile, trace=trace, shares=shares)
+
+        ## The number of times per second that the task runs
+        self.freq = freq
+
+        ## The number of timer ticks skipped because the task hadn't yet run
+        #  after the previous one
+        self.missed = 0
+
+        ## The most memory allocated in one run, in bytes, when profiling
+        self.max_alloc = 0
+
+        self._timer = timer
+        self._running = False
+
+        # Set by the ISR when the task has been scheduled to run, with the
+        # time of the tick, and cleared when it runs
+        self._pending = False
+        self._tick_time = 0
+
+        # Making a bound method allocates memory, which an ISR can't do, so
+        # make the ones the ISR uses now
+        self._isr_ref = self._isr
+        self._run_ref = self._run
+
+
+    def start(self):
+        """!
+        Start running the task on each timer tick.
+        """
+        if isinstance(self._timer, int):
+            self._timer = Timer(self._timer, freq=self.freq)
+        self._pending = False
+        self._running = True
+        self._timer.callback(self._isr_ref)
+
+
+    def stop(self):
+        """!
+        Stop running the task; it won't run again, even if a tick had already
+        scheduled it, until @c start() is called.
+        """
+        self._running = False
+        if not isinstance(self._timer, int):
+            self._timer.callback(None)
+
+
+    def _isr(self, timer):
+        """!
+        Timer interrupt service routine which schedules the task to run.
+        """
+        if self._pending:
+            self.missed += 1
+            return
+        self._pending = True
+        self._tick_time = utime.ticks_us()
+        try:
+            micropython.schedule(self._run_ref, None)
+        except Exception:
+            # the queue of scheduled functions is full
+            self._pending = False
+            self.missed += 1
+
+
+    def _run(self, _):
+        """!
+        Run the task once; this is called by MicroPython soon after the ISR.
+        """
+        if not self._running:
+            self._pending = False
+            return
+        if self._prof:
+            before = gc.mem_alloc()
+            self.schedule()
+            used = gc.mem_alloc() - before
+            if used > self.max_alloc:
+                self.max_alloc = used
+        else:
+            self.schedule()
+
+
+    @micropython.native
+    def ready(self) -> bool:
+        """!
+        This method checks if the task has been scheduled by a timer tick. A
+        timer task which is waiting on a share or queue is skipped until it
+        has been woken and the next tick comes.
+        """
+        if not self._pending:
+            return False
+        self._pending = False
+        if self._waiting is not None:
+            return False
+
+        if self._prof:
+            late = utime.ticks_diff(utime.ticks_us(), self._tick_time)
+            self._late_sum += late
+            if late > self._latest:
+                self._latest = late
+            self._late_hist[hist_bucket(late)] += 1
+        return True
+
+
+    def go(self):
+        """!
+        Timer tasks are only run by their timer, so this does nothing.
+        """
+        pass
+
+
+    def __repr__(self):
+        """!
+        This method converts the task to a string for diagnostic use, as for
+        @c Task, with @c ISR in place of the priority and the number of
+        missed ticks and, if profiling, the most memory allocated in a run.
+        """
+        rst = super().__repr__()
+        rst = rst[:16] + ' ISR' + rst[20:]
+        rst += f"  missed {self.missed}"
+        if self._prof:
+            rst += f", alloc {self.max_alloc}"
+        return rst
+
+
 # =============================================================================
 
 class TaskList:
@@ -320,14 +830,37 @@ class TaskList:
         #  that priority. 
         self.pri_list = []
 
+        # Heap of timed tasks, ordered by the time each is next due, used by
+        # deadline_sched() and built when it's first called after tasks have
+        # been added, and a list for the tasks it takes out of the heap
+        self._heap = None
+        self._due = []
+
+        # Tasks whose go_flag was set by go() or by a share or queue waking
+        # them, so that deadline_sched() needn't look at every task. There's a
+        # slot for every task, each task being in it at most once, so adding
+        # one never allocates
+        self._go_tasks = []
+        self._go_count = 0
+
+        ## The tasks run by hardware timers, which are listed with the others
+        #  but not run by the schedulers
+        self.timer_list = []
+
 
     def append(self, task):
         """!
         Append a task to the task list. The list will be sorted by task 
         priorities so that the scheduler can quickly find the highest priority
         task which is ready to run at any given time. 
+        A @c TimerTask is only kept for diagnostic printouts, as its timer
+        runs it.
         @param task The task to be appended to the list
         """
+        if isinstance(task, TimerTask):
+            self.timer_list.append(task)
+            return
+
         # See if there's a tasklist with the given priority in the main list
         new_pri = task.priority
         for pri in self.pri_list:
@@ -346,6 +879,25 @@ class TaskList:
 
         # Make sure the main list (of lists at each priority) is sorted
         self.pri_list.sort(key=lambda pri: pri[0], reverse=True)
+        self._heap = None
+
+        self._go_tasks.append(None)
+        task._task_list = self
+        if task.go_flag:
+            self._queue_go(task)
+
+
+    def _queue_go(self, task):
+        """!
+        Add a task to the list of those triggered by @c go(), unless it's
+        already there. This may be called from an interrupt service routine.
+        """
+        irq_state = disable_irq()
+        if not task._go_queued:
+            task._go_queued = True
+            self._go_tasks[self._go_count] = task
+            self._go_count += 1
+        enable_irq(irq_state)
 
 
     @micropython.native
@@ -391,6 +943,159 @@ class TaskList:
                     return
 
 
+    def rebuild(self):
+        """!
+        Rebuild the structures used by @c deadline_sched(). This is done
+        automatically when tasks are added, but must be done by hand if a
+        task's period is changed between timed and untimed with
+        @c set_period().
+        """
+        self._heap = []
+        for pri in self.pri_list:
+            for task in pri[2:]:
+                task._in_heap = False
+                if task.period is not None and task._waiting is None:
+                    self._heap_push(task)
+
+
+    def _heap_push(self, task):
+        """!
+        Add a task to the deadline heap. Deadlines are compared with
+        @c ticks_diff() so that the order survives the tick counter wrapping
+        around.
+        """
+        heap = self._heap
+        heap.append(task)
+        task._in_heap = True
+        pos = len(heap) - 1
+        while pos > 0:
+            parent = (pos - 1) >> 1
+            if utime.ticks_diff(task._next_run, heap[parent]._next_run) >= 0:
+                break
+            heap[pos] = heap[parent]
+            pos = parent
+        heap[pos] = task
+
+
+    def _heap_pop(self, pos=0):
+        """!
+        Remove and return a task from the deadline heap, by default the one
+        which is due soonest.
+        @param pos The task's position in the heap
+        """
+        heap = self._heap
+        top = heap[pos]
+        top._in_heap = False
+        last = heap.pop()
+        if pos < len(heap):
+            # the last task fills the gap; move it up if it's due sooner than
+            # the gap's parent, otherwise down past any child due sooner
+            while pos > 0:
+                parent = (pos - 1) >> 1
+                if utime.ticks_diff(last._next_run, heap[parent]._next_run) >= 0:
+                    break
+                heap[pos] = heap[parent]
+                pos = parent
+            length = len(heap)
+            while True:
+                child = 2*pos + 1
+                if child >= length:
+                    break
+                if child + 1 < length and utime.ticks_diff(
+                        heap[child + 1]._next_run, heap[child]._next_run) < 0:
+                    child += 1
+                if utime.ticks_diff(heap[child]._next_run, last._next_run) >= 0:
+                    break
+                heap[pos] = heap[child]
+                pos = child
+            heap[pos] = last
+        return top
+
+
+    def deadline_sched(self, idle_margin=1000):
+        """!
+        Run tasks according to their priorities, looking only at tasks which
+        are due.
+        Timed tasks are kept in a heap ordered by the time each is next due,
+        so only the ones whose time has come are looked at, rather than every
+        task on every call, and tasks triggered by @c go() are kept in a short
+        list of their own. Of the tasks which are due or have been triggered
+        with @c go(), the one with the highest priority is run, as with
+        @c pri_sched(); profiling and tracing work the same way. If no task is
+        ready and the next one isn't due for a while, the CPU is put to sleep
+        until the next interrupt, which may be the system tick or one which
+        calls a task's @c go() method, instead of spinning. Tasks waiting on a
+        share or queue are left out until data put into it wakes them.
+        @param idle_margin The shortest wait, in microseconds, for which the
+               CPU is put to sleep; shorter waits are spent polling, which
+               keeps the timing of tasks due very soon accurate
+        @return @c True if a task was run, @c False if not
+        """
+        if self._heap is None:
+            self.rebuild()
+
+        # a task triggered by go() may run whether or not it's timed, unless
+        # it's waiting on a share; tasks which have run since are dropped from
+        # the list
+        best = None
+        if self._go_count:
+            go_tasks = self._go_tasks
+            irq_state = disable_irq()
+            count = self._go_count
+            keep = 0
+            for pos in range(count):
+                task = go_tasks[pos]
+                if not task.go_flag:
+                    task._go_queued = False
+                    continue
+                go_tasks[keep] = task
+                keep += 1
+                if task._waiting is None and (best is None
+                                              or task.priority > best.priority):
+                    best = task
+            for pos in range(keep, count):
+                go_tasks[pos] = None
+            self._go_count = keep
+            enable_irq(irq_state)
+
+        # take all the timed tasks which are due out of the heap
+        heap = self._heap
+        due = self._due
+        now = utime.ticks_us()
+        while heap and utime.ticks_diff(now, heap[0]._next_run) > 0:
+            task = self._heap_pop()
+            # a task waiting on a share stays out of the heap until woken
+            if task._waiting is not None:
+                continue
+            due.append(task)
+            if best is None or task.priority > best.priority:
+                best = task
+
+        if best is None:
+            if not heap or utime.ticks_diff(heap[0]._next_run,
+                                            now) > idle_margin:
+                idle()
+            return False
+
+        # schedule() updates the task's next run time, so the due tasks, and
+        # a triggered task which wasn't due, are only put back in the heap
+        # afterwards
+        if best._in_heap:
+            self._heap_pop(heap.index(best))
+        best.schedule()
+        for task in due:
+            if task._waiting is None:
+                self._heap_push(task)
+        due.clear()
+
+        # so does a timed task which was triggered or woken by a share, unless
+        # it has just started waiting again
+        if (best.period is not None and not best._in_heap
+                and best._waiting is None):
+            self._heap_push(best)
+        return True
+
+
     def __repr__(self):
         """!
         Create some diagnostic text showing the tasks in the task list.
@@ -400,10 +1105,41 @@ class TaskList:
         for pri in self.pri_list:
             for task in pri[2:]:
                 ret_str += str(task) + '\n'
+        for task in self.timer_list:
+            ret_str += str(task) + '\n'
+
+        profiled = self._profiled()
+        if profiled:
+            ret_str += '\nHISTOGRAMS (us)            P50      P90      P99' \
+                '  COUNTS\n'
+            for task in profiled:
+                ret_str += task.get_histograms() + '\n'
 
         return ret_str
 
 
+    def _profiled(self):
+        # the tasks which have histograms, highest priority first, then the
+        # timer tasks
+        return [task for pri in self.pri_list for task in pri[2:]
+                if task._prof] + [task for task in self.timer_list
+                                  if task._prof]
+
+
+    def write_histograms(self, stream):
+        """!
+        Write the run time and lateness histograms of all the profiled tasks
+        to a stream in a compact binary form, for comparison between runs on
+        a PC. The format is described at @c HIST_HEADER_FMT.
+        @param stream A file or other stream opened for binary writing
+        """
+        profiled = self._profiled()
+        stream.write(struct.pack(HIST_HEADER_FMT, HIST_MAGIC, HIST_VERSION,
+                                 HIST_BUCKETS, len(profiled)))
+        for task in profiled:
+            task.write_histograms(stream)
+
+
 ## This is @b the main task list which is created for scheduling when 
 #  @c cotask.py is imported into a program. 
 task_list = TaskList()
\ No newline at end of file
@@ -71,10 +71,57 @@ class BaseShare:
         self._type_code = type_code
         self._thread_protect = thread_protect
 
+        # Tasks which are parked until data is next put into this queue or
+        # share; see @c park()
+        self._waiters = []
+
         # Add this queue to the global share and queue list
         share_list.append (self)
 
 
+    def park (self, task):
+        """!
+        Register a task which is to wait until data is next put into this
+        queue or share.
+
+        This method is called by the scheduler when a task yields this object
+        rather than a state; the task is not run again until @c put() wakes
+        it, so a task which is waiting for something to do takes no CPU time:
+        @code
+        |   def some_task (shares):
+        |       my_share, = shares
+        |       while True:
+        |           if my_share.get () == 3:
+        |               do_something ()
+        |               yield 3
+        |           else:
+        |               yield my_share       # Sleep until my_share changes
+        @endcode
+        @param task The task which is to wait, which must have a @c wake()
+               method
+        @return @c True if the task must wait, @c False if it may run again
+                right away
+        """
+        if self._thread_protect:
+            irq_state = pyb.disable_irq ()
+        self._waiters.append (task)
+        if self._thread_protect:
+            pyb.enable_irq (irq_state)
+        return True
+
+
+    @micropython.native
+    def _wake (self):
+        """!
+        Wake all the tasks which are waiting on this queue or share. This is
+        called by @c put() with interrupts disabled if thread protection is
+        on, so it doesn't allocate memory and may run in an ISR.
+        """
+        for task in self._waiters:
+            task.wake ()
+        self._waiters.clear ()
+
+
 # ============================================================================
 
 class Queue (BaseShare):
@@ -209,6 +256,10 @@ class Queue (BaseShare):
         if self._num_items > self._max_full:     # Record maximum fillage
             self._max_full = self._num_items
 
+        # Let tasks waiting for data run again
+        if self._waiters:
+            self._wake ()
+
         # Re-enable interrupts
         if self._thread_protect and not in_ISR:
             pyb.enable_irq (_irq_state)
@@ -309,6 +360,25 @@ class Queue (BaseShare):
         return (self._num_items)
 
 
+    def park (self, task):
+        """!
+        Register a task which is to wait until there is something in the
+        queue. If there already is, the task doesn't wait.
+        @param task The task which is to wait
+        @return @c True if the task must wait, @c False if it may run again
+                right away
+        """
+        # Check and register together, so an ISR can't put an item in between
+        if self._thread_protect:
+            irq_state = pyb.disable_irq ()
+        wait = self._num_items <= 0
+        if wait:
+            self._waiters.append (task)
+        if self._thread_protect:
+            pyb.enable_irq (irq_state)
+        return wait
+
+
     def clear (self):
         """!
         Remove all contents from the queue.
@@ -412,6 +482,10 @@ class Share (BaseShare):
 
         self._buffer[0] = data
 
+        # Let tasks waiting for new data run again
+        if self._waiters:
+            self._wake ()
+
         # Re-enable interrupts
         if self._thread_protect and not in_ISR:
             pyb.enable_irq (irq_state)
@@ -0,0 +1,66 @@
+"""!
+@file conftest.py
+This file contains the CPython stand-ins for the MicroPython modules which the
+turret code uses, so that it can be tested on a PC with pytest.
+"""
+
+import builtins
+import collections
+import gc
+import os
+import sys
+import time
+import types
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir)
+sys.path.insert(0, os.path.join(ROOT, 'src'))
+sys.path.insert(0, os.path.join(ROOT, 'src', 'task'))
+sys.path.insert(0, os.path.join(ROOT, 'tools'))
+
+TICKS_MAX = 0x3FFFFFFF
+
+
+def _module(name, **attrs):
+    module = types.ModuleType(name)
+    module.__dict__.update(attrs)
+    sys.modules.setdefault(name, module)
+    return sys.modules[name]
+
+
+def _ticks_diff(end, start):
+    return ((end - start + 0x20000000) & TICKS_MAX) - 0x20000000
+
+
+_start = time.perf_counter()
+
+builtins.const = lambda value: value
+sys.modules.setdefault('ucollections', collections)
+_module('micropython',
+        const=lambda value: value,
+        native=lambda func: func,
+        viper=lambda func: func,
+        schedule=lambda func, arg: func(arg),
+        alloc_emergency_exception_buf=lambda size: None)
+_module('utime',
+        ticks_us=lambda: int((time.perf_counter() - _start)*1e6) & TICKS_MAX,
+        ticks_ms=lambda: int((time.perf_counter() - _start)*1e3) & TICKS_MAX,
+        ticks_add=lambda ticks, delta: (ticks + delta) & TICKS_MAX,
+        ticks_diff=_ticks_diff,
+        sleep_ms=lambda ms: None,
+        sleep_us=lambda us: None)
+_module('machine',
+        Pin=type('Pin', (), {}),
+        I2C=type('I2C', (), {}),
+        idle=lambda: None,
+        disable_irq=lambda: 0,
+        enable_irq=lambda state: None)
+_module('pyb',
+        Pin=sys.modules['machine'].Pin,
+        disable_irq=lambda: 0,
+        enable_irq=lambda state: None,
+        wfi=lambda: None,
+        delay=lambda ms: None)
+if not hasattr(gc, 'mem_free'):
+    gc.mem_free = lambda: 100000
+    gc.mem_alloc = lambda: 0
+
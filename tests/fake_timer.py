@@ -0,0 +1,41 @@
+"""!
+@file fake_timer.py
+This file contains stand-ins for a hardware timer and for MicroPython's queue
+of scheduled functions, for host tests of timer tasks.
+"""
+
+
+class FakeTimer:
+    """! A stand-in for a @c pyb.Timer which ticks when told to.
+    """
+    def __init__(self):
+        self.isr = None
+
+    def callback(self, isr):
+        self.isr = isr
+
+    def tick(self):
+        if self.isr is not None:
+            self.isr(self)
+
+
+class ScheduleQueue:
+    """! A stand-in for @c micropython.schedule(), whose functions only run
+    when @c run() is called, as at the next bytecode boundary on the board.
+    """
+    def __init__(self, depth=2):
+        self.depth = depth
+        self.queue = []
+
+    def __len__(self):
+        return len(self.queue)
+
+    def schedule(self, func, arg):
+        if len(self.queue) >= self.depth:
+            raise RuntimeError("schedule queue full")
+        self.queue.append((func, arg))
+
+    def run(self):
+        while self.queue:
+            func, arg = self.queue.pop(0)
+            func(arg)
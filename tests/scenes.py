@@ -0,0 +1,27 @@
+"""!
+@file scenes.py
+This file contains a helper which draws simple test images for the host tests.
+"""
+
+from array import array
+
+from mlx90640.calibration import NUM_COLS, IMAGE_SIZE
+
+
+def image(spots, background=100):
+    """! An image with the given pixels on a flat background.
+    @param spots A dict of (row, col) in display coordinates to pixel value
+    @returns The pixel array, in sensor order like @c RawImage.pix
+    """
+    pix = array('h', [background] * IMAGE_SIZE)
+    for (row, col), value in spots.items():
+        pix[row*NUM_COLS + NUM_COLS - 1 - col] = value
+    return pix
+
+
+def block(top, left, rows, cols, value):
+    """! The spots of a filled rectangle, for @c image().
+    """
+    return {(row, col): value
+            for row in range(top, top + rows)
+            for col in range(left, left + cols)}
@@ -0,0 +1,62 @@
+from mlx90640.aiming import (pixel_to_ticks, aim, observe, setpoints,
+                             TRACKER_GATE)
+from mlx90640.targeting import SUBPIXEL_SCALE
+from mlx90640.tracker import Tracker
+
+
+def test_centre_of_image():
+    yaw, pitch = pixel_to_ticks(12*SUBPIXEL_SCALE, 16*SUBPIXEL_SCALE)
+    assert pitch == 0
+    assert yaw == pixel_to_ticks(0, 16*SUBPIXEL_SCALE)[0]
+
+
+def test_directions():
+    centre_yaw, centre_pitch = pixel_to_ticks(12*SUBPIXEL_SCALE,
+                                              16*SUBPIXEL_SCALE)
+    left_yaw, up_pitch = pixel_to_ticks(4*SUBPIXEL_SCALE, 2*SUBPIXEL_SCALE)
+    right_yaw, down_pitch = pixel_to_ticks(20*SUBPIXEL_SCALE,
+                                           30*SUBPIXEL_SCALE)
+    assert left_yaw > centre_yaw > right_yaw
+    assert up_pitch > centre_pitch > down_pitch
+
+
+def test_aim_is_relative_to_position():
+    row, col = 8*SUBPIXEL_SCALE, 20*SUBPIXEL_SCALE
+    yaw, pitch = pixel_to_ticks(row, col)
+    tracker = Tracker(gate=TRACKER_GATE)
+    assert aim(tracker, row, col, 0, (150, -40), lead_ms=0) == (
+        yaw + 150, pitch - 40, True)
+    # the tracker is left in the frame of the encoders
+    assert tracker.predict(0) == (yaw + 150, pitch - 40)
+
+
+def test_aim_keeps_a_still_target_still():
+    # after the first image the turret turns until the target is in the
+    # centre of the image, where it stays; the aim shouldn't move
+    tracker = Tracker(gate=TRACKER_GATE)
+    row, col = 6*SUBPIXEL_SCALE, 24*SUBPIXEL_SCALE
+    target = aim(tracker, row, col, 0, lead_ms=0)[:2]
+    centre = pixel_to_ticks(12*SUBPIXEL_SCALE, 16*SUBPIXEL_SCALE)
+    position = (target[0] - centre[0], target[1] - centre[1])
+    for step in range(1, 5):
+        yaw, pitch, accepted = aim(tracker, 12*SUBPIXEL_SCALE,
+                                   16*SUBPIXEL_SCALE, 100*step, position,
+                                   lead_ms=0)
+        assert accepted
+        assert (yaw, pitch) == target
+
+
+def test_setpoints_lead_a_moving_target():
+    # a target one pixel further right in each image; the turret holds still
+    tracker = Tracker(gate=TRACKER_GATE)
+    row = 12*SUBPIXEL_SCALE
+    for step in range(2):
+        assert observe(tracker, row, (10 + step)*SUBPIXEL_SCALE, 200*step,
+                       (500, 0))
+    assert tracker.updates == 2
+    first = pixel_to_ticks(row, 10*SUBPIXEL_SCALE)
+    second = pixel_to_ticks(row, 11*SUBPIXEL_SCALE)
+    # another 200 ms on from the second image, half of it the lead
+    yaw, pitch = setpoints(tracker, 300, lead_ms=100)
+    assert abs(yaw - (500 + 2*second[0] - first[0])) <= 1
+    assert pitch == second[1]
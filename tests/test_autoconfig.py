@@ -0,0 +1,71 @@
+import pytest
+
+from fake_i2c import FakeI2C, CAMERA_ADDR
+from mlx90640 import MLX90640, RefreshRate
+from mlx90640.calibration import CameraCalibration, IMAGE_SIZE
+from mlx90640.autoconfig import (
+    Throughput,
+    measure,
+    select_profile,
+    auto_configure,
+    ADC_16_BIT,
+    ADC_17_BIT,
+    ADC_18_BIT,
+    ADC_19_BIT,
+)
+
+
+def throughput(work_us=25000, peak=3000, adc_resolution=ADC_18_BIT):
+    return Throughput(work_us - 5000, 5000, 100000, peak, adc_resolution)
+
+
+@pytest.fixture
+def camera():
+    cam = MLX90640(FakeI2C(seed=2), CAMERA_ADDR)
+    cam.setup(calib=CameraCalibration(cam.iface, cam.eeprom))
+    return cam
+
+
+def test_fastest_rate_which_fits():
+    # 25 ms of work fits in 3/4 of a 16 Hz period but not of a 32 Hz one
+    profile = select_profile(throughput(25000))
+    assert profile.freq == 16
+    assert profile.refresh_rate == RefreshRate.from_freq(16)
+    assert profile.load == pytest.approx(0.4)
+    assert select_profile(throughput(25000), max_rate=3).freq == 4
+    # too slow for any rate
+    profile = select_profile(throughput(3000000))
+    assert profile.refresh_rate == RefreshRate.values[0]
+    assert profile.load > 1
+
+
+@pytest.mark.parametrize('peak, measured_at, base, chosen', (
+    (3000, ADC_18_BIT, ADC_19_BIT, ADC_19_BIT),
+    (12000, ADC_18_BIT, ADC_19_BIT, ADC_18_BIT),
+    (30000, ADC_18_BIT, ADC_18_BIT, ADC_17_BIT),
+    (5000, ADC_16_BIT, ADC_18_BIT, ADC_17_BIT),
+    (32767, ADC_16_BIT, ADC_18_BIT, ADC_16_BIT),
+))
+def test_resolution_from_the_hottest_pixel(peak, measured_at, base, chosen):
+    profile = select_profile(throughput(peak=peak, adc_resolution=measured_at),
+                             base_resolution=base)
+    assert profile.adc_resolution == chosen
+
+
+def test_measure_and_apply(camera):
+    processed = []
+    result = measure(camera, processed.append, samples=4)
+    assert processed == [camera.raw] * 4
+    assert result.readout_us > 0
+    ram = camera.iface.i2c.mem[0x0400:0x0400 + IMAGE_SIZE]
+    assert result.peak == max(0x10000 - word if word & 0x8000 else word
+                              for word in ram)
+    assert result.adc_resolution == camera.registers['adc_resolution']
+
+    profile = auto_configure(camera, samples=2)
+    assert camera.registers['refresh_rate'] == profile.refresh_rate
+    assert camera.registers['adc_resolution'] == profile.adc_resolution
+    # the random RAM has pixels near full scale at 18 bits, so one bit less
+    # brings them down to half
+    assert profile.throughput.peak > 32000
+    assert profile.adc_resolution == ADC_17_BIT
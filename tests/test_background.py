@@ -0,0 +1,53 @@
+from mlx90640.background import BackgroundModel
+from mlx90640.calibration import IMAGE_SIZE
+from scenes import image, block
+
+
+def test_first_image_primes():
+    model = BackgroundModel()
+    assert model.update(image(block(5, 5, 3, 3, 500))) == 0
+    assert model.fg_count == 0
+    assert model.update(image(block(5, 5, 3, 3, 500))) == 0
+    assert not any(model.mask)
+
+
+def test_moving_object_is_foreground():
+    model = BackgroundModel(threshold=40)
+    model.update(image({}))
+    pix = image(block(5, 5, 2, 3, 300))
+    assert model.update(pix) == 6 * 200
+    assert model.fg_count == 6
+    assert sum(model.mask) == 6
+    assert all(model.mask[idx] == (pix[idx] == 300) for idx in range(IMAGE_SIZE))
+
+
+def test_background_follows_slow_drift():
+    model = BackgroundModel(threshold=40, shift=4)
+    model.update(image({}, background=100))
+    warmer = image({}, background=130)
+    for _ in range(100):
+        model.update(warmer)
+    assert model.fg_count == 0
+    assert min(model.bg) == max(model.bg) == 130
+
+
+def test_still_object_fades_in():
+    model = BackgroundModel(threshold=40, shift=4, fg_shift=3)
+    model.update(image({}))
+    pix = image({(10, 10): 400})
+    counts = [model.update(pix) and model.fg_count for _ in range(40)]
+    assert counts[0] == 1
+    assert counts[-1] == 0
+
+
+def test_update_idx_and_reset():
+    model = BackgroundModel()
+    model.update(image({}))
+    pix = image({}, background=500)
+    model.update(pix, update_idx=range(10))
+    assert model.fg_count == 10
+    assert model.bg[10] == 100
+
+    model.reset()
+    assert model.update(pix) == 0
+    assert model.bg[10] == 500
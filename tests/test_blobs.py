@@ -0,0 +1,74 @@
+from mlx90640.blobs import BlobDetector
+from mlx90640.calibration import NUM_COLS
+from mlx90640.targeting import SUBPIXEL_SCALE
+from scenes import image, block
+
+
+def test_person_and_lamp():
+    spots = block(8, 10, 4, 3, 300)
+    spots[(9, 11)] = 340
+    spots.update(block(3, 25, 1, 2, 1000))
+    pix = image(spots)
+
+    blobs = BlobDetector()
+    assert blobs.detect(pix, threshold=200) == 2
+    person, lamp = blobs.largest(), blobs.hottest()
+    assert person != lamp
+    assert blobs.area[person] == 12
+    assert (blobs.top[person], blobs.bottom[person]) == (8, 11)
+    assert (blobs.left[person], blobs.right[person]) == (10, 12)
+    assert blobs.centroid(person) == (
+        19*SUBPIXEL_SCALE // 2, 11*SUBPIXEL_SCALE)
+    assert blobs.area[lamp] == 2
+
+    hotspot = blobs.target(pix)
+    assert (hotspot.row, hotspot.col, hotspot.score) == (9, 11, 340)
+    assert blobs.labels[9*NUM_COLS + NUM_COLS - 1 - 11] == person
+
+
+def test_small_and_border_blobs_are_dropped():
+    spots = {(5, 5): 500, (15, 20): 500}
+    spots.update(block(0, 10, 1, 4, 500))
+    spots.update(block(10, 0, 3, 1, 500))
+    blobs = BlobDetector()
+    assert blobs.detect(image(spots), threshold=200) == 0
+    assert blobs.largest() == -1
+    assert max(blobs.labels) == -1
+
+
+def test_overflow():
+    spots = {}
+    for num in range(5):
+        spots.update(block(2 + 4*num, 4, 2, 2, 500))
+    blobs = BlobDetector(capacity=3)
+    assert blobs.detect(image(spots), threshold=200) == 3
+    assert blobs.overflow == 2
+
+
+def test_mask_limits_blobs():
+    spots = block(8, 10, 3, 3, 300)
+    spots.update(block(15, 20, 3, 3, 300))
+    pix = image(spots)
+    mask = bytearray(len(pix))
+    for row in range(15, 18):
+        for col in range(20, 23):
+            mask[row*NUM_COLS + NUM_COLS - 1 - col] = 1
+    blobs = BlobDetector()
+    assert blobs.detect(pix, threshold=200, mask=mask) == 1
+    assert blobs.top[0] == 15
+
+
+def test_cold_blob_falls_back_to_hotspot():
+    # the blob's peak is far too cold for a person, so the hottest spot of the
+    # image is used, scored on three pixels rather than the peak alone
+    spots = block(8, 10, 3, 3, 130)
+    spots[(9, 11)] = 140
+    pix = image(spots)
+    blobs = BlobDetector()
+    assert blobs.detect(pix, threshold=120) == 1
+    hotspot = blobs.target(pix)
+    assert (hotspot.row, hotspot.col, hotspot.score) == (9, 11, 400)
+
+    blobs.min_peak = 40
+    hotspot = blobs.target(pix)
+    assert (hotspot.row, hotspot.col, hotspot.score) == (9, 11, 140)
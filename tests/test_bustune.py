@@ -0,0 +1,96 @@
+import pytest
+
+from fake_i2c import FakeI2C, CAMERA_ADDR
+from mlx90640.bustune import tune, FAST_MODE_MAX
+from mlx90640.mlx_cam import MLX_Cam
+from mlx90640.regmap import REGISTER_MAP, RegisterMap, CameraInterface
+
+FMPLUS_OFF = 0x0001
+
+
+class ClockedBus:
+    """! A bus at one clock to a fake camera, which garbles reads above
+    @c limit Hz, or above 400 kHz while the camera's FM+ mode is off.
+    """
+    def __init__(self, camera, freq, limit, fail):
+        self.camera = camera
+        self.freq = freq
+        self.limit = limit
+        self.fail = fail
+
+    def _too_fast(self):
+        fmplus = not self.camera.mem[0x800F] & FMPLUS_OFF
+        return self.freq > self.limit or (self.freq > FAST_MODE_MAX
+                                          and not fmplus)
+
+    def readfrom_mem_into(self, addr, memaddr, buf, addrsize=16):
+        if self._too_fast() and self.fail == 'raise':
+            raise OSError(5)
+        self.camera.readfrom_mem_into(addr, memaddr, buf, addrsize)
+        if self._too_fast():
+            buf[len(buf) // 2] ^= 0x10
+
+    def readfrom_mem(self, addr, memaddr, nbytes, addrsize=16):
+        buf = bytearray(nbytes)
+        self.readfrom_mem_into(addr, memaddr, buf, addrsize)
+        return bytes(buf)
+
+    def writeto_mem(self, addr, memaddr, buf, addrsize=16):
+        self.camera.writeto_mem(addr, memaddr, buf, addrsize)
+
+
+def bus_maker(camera, limit, fail='garble'):
+    return lambda freq: ClockedBus(camera, freq, limit, fail)
+
+
+@pytest.mark.parametrize('fail', ('garble', 'raise'))
+def test_tune_turns_fm_plus_on_for_fast_clocks(fail):
+    camera = FakeI2C()
+    camera.mem[0x800F] = FMPLUS_OFF
+    profile = tune(bus_maker(camera, 800000, fail), CAMERA_ADDR)
+    # the clocks above 400 kHz only work if FM+ was really turned on
+    assert profile.freq == 800000
+    assert profile.fmplus
+    assert profile.bus.freq == 800000
+    assert [res.ok for res in profile.results] == [True]*4 + [False]
+    assert profile.results[-1].bytes_per_s == 0
+    assert not camera.mem[0x800F] & FMPLUS_OFF
+
+
+def test_tune_puts_fm_plus_back_when_unused():
+    camera = FakeI2C()
+    camera.mem[0x800F] = FMPLUS_OFF
+    registers = RegisterMap(CameraInterface(camera, CAMERA_ADDR), REGISTER_MAP)
+    assert registers['fmplus_disable'] == 1
+
+    profile = tune(bus_maker(camera, 400000), CAMERA_ADDR,
+                   registers=registers)
+    assert (profile.freq, profile.fmplus) == (400000, False)
+    assert len(profile.results) == 3
+    assert camera.mem[0x800F] & FMPLUS_OFF
+    # the driver's copy of the register was dropped while tune() changed it
+    camera.mem[0x800F] = 0
+    assert registers['fmplus_disable'] == 0
+
+
+def test_tune_leaves_fm_plus_on_as_found():
+    camera = FakeI2C()
+    profile = tune(bus_maker(camera, 400000), CAMERA_ADDR)
+    assert (profile.freq, profile.fmplus) == (400000, False)
+    assert not camera.mem[0x800F] & FMPLUS_OFF
+
+
+def test_tune_without_fm_plus():
+    camera = FakeI2C()
+    profile = tune(bus_maker(camera, 1000000), CAMERA_ADDR, fmplus=False)
+    assert profile.freq == FAST_MODE_MAX
+    assert [res.freq for res in profile.results] == [100000, 400000]
+
+
+@pytest.mark.parametrize('fmplus, bit', ((None, FMPLUS_OFF), (True, 0),
+                                         (False, FMPLUS_OFF)))
+def test_camera_sets_fm_plus_only_when_asked(fmplus, bit):
+    camera = FakeI2C()
+    camera.mem[0x800F] = FMPLUS_OFF if fmplus is None else 0
+    MLX_Cam(camera, fmplus=fmplus)
+    assert camera.mem[0x800F] & FMPLUS_OFF == bit
@@ -0,0 +1,85 @@
+import pytest
+
+from fake_i2c import FakeI2C, CAMERA_ADDR
+from mlx90640 import MLX90640, calib_cache
+from mlx90640.calibration import CameraCalibration
+
+# calibration fields kept exactly, as floats, and per pixel
+EXACT = ('k_vdd', 'vdd_25', 'res_ee', 'ptat_25', 'gain', 'kta_scale_1',
+         'kta_scale_2', 'kv_scale', 'ksto_scale', 'ct', 'outliers', 'failed')
+FLOATS = ('emissivity', 'kv_ptat', 'kt_ptat', 'alpha_ptat', 'ksta',
+          'il_chess_c1', 'il_chess_c2', 'il_chess_c3', 'drift', 'ksto',
+          'alpha_ext')
+ARRAYS = ('pix_os_ref', 'pix_alpha', 'pix_kta', 'il_offset')
+TGC_FIELDS = ('tgc', 'kta_cp', 'kv_cp', 'pix_alpha_cp')
+
+
+@pytest.fixture
+def camera():
+    return MLX90640(FakeI2C(seed=2), CAMERA_ADDR)
+
+
+def assert_same(calib, cached):
+    for name in EXACT:
+        assert getattr(cached, name) == getattr(calib, name), name
+    # the cache keeps scalars as single precision, like the pixel arrays
+    for name in FLOATS:
+        assert getattr(cached, name) == pytest.approx(getattr(calib, name),
+                                                      rel=1e-6), name
+    for sp_id in (0, 1):
+        assert cached.kv_avg[sp_id] == pytest.approx(calib.kv_avg[sp_id],
+                                                     rel=1e-6)
+    for name in ARRAYS:
+        assert getattr(cached, name) == getattr(calib, name), name
+
+
+@pytest.mark.parametrize('use_tgc', (False, True))
+def test_round_trip(camera, tmp_path, use_tgc):
+    path = str(tmp_path / 'calib.bin')
+    calib = CameraCalibration(camera.iface, camera.eeprom, use_tgc=use_tgc)
+    device_id = calib_cache.read_device_id(camera.eeprom)
+    calib_cache.save(calib, path, device_id)
+
+    cached = calib_cache.load(path, device_id, use_tgc=use_tgc)
+    assert_same(calib, cached)
+    if use_tgc:
+        assert cached.pix_os_cp == calib.pix_os_cp
+        for name in TGC_FIELDS:
+            assert getattr(cached, name) == pytest.approx(
+                getattr(calib, name), rel=1e-6), name
+
+
+def test_unusable_cache(camera, tmp_path):
+    path = tmp_path / 'calib.bin'
+    assert calib_cache.load(str(path), (1, 2, 3)) is None
+
+    calib = CameraCalibration(camera.iface, camera.eeprom)
+    device_id = calib_cache.read_device_id(camera.eeprom)
+    calib_cache.save(calib, str(path), device_id)
+    other_id = (device_id[0] ^ 1,) + device_id[1:]
+    assert calib_cache.load(str(path), other_id) is None
+    assert calib_cache.load(str(path), device_id, use_tgc=True) is None
+
+    data = bytearray(path.read_bytes())
+    data[1000] ^= 0x10
+    path.write_bytes(bytes(data))
+    assert calib_cache.load(str(path), device_id) is None
+
+    path.write_bytes(bytes(data[:500]))
+    assert calib_cache.load(str(path), device_id) is None
+
+
+def test_load_or_decode(camera, tmp_path, monkeypatch):
+    path = str(tmp_path / 'calib.bin')
+    calib = calib_cache.load_or_decode(camera.iface, camera.eeprom, path)
+
+    # the second time round nothing is decoded
+    class NoDecode(CameraCalibration):
+        def __init__(self, *args, **kwargs):
+            raise AssertionError("calibration decoded despite the cache")
+    monkeypatch.setattr(calib_cache, 'CameraCalibration', NoDecode)
+    cached = calib_cache.load_or_decode(camera.iface, camera.eeprom, path,
+                                        emissivity=0.95)
+    assert cached.emissivity == 0.95
+    cached.emissivity = calib.emissivity
+    assert_same(calib, cached)
@@ -0,0 +1,366 @@
+import pytest
+
+import cotask
+import task_share
+from fake_timer import FakeTimer, ScheduleQueue
+
+TICKS_MAX = 0x3FFFFFFF
+
+
+def test_hist_bucket():
+    assert [cotask.hist_bucket(usec) for usec in (0, 1, 2, 3, 4, 7, 8)] == [
+        0, 1, 2, 2, 3, 3, 4]
+    assert cotask.hist_bucket(1023) == 10
+    assert cotask.hist_bucket(1024) == 11
+    assert cotask.hist_bucket(10**9) == cotask.HIST_BUCKETS - 1
+
+
+def test_hist_percentile():
+    hist = [0] * cotask.HIST_BUCKETS
+    assert cotask.hist_percentile(hist, 50) is None
+    hist[3], hist[5], hist[9] = 50, 49, 1
+    assert cotask.hist_percentile(hist, 50) == 3
+    assert cotask.hist_percentile(hist, 99) == 5
+    assert cotask.hist_percentile(hist, 100) == 9
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """! A microsecond clock for @c cotask which starts just short of the
+    point where the ticks wrap and is moved on by hand.
+    """
+    now = [TICKS_MAX - 5000]
+    monkeypatch.setattr(cotask.utime, 'ticks_us', lambda: now[0])
+    return now
+
+
+def test_trace_ring_wraps(clock):
+    ring = cotask.TraceRing(4)
+    for state in range(1, 7):
+        clock[0] = (clock[0] + 1000) & TICKS_MAX
+        ring.record(clock[0], state & 1, state - 1, state)
+    assert ring.count == 6
+    items = list(ring.items())
+    assert [item[2:] for item in items] == [(2, 3), (3, 4), (4, 5), (5, 6)]
+    assert [item[0] for item in items] == pytest.approx(
+        [0.003, 0.004, 0.005, 0.006], abs=1e-9)
+    assert [item[3] for item in ring.items(task_num=0)] == [4, 6]
+
+
+def test_trace_ring_times_stay_exact(clock):
+    # a day of transitions 1.000123 s apart wraps the ticks many times over
+    ring = cotask.TraceRing(8)
+    gap = 1000123
+    runs = 86400
+    for run in range(runs):
+        clock[0] = (clock[0] + gap) & TICKS_MAX
+        ring.record(clock[0], 0, run & 1, ~run & 1)
+    times = [item[0] for item in ring.items()]
+    assert times == pytest.approx(
+        [(runs - 7 + num) * gap / 1e6 for num in range(8)], abs=1e-6)
+
+    ring.clear()
+    assert list(ring.items()) == []
+
+
+def counting_task(runs, name):
+    def run():
+        while True:
+            runs.append(name)
+            yield 0
+    return run
+
+
+def test_go_tasks_run_by_priority(clock):
+    tasks = cotask.TaskList()
+    runs = []
+    low = cotask.Task(counting_task(runs, 'low'), priority=1)
+    high = cotask.Task(counting_task(runs, 'high'), priority=3)
+    tasks.append(low)
+    tasks.append(high)
+
+    assert not tasks.deadline_sched()
+    low.go()
+    high.go()
+    high.go()
+    assert tasks.deadline_sched()
+    assert tasks.deadline_sched()
+    assert not tasks.deadline_sched()
+    assert runs == ['high', 'low']
+    assert tasks._go_count == 0
+
+
+def run_until(tasks, clock, end_us, step_us=500):
+    # move the clock on in small steps, running the scheduler as the board
+    # would
+    start = clock[0]
+    while cotask.utime.ticks_diff(clock[0], start) < end_us:
+        tasks.deadline_sched()
+        clock[0] = (clock[0] + step_us) & TICKS_MAX
+
+
+def test_deadline_order(clock):
+    tasks = cotask.TaskList()
+    runs = []
+    fast = cotask.Task(counting_task(runs, 'fast'), priority=1, period=10)
+    slow = cotask.Task(counting_task(runs, 'slow'), priority=2, period=25)
+    urgent = cotask.Task(counting_task(runs, 'urgent'), priority=3, period=25)
+    for task in (fast, slow, urgent):
+        tasks.append(task)
+
+    run_until(tasks, clock, 52000)
+    # when several are due, the highest priority goes first and the others
+    # follow on the next calls
+    assert runs == ['fast', 'fast', 'urgent', 'slow', 'fast', 'fast',
+                    'urgent', 'slow', 'fast']
+    assert tasks._heap[0] is fast
+
+
+def test_idle_when_nothing_is_due(clock, monkeypatch):
+    sleeps = []
+    monkeypatch.setattr(cotask, 'idle', lambda: sleeps.append(clock[0]))
+    tasks = cotask.TaskList()
+    assert not tasks.deadline_sched()
+    assert len(sleeps) == 1
+
+    tasks.append(cotask.Task(counting_task([], 'task'), period=10))
+    assert not tasks.deadline_sched()
+    assert len(sleeps) == 2
+
+    # due within the idle margin: poll rather than sleep
+    clock[0] = (clock[0] + 9500) & TICKS_MAX
+    assert not tasks.deadline_sched(idle_margin=1000)
+    assert len(sleeps) == 2
+    clock[0] = (clock[0] + 1000) & TICKS_MAX
+    assert tasks.deadline_sched()
+
+
+def test_triggered_timed_task_stays_in_heap_once(clock):
+    tasks = cotask.TaskList()
+    runs = []
+    timed = cotask.Task(counting_task(runs, 'timed'), period=10)
+    other = cotask.Task(counting_task(runs, 'other'), period=15)
+    tasks.append(timed)
+    tasks.append(other)
+    assert not tasks.deadline_sched()
+    timed.go()
+    assert tasks.deadline_sched()
+    assert sorted(id(task) for task in tasks._heap) == sorted(
+        (id(timed), id(other)))
+    assert tasks._heap[0] is timed
+
+    run_until(tasks, clock, 16000)
+    assert runs == ['timed', 'timed', 'other']
+
+
+def sleeper(runs):
+    # records the share's value each time it runs, then waits for the next
+    # put()
+    def run(shares):
+        share, = shares
+        while True:
+            runs.append(share.get())
+            yield share
+    return run
+
+
+def test_task_parks_on_share(clock):
+    tasks = cotask.TaskList()
+    runs = []
+    share = task_share.Share('h', name="Wait")
+    task = cotask.Task(sleeper(runs), shares=(share,))
+    task.go()
+    tasks.append(task)
+
+    assert tasks.deadline_sched()
+    assert runs == [0]
+    assert task._waiting is share
+    assert not task.ready()
+    task.go_flag = True
+    tasks.pri_sched()
+    assert runs == [0]
+
+    share.put(5)
+    assert task._waiting is None
+    assert tasks.deadline_sched()
+    assert runs == [0, 5]
+    assert not tasks.deadline_sched()
+
+
+def test_queue_with_items_doesnt_park(clock):
+    runs = []
+    queue = task_share.Queue('h', 4, name="Items")
+    task = cotask.Task(sleeper(runs), shares=(queue,))
+    queue.put(1)
+    assert queue.park(task) is False
+    assert not queue._waiters
+
+    queue.get()
+    assert queue.park(task) is True
+    queue.put(2)
+    assert not queue._waiters
+    assert task.go_flag
+
+
+def test_parked_timed_task_leaves_heap(clock):
+    tasks = cotask.TaskList()
+    runs = []
+    share = task_share.Share('h', name="Wait")
+    task = cotask.Task(sleeper(runs), period=10, shares=(share,))
+    tasks.append(task)
+
+    run_until(tasks, clock, 11000)
+    assert runs == [0]
+    assert not task._in_heap
+    assert tasks._heap == []
+
+    # parked tasks aren't run however long they wait
+    run_until(tasks, clock, 100000)
+    assert runs == [0]
+
+    # once woken, the task runs right away and is timed again from then
+    share.put(7)
+    woken = clock[0]
+    assert tasks.deadline_sched()
+    assert runs == [0, 7]
+    assert task._waiting is share
+    assert not task._in_heap
+    assert cotask.utime.ticks_diff(task._next_run, woken) == 10000
+
+
+def test_woken_timed_task_reenters_heap(clock):
+    tasks = cotask.TaskList()
+    runs = []
+    share = task_share.Share('h', name="Wait")
+
+    def once(shares):
+        # waits for one put(), then runs on its period
+        yield share
+        while True:
+            runs.append(share.get())
+            yield 0
+    task = cotask.Task(once, period=10, shares=(share,))
+    tasks.append(task)
+
+    run_until(tasks, clock, 11000)
+    assert task._waiting is share and not task._in_heap
+    share.put(3)
+    assert tasks.deadline_sched()
+    assert runs == [3]
+    assert tasks._heap == [task]
+
+    run_until(tasks, clock, 11000)
+    assert runs == [3, 3]
+
+
+def test_out_of_order_stamps(clock):
+    # a timer task which runs between another task's time stamp and its
+    # record() stamps its transition later but records it first
+    ring = cotask.TraceRing(8)
+    start = clock[0]
+    ring.record((start + 2000) & TICKS_MAX, 1, 0, 1)
+    ring.record((start + 1500) & TICKS_MAX, 0, 0, 1)
+    ring.record((start + 3000) & TICKS_MAX, 0, 1, 2)
+    assert [item[:2] for item in ring.items()] == pytest.approx(
+        [(0.002, 1), (0.002, 0), (0.003, 0)], abs=1e-9)
+
+
+@pytest.fixture
+def scheduled(monkeypatch):
+    queue = ScheduleQueue()
+    monkeypatch.setattr(cotask.micropython, 'schedule', queue.schedule)
+    return queue
+
+
+def test_timer_task_runs_on_ticks(clock, scheduled):
+    runs = []
+    timer = FakeTimer()
+    task = cotask.TimerTask(counting_task(runs, 'control'), timer=timer,
+                            freq=50, profile=True)
+    timer.tick()
+    assert not scheduled
+    task.start()
+
+    timer.tick()
+    clock[0] = (clock[0] + 300) & TICKS_MAX
+    scheduled.run()
+    assert runs == ['control']
+    assert task._late_hist[cotask.hist_bucket(300)] == 1
+
+    # a tick before the task has run is skipped
+    timer.tick()
+    timer.tick()
+    assert task.missed == 1
+    scheduled.run()
+    assert runs == ['control'] * 2
+
+    # a run scheduled before stop() doesn't happen
+    timer.tick()
+    task.stop()
+    scheduled.run()
+    timer.tick()
+    assert not scheduled
+    assert runs == ['control'] * 2
+
+
+def test_timer_task_full_schedule_queue(clock, scheduled):
+    timer = FakeTimer()
+    task = cotask.TimerTask(counting_task([], 'control'), timer=timer,
+                            freq=50)
+    task.start()
+    scheduled.queue.extend([(print, None)] * 2)
+    timer.tick()
+    assert task.missed == 1
+    assert not task._pending
+
+
+def test_timer_task_records_allocation(clock, scheduled, monkeypatch):
+    allocated = [0]
+    monkeypatch.setattr(cotask.gc, 'mem_alloc', lambda: allocated[0])
+
+    def greedy():
+        for size in (16, 64, 32):
+            allocated[0] += size
+            yield 0
+        while True:
+            yield 0
+    timer = FakeTimer()
+    task = cotask.TimerTask(greedy, timer=timer, freq=50, profile=True)
+    task.start()
+    for _ in range(5):
+        timer.tick()
+        scheduled.run()
+    assert task.max_alloc == 64
+    assert 'alloc 64' in repr(task)
+
+
+def test_timer_task_shares_a_trace_ring(clock, scheduled):
+    ring = cotask.TraceRing(16)
+    timer = FakeTimer()
+
+    def ticker():
+        state = 0
+        while True:
+            state ^= 1
+            yield state
+    task = cotask.Task(ticker, period=10, trace=ring)
+    timer_task = cotask.TimerTask(ticker, timer=timer, freq=50, trace=ring)
+    timer_task.start()
+
+    # the timer task runs while the cooperative task is between its time
+    # stamp and record()
+    real_record = ring.record
+
+    def record(stamp, *args):
+        if args[0] == task._tr_num and not scheduled:
+            clock[0] = (clock[0] + 100) & TICKS_MAX
+            timer.tick()
+            scheduled.run()
+        real_record(stamp, *args)
+    ring.record = record
+    for _ in range(3):
+        clock[0] = (clock[0] + 10500) & TICKS_MAX
+        task.schedule()
+    times = [item[0] for item in ring.items()]
+    assert len(times) == 6
+    assert times == sorted(times)
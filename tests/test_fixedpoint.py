@@ -0,0 +1,130 @@
+import ast
+import random
+import types
+from array import array
+
+import pytest
+
+from fake_i2c import FakeI2C, CAMERA_ADDR
+from mlx90640 import MLX90640, CameraState
+from mlx90640.calibration import CameraCalibration, IMAGE_SIZE, TEMP_K
+from mlx90640.image import Subpage, ChessPattern, InterleavedPattern
+from mlx90640.processing import ProcessedImage
+from mlx90640 import fixedpoint
+from mlx90640.fixedpoint import FixedPointImage, accuracy_report
+
+# the bound quoted for the fixed-point engine, in hundredths of a degree
+MAX_ERROR = 9
+
+
+@pytest.fixture
+def camera():
+    cam = MLX90640(FakeI2C(seed=1), CAMERA_ADDR)
+    cam.setup(calib=CameraCalibration(cam.iface, cam.eeprom))
+    # the random EEPROM gives an implausible Ksto; use a typical one
+    ksto = cam.calib.ksto
+    cam.calib.ksto = (ksto[0], -0.0006, ksto[2], ksto[3])
+    return cam
+
+
+def make_frames(cam, count=3, seed=3):
+    """! Put scenes into the camera's RAM and read them as the turret would;
+    a few hot pixels stand in for a target.
+    @returns A list of raw pixel lists
+    """
+    rnd = random.Random(seed)
+    frames = []
+    for _ in range(count):
+        for idx in range(IMAGE_SIZE):
+            hot = 30000 if idx % 97 == 0 else 1500
+            value = int(cam.calib.pix_os_ref[idx]) + rnd.randrange(-100, hot)
+            cam.iface.i2c.mem[0x0400 + idx] = value & 0xFFFF
+        for sp_id in (0, 1):
+            cam.read_image(sp_id)
+        frames.append(list(cam.raw.pix))
+    return frames
+
+
+@pytest.mark.parametrize('pattern', (ChessPattern, InterleavedPattern))
+@pytest.mark.parametrize('emissivity', (1, 0.95))
+def test_accuracy_against_float_engine(camera, pattern, emissivity):
+    frames = make_frames(camera)
+    camera.calib.emissivity = emissivity
+    reference = ProcessedImage(camera.calib, pattern=pattern)
+    fixed = FixedPointImage(camera.calib, pattern=pattern)
+    for frame, pix in enumerate(frames):
+        state = CameraState(vdd=0.05*frame, ta=3.0 + frame,
+                            ta_r=(28 + frame + TEMP_K)**4, gain=1.02,
+                            gain_cp=(0, 0))
+        for sp_id in (0, 1):
+            subpage = Subpage(pattern, sp_id)
+            reference.update(pix, subpage, state)
+            fixed.update(pix, subpage, state)
+        max_err, mean_err, worst, count = accuracy_report(fixed, reference)
+        assert count > IMAGE_SIZE * 0.9
+        assert max_err <= MAX_ERROR, (frame, worst)
+
+
+class _Recorder(ast.NodeTransformer):
+    # wraps each arithmetic operation in a call to _rec(), which sees its
+    # result
+    def visit_BinOp(self, node):
+        self.generic_visit(node)
+        return ast.copy_location(ast.Call(ast.Name('_rec', ast.Load()),
+                                          [node], []), node)
+
+
+def recording_engine():
+    """! The fixedpoint module with every integer result in
+    @c FixedPointImage.update() and the roots recorded.
+    @returns A tuple (module, list of the largest size seen)
+    """
+    with open(fixedpoint.__file__) as src:
+        tree = ast.parse(src.read())
+    for node in ast.walk(tree):
+        if isinstance(node, ast.FunctionDef) and node.name in (
+                'update', '_isqrt', '_fourth_root'):
+            _Recorder().visit(node)
+    largest = [0]
+
+    def _rec(value):
+        if isinstance(value, int) and abs(value) > largest[0]:
+            largest[0] = abs(value)
+        return value
+
+    module = types.ModuleType('fixedpoint_recorded')
+    module._rec = _rec
+    exec(compile(ast.fix_missing_locations(tree), fixedpoint.__file__,
+                 'exec'), module.__dict__)
+    return module, largest
+
+
+def test_small_ints_with_a_realistic_alpha(camera):
+    # the test EEPROM's alphas are several times too big; a real camera's
+    # are around 1.5e-7, where v_ir*inv_alpha is past 2**30 for hot pixels
+    calib = camera.calib
+    calib.pix_alpha = array('f', (1.2e-7 + 1e-8*(idx % 7)
+                                  for idx in range(IMAGE_SIZE)))
+    state = CameraState(vdd=0.0, ta=0.0, ta_r=(22 + TEMP_K)**4, gain=1.02,
+                        gain_cp=(0, 0))
+    engine, largest = recording_engine()
+    fixed = engine.FixedPointImage(calib)
+    reference = ProcessedImage(calib)
+
+    # flat scenes from room temperature to 300 degC, with the raw values
+    # worked back from the float engine's model without Ksto
+    for temp in (25, 100, 200, 300):
+        pix = [round((calib.pix_alpha[idx]*((temp + TEMP_K)**4 - state.ta_r)
+                      + calib.pix_os_ref[idx]) / state.gain)
+               for idx in range(IMAGE_SIZE)]
+        largest[0] = 0
+        for sp_id in (0, 1):
+            subpage = Subpage(ChessPattern, sp_id)
+            reference.update(pix, subpage, state)
+            fixed.update(pix, subpage, state)
+        assert largest[0] < 2**30, temp
+        max_err, mean_err, worst, count = accuracy_report(fixed, reference)
+        assert count == IMAGE_SIZE
+        assert max_err <= MAX_ERROR, (temp, worst)
+        # Ksto, which the scenes leave out, only adds a little
+        assert temp*100 <= fixed.buf[0] < 32767
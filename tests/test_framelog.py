@@ -0,0 +1,58 @@
+import pytest
+
+from mlx90640.framelog import FrameLogWriter
+from mlx90640.calibration import NUM_ROWS, NUM_COLS
+from scenes import image
+
+framelog = pytest.importorskip('framelog')
+
+
+def test_round_trip(tmp_path):
+    path = str(tmp_path / 'frames.log')
+    images = [image({(5, num): 1000 + num}) for num in range(3)]
+    writer = FrameLogWriter(path)
+    for num, pix in enumerate(images):
+        assert writer.write(pix, num & 1, timestamp=100*num,
+                            positions=(num, -num))
+        # the writer keeps its own copy
+        pix[0] = -1
+    writer.close()
+
+    log = framelog.FrameLog(path)
+    assert (log.rows, log.cols) == (NUM_ROWS, NUM_COLS)
+    assert len(log) == 3
+    assert list(log.records['seq']) == [0, 1, 2]
+    assert list(log.timestamps) == [0, 100, 200]
+    assert list(log.records['subpage']) == [0, 1, 0]
+    assert list(log.records['yaw']) == [0, 1, 2]
+    assert list(log.records['pitch']) == [0, -1, -2]
+    for num, pix in enumerate(images):
+        pix[0] = 100
+        assert list(log.records['pix'][num]) == list(pix)
+        assert log.display_image(num)[5, num] == 1000 + num
+
+
+def test_full_ring_drops_images(tmp_path):
+    path = str(tmp_path / 'frames.log')
+    writer = FrameLogWriter(path, depth=2)
+    for num in range(3):
+        writer.write(image({}, background=num), 0, timestamp=num)
+    assert writer.dropped == 1
+    assert writer.drain(1) == 1
+    assert writer.write(image({}, background=3), 0, timestamp=3)
+    writer.close()
+
+    log = framelog.FrameLog(path)
+    assert list(log.records['seq']) == [0, 1, 3]
+    assert [int(log.image(num)[0, 0]) for num in range(3)] == [0, 1, 3]
+
+
+def test_truncated_log(tmp_path):
+    path = tmp_path / 'frames.log'
+    writer = FrameLogWriter(str(path))
+    for num in range(2):
+        writer.write(image({}), 0, timestamp=num)
+    writer.close()
+    data = path.read_bytes()
+    path.write_bytes(data[:-10])
+    assert len(framelog.FrameLog(str(path))) == 1
@@ -0,0 +1,72 @@
+import pytest
+
+from mlx90640.framering import FrameRing
+
+
+def capture(ring, value, timestamp=None):
+    # fill a frame as the capture task would and publish it
+    frame = ring.acquire_write()
+    assert frame is not None
+    for idx in range(len(frame.pix)):
+        frame.pix[idx] = value
+    ring.publish(frame, timestamp)
+    return frame
+
+
+@pytest.mark.parametrize('count', (2, 3, 4))
+def test_reader_keeps_its_frame_while_the_writer_wraps(count):
+    ring = FrameRing(count)
+    capture(ring, 1)
+    held = ring.acquire_read()
+    assert held.seq == 0
+
+    # the writer goes round the ring several times
+    for value in range(2, 4*count + 2):
+        frame = capture(ring, value)
+        assert frame is not held
+    assert set(held.pix) == {1}
+
+    newest = ring.acquire_read()
+    assert newest is not held
+    assert set(newest.pix) == {4*count + 1}
+    assert newest.seq == 4*count
+    ring.release(held)
+    ring.release(newest)
+
+
+def test_frames_come_out_in_order():
+    ring = FrameRing(3)
+    last_seq, last_time = -1, -1
+    for step in range(12):
+        capture(ring, step, timestamp=1000*step)
+        if step % 3:
+            # the reader skips a frame now and then, but never goes back
+            continue
+        frame = ring.acquire_read()
+        assert frame.seq > last_seq
+        assert frame.timestamp > last_time
+        assert frame.pix[0] == step
+        last_seq, last_time = frame.seq, frame.timestamp
+        ring.release(frame)
+    # a frame isn't read twice
+    frame = ring.acquire_read()
+    assert frame.seq == 11
+    ring.release(frame)
+    assert ring.acquire_read() is None
+
+
+def test_new_frame_starts_from_the_latest():
+    # a frame filled one subpage at a time keeps the other subpage's pixels
+    ring = FrameRing(2)
+    capture(ring, 7)
+    frame = ring.acquire_write()
+    assert set(frame.pix) == {7}
+    ring.release(frame)
+
+
+def test_default_timestamp_and_too_small_ring():
+    ring = FrameRing(2)
+    frame = capture(ring, 0)
+    assert frame.timestamp > 0
+    with pytest.raises(ValueError):
+        FrameRing(1)
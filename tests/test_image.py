@@ -0,0 +1,82 @@
+from fake_i2c import FakeI2C, CAMERA_ADDR
+from mlx90640.regmap import CameraInterface
+from mlx90640.calibration import IMAGE_SIZE, NUM_COLS
+from mlx90640.image import RawImage, ChessPattern, PIX_BURST_SIZE
+
+
+def camera_ram(i2c):
+    # the pixel RAM as signed values
+    return [word - 0x10000 if word & 0x8000 else word
+            for word in i2c.mem[0x0400:0x0400 + IMAGE_SIZE]]
+
+
+def test_read_in_bursts():
+    i2c = FakeI2C(seed=4)
+    image = RawImage()
+    image.read(CameraInterface(i2c, CAMERA_ADDR))
+    assert i2c.transactions == IMAGE_SIZE // PIX_BURST_SIZE
+    assert list(image.pix) == camera_ram(i2c)
+    assert image[5] == camera_ram(i2c)[5]
+
+
+def test_burst_size():
+    i2c = FakeI2C(seed=4)
+    image = RawImage(burst_size=100)
+    image.read(CameraInterface(i2c, CAMERA_ADDR))
+    assert i2c.transactions == 8
+    assert list(image.pix) == camera_ram(i2c)
+
+
+def test_read_one_subpage():
+    i2c = FakeI2C(seed=4)
+    image = RawImage()
+    image.read(CameraInterface(i2c, CAMERA_ADDR), ChessPattern.sp_range(1))
+    ram = camera_ram(i2c)
+    for idx in range(IMAGE_SIZE):
+        expected = ram[idx] if ChessPattern.get_sp(idx) == 1 else 0
+        assert image.pix[idx] == expected
+
+
+def test_shared_staging_buffer():
+    first_i2c, second_i2c = FakeI2C(seed=4), FakeI2C(seed=5)
+    first = RawImage()
+    second = RawImage(staging=first.staging)
+    assert second.staging is first.staging
+    first.read(CameraInterface(first_i2c, CAMERA_ADDR))
+    second.read(CameraInterface(second_i2c, CAMERA_ADDR))
+    assert list(first.pix) == camera_ram(first_i2c)
+    assert list(second.pix) == camera_ram(second_i2c)
+
+
+def window_pixels(image):
+    # the (row, col) of the pixels which were read, in sensor order
+    return {(idx // NUM_COLS, idx % NUM_COLS)
+            for idx in range(IMAGE_SIZE) if image.pix[idx]}
+
+
+def test_read_window_over_the_left_edge():
+    i2c = FakeI2C(seed=4)
+    image = RawImage()
+    image.read_window(CameraInterface(i2c, CAMERA_ADDR), 2, -3, 2, 8)
+    # only columns 0 to 4 of the window are on the sensor
+    assert window_pixels(image) == {(row, col) for row in (2, 3)
+                                    for col in range(5)}
+    ram = camera_ram(i2c)
+    assert image.pix[2*NUM_COLS + 4] == ram[2*NUM_COLS + 4]
+    assert i2c.transactions == 2
+
+
+def test_read_window_over_the_right_and_bottom_edges():
+    i2c = FakeI2C(seed=4)
+    image = RawImage()
+    image.read_window(CameraInterface(i2c, CAMERA_ADDR), 22, 28, 4, 8)
+    assert window_pixels(image) == {(row, col) for row in (22, 23)
+                                    for col in range(28, 32)}
+
+
+def test_read_window_off_the_sensor():
+    i2c = FakeI2C(seed=4)
+    image = RawImage()
+    image.read_window(CameraInterface(i2c, CAMERA_ADDR), 2, -8, 2, 8)
+    assert i2c.transactions == 0
+    assert not any(image.pix)
@@ -0,0 +1,51 @@
+from mlx90640 import indexmap
+from mlx90640.calibration import NUM_ROWS, NUM_COLS, IMAGE_SIZE
+from mlx90640.image import ChessPattern, InterleavedPattern
+
+
+def test_subpage_maps_split_the_image():
+    for pattern in (ChessPattern, InterleavedPattern):
+        sp_0 = indexmap.subpage_map(pattern, 0)
+        sp_1 = indexmap.subpage_map(pattern, 1)
+        assert len(sp_0) == len(sp_1) == IMAGE_SIZE // 2
+        assert sorted(list(sp_0) + list(sp_1)) == list(range(IMAGE_SIZE))
+        assert all(pattern.get_sp(idx) == 1 for idx in sp_1)
+        assert indexmap.subpage_map(pattern, 0) is sp_0
+
+
+def test_display_map_mirrors_rows():
+    idx_map = indexmap.display_map()
+    assert len(idx_map) == IMAGE_SIZE
+    assert idx_map[0] == NUM_COLS - 1
+    assert idx_map[NUM_COLS - 1] == 0
+    assert idx_map[NUM_COLS*5 + 3] == NUM_COLS*5 + NUM_COLS - 4
+    assert list(indexmap.display_map(4, 2)) == [3, 2, 1, 0, 7, 6, 5, 4]
+
+
+def test_window_map_is_clipped():
+    assert list(indexmap.window_map(1, 2, 2, 3)) == [
+        NUM_COLS + 2, NUM_COLS + 3, NUM_COLS + 4,
+        2*NUM_COLS + 2, 2*NUM_COLS + 3, 2*NUM_COLS + 4,
+    ]
+    corner = indexmap.window_map(NUM_ROWS - 1, NUM_COLS - 2, 4, 4)
+    assert list(corner) == [IMAGE_SIZE - 2, IMAGE_SIZE - 1]
+    assert list(indexmap.window_map(-2, -2, 3, 3)) == [0]
+    # the window keeps its size on the sensor when clipped at either edge
+    assert list(indexmap.window_map(2, -3, 1, 8)) == [
+        2*NUM_COLS + col for col in range(5)]
+    assert list(indexmap.window_map(2, NUM_COLS - 3, 1, 8)) == [
+        2*NUM_COLS + col for col in range(NUM_COLS - 3, NUM_COLS)]
+
+
+def test_window_map_of_one_subpage():
+    idx_map = indexmap.window_map(0, 0, 4, 4, ChessPattern, 1)
+    assert len(idx_map) == 8
+    assert all(ChessPattern.get_sp(idx) == 1 for idx in idx_map)
+
+
+def test_clear_cache():
+    idx_map = indexmap.display_map()
+    indexmap.clear_cache()
+    again = indexmap.display_map()
+    assert again is not idx_map
+    assert again == idx_map
@@ -0,0 +1,115 @@
+import random
+import re
+
+import pytest
+
+from mlx90640.calibration import NUM_ROWS, NUM_COLS
+from mlx90640.preview import Preview
+from scenes import image
+
+_ESCAPE = re.compile(rb'\x1b\[([0-9;]*)([A-Za-z])|( )')
+
+
+class Terminal:
+    """! Takes the place of stdout, keeping the writes and what they would
+    leave on an ANSI terminal.
+    """
+    def __init__(self):
+        self.writes = []
+        self.cells = {}
+        self.row, self.col, self.colour = 1, 1, None
+
+    def write(self, data):
+        data = bytes(data)
+        self.writes.append(data)
+        pos = 0
+        for match in _ESCAPE.finditer(data):
+            assert match.start() == pos, data[pos:match.start()]
+            pos = match.end()
+            params, command, space = match.groups()
+            if space:
+                self.cells[self.row, self.col] = self.colour
+                self.col += 1
+            elif command == b'H':
+                self.row, self.col = (int(n) for n in params.split(b';'))
+            elif command == b'J':
+                self.cells.clear()
+            elif command == b'm':
+                self.colour = (int(params.split(b';')[-1])
+                               if params.startswith(b'48;5;') else None)
+        assert pos == len(data)
+
+    def shade(self, row, col):
+        # the grey level of a pixel, which is drawn as two cells
+        left = self.cells.get((row + 1, 2*col + 1))
+        assert left == self.cells.get((row + 1, 2*col + 2))
+        return None if left is None else left - 232
+
+
+@pytest.fixture
+def terminal():
+    return Terminal()
+
+
+def preview(terminal, buf_size=4096):
+    shown = Preview(buf_size=buf_size)
+    shown._out = terminal
+    return shown
+
+
+def shades(pix):
+    # the grey level of each pixel, in display order
+    low, span = min(pix), max(pix) - min(pix) or 1
+    return [[(pix[row*NUM_COLS + NUM_COLS - 1 - col] - low)*23 // span
+             for col in range(NUM_COLS)] for row in range(NUM_ROWS)]
+
+
+def on_screen(terminal):
+    return [[terminal.shade(row, col) for col in range(NUM_COLS)]
+            for row in range(NUM_ROWS)]
+
+
+def test_first_frame_is_drawn_in_full(terminal):
+    pix = image({(row, col): 100 + 7*col + row for row in range(NUM_ROWS)
+                 for col in range(NUM_COLS)})
+    shown = preview(terminal)
+    assert shown.show(pix) == NUM_ROWS * NUM_COLS
+    assert terminal.writes[0].startswith(b'\x1b[2J')
+    assert on_screen(terminal) == shades(pix)
+    # the cursor is left below the image with the colours reset
+    assert terminal.writes[-1].endswith(b'\x1b[0m\x1b[25;1H')
+
+
+def test_later_frames_only_redraw_changes(terminal):
+    pix = image({(5, 5): 400, (20, 30): 0})
+    shown = preview(terminal)
+    shown.show(pix)
+    terminal.writes.clear()
+
+    assert shown.show(pix) == 0
+    assert b''.join(terminal.writes) == b'\x1b[0m\x1b[25;1H'
+
+    # a warm spot moves; the coldest and hottest pixels stay put
+    moved = image({(5, 5): 400, (20, 30): 0, (10, 11): 300, (10, 12): 300})
+    terminal.writes.clear()
+    assert shown.show(moved) == 2
+    assert on_screen(terminal) == shades(moved)
+    assert len(b''.join(terminal.writes)) < 50
+
+
+@pytest.mark.parametrize('buf_size', (4096, 200, 44))
+def test_buffer_never_overflows(terminal, buf_size):
+    # random frames need a cursor move and colour for nearly every cell,
+    # the most bytes per cell there can be
+    rnd = random.Random(buf_size)
+    shown = preview(terminal, buf_size)
+    size = len(shown._buf)
+    for _ in range(4):
+        pix = image({(row, col): rnd.randrange(1000)
+                     for row in range(NUM_ROWS) for col in range(NUM_COLS)
+                     if rnd.random() < 0.5})
+        shown.show(pix)
+        assert on_screen(terminal) == shades(pix)
+        assert len(shown._buf) == size
+        assert max(len(data) for data in terminal.writes) <= size
+    assert len(terminal.writes) > 4
@@ -0,0 +1,106 @@
+import pytest
+
+from fake_i2c import FakeI2C, CAMERA_ADDR
+from mlx90640.regmap import (
+    REGISTER_MAP,
+    EEPROM_MAP,
+    VOLATILE_REGISTERS,
+    EEPROM_ADDRESS,
+    RegisterMap,
+    CameraInterface,
+    ReadOnlyError,
+)
+from mlx90640.calibration import read_eeprom
+
+
+class FailingInterface(CameraInterface):
+    # a bus on which every write fails
+    def write(self, mem_addr, buf):
+        raise OSError(5)
+
+
+@pytest.fixture
+def i2c():
+    return FakeI2C()
+
+
+@pytest.fixture
+def registers(i2c):
+    return RegisterMap(CameraInterface(i2c, CAMERA_ADDR), REGISTER_MAP,
+                       volatile=VOLATILE_REGISTERS)
+
+
+def test_reads_are_cached(i2c, registers):
+    assert registers['refresh_rate'] == 2
+    assert registers['adc_resolution'] == 2
+    assert registers['refresh_rate'] == 2
+    # one read of control register 1 for both fields
+    assert i2c.transactions == 1
+    # a change behind the driver's back isn't seen until invalidated
+    i2c.mem[0x800D] = 0x1981
+    assert registers['refresh_rate'] == 2
+    registers.invalidate('adc_resolution')
+    assert registers['refresh_rate'] == 3
+    i2c.mem[0x800D] = 0x1901
+    registers.invalidate()
+    assert registers['refresh_rate'] == 2
+
+
+def test_volatile_registers_always_hit_the_bus(i2c, registers):
+    assert 0x8000 in VOLATILE_REGISTERS
+    for _ in range(3):
+        registers['last_subpage']
+    assert i2c.transactions == 3
+    i2c.mem[0x0700] = 0x1234
+    assert registers['ta_vbe'] == 0x1234
+    i2c.mem[0x0700] = 0xFFFE
+    assert registers['ta_vbe'] == -2
+
+
+def test_write_updates_the_shadow(i2c, registers):
+    registers['refresh_rate'] = 5
+    assert i2c.mem[0x800D] == 0x1901 & ~0x0380 | 5 << 7
+    before = i2c.transactions
+    # the other fields of the register are kept, and nothing is reread
+    assert registers['refresh_rate'] == 5
+    assert registers['adc_resolution'] == 2
+    assert registers['subpage_enable'] == 1
+    assert i2c.transactions == before
+
+
+def test_failed_write_drops_the_shadow(i2c):
+    registers = RegisterMap(FailingInterface(i2c, CAMERA_ADDR), REGISTER_MAP)
+    assert registers['refresh_rate'] == 2
+    with pytest.raises(OSError):
+        registers['refresh_rate'] = 6
+    # the camera didn't take the new value, so it's read again
+    before = i2c.transactions
+    assert registers['refresh_rate'] == 2
+    assert i2c.transactions == before + 1
+
+
+def test_load_seeds_the_shadow(i2c):
+    eeprom = RegisterMap(CameraInterface(i2c, CAMERA_ADDR), EEPROM_MAP,
+                         readonly=True)
+    data = read_eeprom(CameraInterface(i2c, CAMERA_ADDR))
+    before = i2c.transactions
+    eeprom.load(EEPROM_ADDRESS, data)
+    assert eeprom['device_id_1'] == i2c.mem[0x2407]
+    # fields sharing a register come from the same copy
+    word = i2c.mem[0x2433]
+    assert eeprom['vdd_25'] == word >> 8
+    assert eeprom['k_vdd'] == (word & 0xFF) - (0x100 if word & 0x80 else 0)
+    assert eeprom['res_ctrl_cal'] == (i2c.mem[0x2438] >> 12) & 0x3
+    assert i2c.transactions == before
+    # registers outside the dump are still read from the camera
+    eeprom.load(EEPROM_ADDRESS + 0x30, data[:4])
+    assert eeprom['device_id_1'] == i2c.mem[0x2407]
+    assert i2c.transactions == before
+
+
+def test_readonly_map(i2c):
+    eeprom = RegisterMap(CameraInterface(i2c, CAMERA_ADDR), EEPROM_MAP,
+                         readonly=True)
+    with pytest.raises(ReadOnlyError):
+        eeprom['device_id_1'] = 0
+    assert i2c.transactions == 0
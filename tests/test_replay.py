@@ -0,0 +1,46 @@
+import sys
+
+import pytest
+
+import mlx90640
+from mlx90640 import calibration, targeting
+from mlx90640.framelog import FrameLogWriter
+from scenes import image, block
+
+framelog = pytest.importorskip('framelog')
+replay = pytest.importorskip('replay')
+
+
+def test_loading_leaves_the_driver_package_alone():
+    names = ('mlx90640', 'mlx90640.calibration', 'mlx90640.targeting')
+    before = {name: sys.modules[name] for name in names}
+    missing = 'mlx90640.aiming' not in sys.modules
+
+    modules = replay.load_targeting(4, 8)
+    assert {name: sys.modules[name] for name in names} == before
+    assert ('mlx90640.aiming' not in sys.modules) == missing
+    # the loaded modules are separate copies at the given image size
+    assert modules['targeting'] is not targeting
+    assert modules['blobs'].IMAGE_SIZE == 32
+    assert calibration.IMAGE_SIZE == 768
+    assert mlx90640.calibration is calibration
+
+
+def test_replay_follows_a_target(tmp_path):
+    path = str(tmp_path / 'frames.log')
+    writer = FrameLogWriter(path)
+    for num in range(4):
+        spots = block(11, 9 + num, 3, 3, 600)
+        spots[12, 10 + num] = 1000
+        writer.write(image(spots), num & 1, timestamp=200*num,
+                     positions=(500, -20))
+    writer.close()
+
+    results = list(replay.replay(framelog.FrameLog(path)))
+    assert [res[0] for res in results] == [0, 1, 2, 3]
+    for num, (seq, stamp, blobs, row, col, yaw, pitch, accepted,
+              yaw_sp, pitch_sp) in enumerate(results):
+        assert (stamp, row, col) == (200*num, 12, 10 + num)
+        assert (yaw, pitch, accepted) == (500, -20, True)
+    # the target moves right, so the yaw setpoint keeps going down
+    assert results[3][8] < results[2][8] < results[1][8]
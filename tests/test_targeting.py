@@ -0,0 +1,43 @@
+from mlx90640.targeting import find_hotspot, refine_hotspot, SUBPIXEL_SCALE
+from scenes import image
+
+
+def test_flat_image_has_no_hotspot():
+    hotspot = find_hotspot(image({}))
+    assert (hotspot.row, hotspot.score) == (0, 0)
+    assert refine_hotspot(image({}), hotspot) == (0, hotspot.col*SUBPIXEL_SCALE)
+
+
+def test_hotspot_in_display_coordinates():
+    pix = image({(7, 5): 400, (7, 4): 200, (7, 6): 200})
+    hotspot = find_hotspot(pix)
+    assert (hotspot.row, hotspot.col) == (7, 5)
+    assert hotspot.score == 800
+    assert (hotspot.min_h, hotspot.max_h) == (100, 400)
+
+
+def test_border_is_ignored():
+    pix = image({(0, 10): 900, (22, 10): 900, (5, 0): 900, (9, 12): 300})
+    hotspot = find_hotspot(pix)
+    assert (hotspot.row, hotspot.col) == (9, 12)
+
+
+def test_refine_symmetric_spot():
+    pix = image({(10, 20): 500})
+    assert refine_hotspot(pix, find_hotspot(pix)) == (
+        10*SUBPIXEL_SCALE, 20*SUBPIXEL_SCALE)
+
+
+def test_refine_leans_to_warmer_neighbours():
+    pix = image({(10, 20): 500, (10, 21): 300, (11, 20): 200})
+    row, col = refine_hotspot(pix, find_hotspot(pix))
+    assert 10*SUBPIXEL_SCALE < row < 10*SUBPIXEL_SCALE + SUBPIXEL_SCALE//2
+    assert 20*SUBPIXEL_SCALE < col <= 20*SUBPIXEL_SCALE + SUBPIXEL_SCALE//2
+
+
+def test_refine_offset_is_clamped():
+    # a neighbour hotter than the centre puts the vertex beyond half a pixel
+    pix = image({(10, 20): 500, (10, 21): 600})
+    hotspot = find_hotspot(pix)._replace(row=10, col=20)
+    row, col = refine_hotspot(pix, hotspot)
+    assert col == 20*SUBPIXEL_SCALE + SUBPIXEL_SCALE//2
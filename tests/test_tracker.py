@@ -0,0 +1,65 @@
+import pytest
+
+from mlx90640.tracker import Tracker
+
+
+def test_first_detection_starts_tracking():
+    tracker = Tracker()
+    assert tracker.update(10, 20, 1000)
+    assert tracker.valid
+    assert tracker.predict(2000) == (10, 20)
+
+
+def test_learns_constant_velocity():
+    tracker = Tracker(gate=(50, 50))
+    for step in range(40):
+        assert tracker.update(100 + 3*step, 50 - step, 100*step)
+    x, y = tracker.predict(100*39 + 500)
+    assert x == pytest.approx(100 + 3*39 + 15, abs=0.5)
+    assert y == pytest.approx(50 - 39 - 5, abs=0.5)
+
+
+def test_two_detections_give_a_velocity():
+    tracker = Tracker(gate=(50, 50))
+    tracker.update(100, 50, 0)
+    assert tracker.updates == 1
+    assert tracker.update(103, 49, 500)
+    assert tracker.updates == 2
+    assert tracker.predict(1000) == pytest.approx((106, 48))
+    assert not tracker.update(300, 48, 1000)
+    assert tracker.updates == 2
+    tracker.reset()
+    assert tracker.updates == 0
+
+
+def test_gate_rejects_then_restarts():
+    tracker = Tracker(gate=(4, 4), max_misses=2)
+    tracker.update(0, 0, 0)
+    assert not tracker.update(30, 0, 100)
+    assert not tracker.update(30, 0, 200)
+    assert tracker.misses == 2
+    assert (tracker.x, tracker.y) == (0, 0)
+    # too many misses in a row; the next detection is a new target
+    assert tracker.update(30, 0, 300)
+    assert (tracker.x, tracker.y, tracker.vx) == (30, 0, 0)
+    assert tracker.misses == 0
+    assert tracker.updates == 1
+
+
+def test_shift_and_reset():
+    tracker = Tracker()
+    tracker.update(10, 20, 0)
+    tracker.shift(-4, 5)
+    assert tracker.predict(0) == (6, 25)
+    tracker.reset()
+    assert tracker.update(100, 100, 10)
+    assert tracker.predict(10) == (100, 100)
+
+
+def test_times_wrap():
+    tracker = Tracker(gate=(50, 50))
+    start = 0x3FFFFFFF - 250
+    for step in range(10):
+        when = (start + 100*step) & 0x3FFFFFFF
+        assert tracker.update(2*step, 0, when)
+    assert tracker.vx > 0
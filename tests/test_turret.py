@@ -0,0 +1,199 @@
+import pytest
+
+import main
+import cotask
+import task_share
+from fake_timer import FakeTimer, ScheduleQueue
+from mlx90640.aiming import pixel_to_ticks, AIM_LEAD_MS, TRACKER_GATE
+from mlx90640.background import BackgroundModel
+from mlx90640.blobs import BlobDetector
+from mlx90640.targeting import SUBPIXEL_SCALE
+from mlx90640.tracker import Tracker
+from scenes import image, block
+
+
+class FakeEncoder:
+    def __init__(self):
+        self.position = 0
+
+    def zero(self):
+        self.position = 0
+
+
+class FakeController:
+    def __init__(self):
+        self.encoder = FakeEncoder()
+        self.setpoint = 0
+        self.runs = 0
+
+    def run(self):
+        self.runs += 1
+
+    def set_setpoint(self, setpoint):
+        self.setpoint = setpoint
+
+
+class FakeImage:
+    def __init__(self, pix):
+        self.pix = pix
+
+
+class FakeCamera:
+    """! Gives the same images as @c MLX_Cam.get_image_nonblocking(), each
+    @c period_ms after the last, waiting once for each.
+    """
+    def __init__(self, clock, images, period_ms=200):
+        self.clock = clock
+        self.images = images
+        self.period_ms = period_ms
+        self.reads = 0
+
+    def get_image_nonblocking(self):
+        yield
+        self.clock[0] += self.period_ms
+        pix = self.images[min(self.reads, len(self.images) - 1)]
+        self.reads += 1
+        return FakeImage(pix)
+
+
+@pytest.fixture
+def turret(monkeypatch):
+    """! The globals which main.py's tasks use, with stand-in motors.
+    """
+    monkeypatch.setattr(main, 'controller1', FakeController(), raising=False)
+    monkeypatch.setattr(main, 'controller2', FakeController(), raising=False)
+    monkeypatch.setattr(main, 'button_count', 1, raising=False)
+    monkeypatch.setattr(main, 'drive', task_share.Share(
+        'B', thread_protect=False, name="Drive"), raising=False)
+    return main
+
+
+def test_control_runs_the_motors_in_drive(turret, monkeypatch):
+    scheduled = ScheduleQueue()
+    monkeypatch.setattr(cotask.micropython, 'schedule', scheduled.schedule)
+    timer = FakeTimer()
+    control = cotask.TimerTask(main.control_motors, timer=timer, freq=50,
+                               shares=(main.drive,))
+    control.start()
+    pitch, yaw = main.controller1, main.controller2
+
+    for bits, runs in ((0, (0, 0)),
+                       (main.DRIVE_PITCH | main.DRIVE_YAW, (1, 1)),
+                       (main.DRIVE_PITCH, (2, 1)),
+                       (main.DRIVE_YAW, (2, 2))):
+        main.drive.put(bits)
+        timer.tick()
+        scheduled.run()
+        assert (pitch.runs, yaw.runs) == runs
+
+    # paused with the button
+    main.button_count = 0
+    main.drive.put(main.DRIVE_PITCH | main.DRIVE_YAW)
+    timer.tick()
+    scheduled.run()
+    assert (pitch.runs, yaw.runs) == (2, 2)
+
+
+def test_motor_tasks_hand_back_the_drive(turret):
+    state = task_share.Share('h', thread_protect=False, name="State")
+    reached = task_share.Queue('h', 4, thread_protect=False, name="Reached")
+    yaw_task = main.move_yaw_motor((state, reached))
+    pitch_task = main.move_pitch_motor((state, reached))
+    state.put(3)
+    main.drive.put(main.DRIVE_PITCH | main.DRIVE_YAW)
+    main.controller1.setpoint = 50000
+    main.controller2.setpoint = 2000
+
+    next(yaw_task)
+    next(pitch_task)
+    assert main.drive.get() == main.DRIVE_PITCH | main.DRIVE_YAW
+
+    # the yaw motor gets there first; only the pitch motor is still driven
+    main.controller2.encoder.position = 2050
+    next(yaw_task)
+    assert main.drive.get() == main.DRIVE_PITCH
+    assert reached.any()
+
+    main.controller1.encoder.position = 45000
+    next(pitch_task)
+    assert main.drive.get() == 0
+    assert state.get() == 4
+
+
+def moving_target(monkeypatch, turret, cols, still=None):
+    # a warm 3x3 target with its peak on row 12 and each of cols in turn,
+    # in front of the given spots which stay put
+    clock = [1000]
+    monkeypatch.setattr(main.time, 'ticks_ms', lambda: clock[0])
+    images = []
+    for col in cols:
+        spots = dict(still or {})
+        spots.update(block(11, col - 1, 3, 3, 600))
+        spots[12, col] = 1000
+        images.append(image(spots))
+    camera = FakeCamera(clock, images)
+    monkeypatch.setattr(main, 'camera', camera, raising=False)
+    monkeypatch.setattr(main, 'blobs', BlobDetector(), raising=False)
+    monkeypatch.setattr(main, 'background', BackgroundModel(), raising=False)
+    monkeypatch.setattr(main, 'tracker', Tracker(gate=TRACKER_GATE),
+                        raising=False)
+    return camera
+
+
+def run_get_coordinates(turret):
+    state = task_share.Share('h', thread_protect=False, name="State")
+    reached = task_share.Queue('h', 4, thread_protect=False, name="Reached")
+    task = main.get_coordinates((state, reached))
+    state.put(2)
+    for _ in range(50):
+        next(task)
+        if state.get() == 3:
+            break
+    return state.get()
+
+
+def test_get_coordinates_leads_a_moving_target(turret, monkeypatch):
+    camera = moving_target(monkeypatch, turret, (10, 11, 12))
+    turret.controller2.encoder.position = 300
+    turret.controller1.encoder.position = -50
+
+    assert run_get_coordinates(turret) == 3
+    # two images are enough to see which way the target moves
+    assert camera.reads == 2
+    assert turret.tracker.updates == 2
+    row = 12*SUBPIXEL_SCALE
+    first = pixel_to_ticks(row, 10*SUBPIXEL_SCALE)
+    second = pixel_to_ticks(row, 11*SUBPIXEL_SCALE)
+    lead = AIM_LEAD_MS / camera.period_ms
+    # the setpoints are encoder positions, and the encoders are left alone
+    assert turret.controller2.setpoint == pytest.approx(
+        300 + second[0] + lead*(second[0] - first[0]), abs=1)
+    assert turret.controller1.setpoint == -50 + second[1]
+    assert turret.controller2.encoder.position == 300
+    assert turret.drive.get() == turret.DRIVE_PITCH | turret.DRIVE_YAW
+
+
+def test_get_coordinates_gives_up_waiting_for_updates(turret, monkeypatch):
+    camera = moving_target(monkeypatch, turret, (10,))
+    monkeypatch.setattr(main, 'AIM_MIN_UPDATES', 100)
+    assert run_get_coordinates(turret) == 3
+    assert camera.reads == main.AIM_MAX_IMAGES
+    assert turret.controller2.setpoint == pixel_to_ticks(
+        12*SUBPIXEL_SCALE, 10*SUBPIXEL_SCALE)[0]
+
+
+def test_get_coordinates_passes_over_a_still_heat_source(turret, monkeypatch):
+    # a lamp, bigger and hotter than the target, is all the first image
+    # shows; the target is found once it has moved and tracked from there
+    lamp = block(2, 24, 4, 4, 2000)
+    camera = moving_target(monkeypatch, turret, range(10, 20), still=lamp)
+
+    assert run_get_coordinates(turret) == 3
+    assert camera.reads < main.AIM_MAX_IMAGES
+    assert turret.tracker.updates == 2
+    row = 12*SUBPIXEL_SCALE
+    seen = pixel_to_ticks(row, (9 + camera.reads)*SUBPIXEL_SCALE)
+    # the lead is 2.5 images' worth of movement
+    ahead = pixel_to_ticks(row, (12 + camera.reads)*SUBPIXEL_SCALE)
+    assert ahead[0] < turret.controller2.setpoint < seen[0]
+    assert turret.controller1.setpoint == seen[1]
@@ -0,0 +1,60 @@
+import pytest
+
+from mlx90640.utils import (
+    FD_BYTE,
+    FD_WORD,
+    field_desc,
+    FieldAccessor,
+    StructProto,
+    Struct,
+)
+
+
+def word(buf):
+    return (buf[0] << 8) | buf[1]
+
+
+def test_bit_field_leaves_the_rest_alone():
+    field = FieldAccessor(field_desc('rate', 3, 7))
+    buf = bytearray(b'\x19\x01')
+    assert field.get(buf) == 2
+    field.set(buf, 5)
+    assert field.get(buf) == 5
+    assert word(buf) == 0x1901 & ~0x0380 | 0x0280
+    # values too big for the field are cut to fit
+    field.set(buf, 0xF)
+    assert field.get(buf) == 7
+    assert word(buf) & ~0x0380 == 0x1901 & ~0x0380
+
+
+@pytest.mark.parametrize('value', (-32, -1, 0, 1, 31))
+def test_signed_bit_field(value):
+    field = FieldAccessor(field_desc('c2', 6, 4, signed=True))
+    buf = bytearray(b'\xFF\xFF')
+    field.set(buf, value)
+    assert field.get(buf) == value
+    assert word(buf) & 0xFC0F == 0xFC0F
+
+
+def test_words_and_bytes():
+    buf = bytearray(b'\xFF\x85')
+    assert FieldAccessor(field_desc('w', FD_WORD)).get(buf) == 0xFF85
+    assert FieldAccessor(field_desc('w', FD_WORD, signed=True)).get(buf) == -123
+    # byte 0 is the high byte
+    high = FieldAccessor(field_desc('hi', FD_BYTE, 0, signed=True))
+    low = FieldAccessor(field_desc('lo', FD_BYTE, 1))
+    assert (high.get(buf), low.get(buf)) == (-1, 0x85)
+    high.set(buf, -128)
+    low.set(buf, 0x12)
+    assert bytes(buf) == b'\x80\x12'
+
+
+def test_struct():
+    proto = StructProto((field_desc('a', 4, 12), field_desc('b', 12, 0,
+                                                              signed=True)))
+    buf = bytearray(2)
+    data = Struct(buf, proto)
+    data['a'] = 9
+    data['b'] = -2
+    assert bytes(buf) == b'\x9F\xFE'
+    assert (data['a'], data['b']) == (9, -2)
@@ -0,0 +1,97 @@
+"""!
+@file framelog.py
+This file contains a reader for MLX90640 frame logs, to be run on a PC.
+
+Logs are recorded on the board with @c MLX_Cam.start_log(); see
+@c src/mlx90640/framelog.py for the format. The file is memory-mapped with
+NumPy, so even long logs open instantly and records are only read from disk
+when they are used.
+
+@code
+log = FrameLog("duel.log")
+print(len(log), log.timestamps[:10])
+image = log.image(0)          # 24 x 32 int16, sensor orientation
+view = log.display_image(0)   # mirrored, as the turret code sees it
+@endcode
+"""
+
+import numpy as np
+
+LOG_MAGIC = b'MLXF'
+LOG_VERSION = 1
+
+HEADER_DTYPE = np.dtype([
+    ('magic', 'S4'),
+    ('version', '<u2'),
+    ('rows', '<u2'),
+    ('cols', '<u2'),
+    ('record_header', '<u2'),
+])
+
+
+def record_dtype(rows, cols):
+    """! The NumPy dtype of one record in a log of @c rows x @c cols images.
+    """
+    return np.dtype([
+        ('seq', '<u4'),
+        ('timestamp', '<u4'),
+        ('subpage', 'u1'),
+        ('flags', 'u1'),
+        ('pad', 'V2'),
+        ('yaw', '<i4'),
+        ('pitch', '<i4'),
+        ('pix', '<i2', (rows * cols,)),
+    ])
+
+
+class FrameLog:
+    def __init__(self, path):
+        """!
+        @param path A frame log file written by the board
+        """
+        header = np.fromfile(path, dtype=HEADER_DTYPE, count=1)
+        if len(header) != 1 or header['magic'][0] != LOG_MAGIC:
+            raise ValueError(f"{path} is not a frame log")
+        if header['version'][0] != LOG_VERSION:
+            raise ValueError(f"{path}: unsupported version {header['version'][0]}")
+
+        ## Image size in pixels
+        self.rows = int(header['rows'][0])
+        self.cols = int(header['cols'][0])
+
+        dtype = record_dtype(self.rows, self.cols)
+        if dtype.itemsize - self.rows*self.cols*2 != header['record_header'][0]:
+            raise ValueError(f"{path}: unexpected record header size")
+
+        # a log cut short by a reset may end in a partial record; leave it out
+        size = np.memmap(path, dtype='u1', mode='r').size - HEADER_DTYPE.itemsize
+        count = size // dtype.itemsize
+        ## All complete records, as a memory-mapped structured array
+        self.records = np.memmap(path, dtype=dtype, mode='r',
+                                 offset=HEADER_DTYPE.itemsize, shape=(count,))
+
+    def __len__(self):
+        return len(self.records)
+
+    @property
+    def timestamps(self):
+        """! Capture times in milliseconds (@c ticks_ms on the board).
+        """
+        return self.records['timestamp']
+
+    @property
+    def pixels(self):
+        """! All images as an (N, rows, cols) array in sensor orientation.
+        """
+        return self.records['pix'].reshape(-1, self.rows, self.cols)
+
+    def image(self, idx):
+        """! One image as a (rows, cols) array in sensor orientation.
+        """
+        return self.records['pix'][idx].reshape(self.rows, self.cols)
+
+    def display_image(self, idx):
+        """! One image with each row mirrored, as shown by @c MLX_Cam and as
+        used for row and column numbers by the targeting code.
+        """
+        return self.image(idx)[:, ::-1]
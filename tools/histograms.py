@@ -0,0 +1,112 @@
+"""!
+@file histograms.py
+This file contains a reader for the task run time and lateness histograms
+written on the board by @c cotask.task_list.write_histograms(), to be run on a
+PC.
+
+Each histogram counts times in log-scaled buckets: bucket 0 counts times of
+0 microseconds and bucket @c b counts times from 2**(b-1) up to 2**b
+microseconds, with the last bucket also counting everything longer. Given
+one file, the percentiles of each histogram are printed; given two, such as
+before and after a change, the percentiles which have moved are shown side
+by side.
+
+Usage:
+@code
+python tools/histograms.py duel.hist
+python tools/histograms.py before.hist after.hist
+@endcode
+"""
+
+import argparse
+import struct
+from array import array
+
+HIST_HEADER_FMT = '<4sBBB'
+HIST_MAGIC = b'CTHS'
+HIST_VERSION = 1
+
+PERCENTILES = (50, 90, 99, 99.9)
+
+
+def read_histograms(path):
+    """! Read a histogram file.
+    @returns A dict of (task name, 'run' or 'late') to a list of counts
+    """
+    with open(path, 'rb') as file:
+        data = file.read()
+    magic, version, buckets, tasks = struct.unpack_from(HIST_HEADER_FMT, data)
+    if magic != HIST_MAGIC:
+        raise ValueError(f"{path} is not a histogram file")
+    if version != HIST_VERSION:
+        raise ValueError(f"{path}: unsupported version {version}")
+
+    hists = {}
+    pos = struct.calcsize(HIST_HEADER_FMT)
+    for _ in range(tasks):
+        length = data[pos]
+        name = data[pos + 1:pos + 1 + length].decode()
+        pos += 1 + length
+        for kind in ('run', 'late'):
+            counts = array('I')
+            counts.frombytes(data[pos:pos + 4*buckets])
+            if counts.itemsize != 4:
+                raise RuntimeError("array('I') isn't 32 bits here")
+            hists[name, kind] = counts.tolist()
+            pos += 4*buckets
+    return hists
+
+
+def percentile(counts, percent):
+    """! The upper limit in microseconds of the bucket which holds a given
+    percentile, as on the board; @c None if there are no counts, infinity
+    for the last bucket.
+    """
+    total = sum(counts)
+    if not total:
+        return None
+    running = 0
+    for bucket, count in enumerate(counts):
+        running += count
+        if running * 100 >= total * percent:
+            break
+    if bucket == len(counts) - 1:
+        return float('inf')
+    return 1 << bucket
+
+
+def _fmt(limit):
+    if limit is None:
+        return '-'
+    return '<' + str(limit) if limit != float('inf') else 'more'
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Show task histograms recorded on the board.")
+    parser.add_argument('file', help="histogram file")
+    parser.add_argument('other', nargs='?',
+                        help="second file to compare the first with")
+    args = parser.parse_args()
+
+    first = read_histograms(args.file)
+    second = read_histograms(args.other) if args.other else None
+    header = ''.join(f"{'P' + str(pct):>14s}" for pct in PERCENTILES)
+    print(f"{'TASK':<16s}{'':5s}{header}  (us)")
+    for (name, kind), counts in first.items():
+        if not sum(counts) and not (second and sum(second.get((name, kind), ()))):
+            continue
+        line = f"{name:<16s}{kind:<5s}"
+        for pct in PERCENTILES:
+            old = percentile(counts, pct)
+            cell = _fmt(old)
+            if second is not None:
+                new = percentile(second.get((name, kind), ()), pct)
+                if new != old:
+                    cell += '->' + _fmt(new)
+            line += f"{cell:>14s}"
+        print(line)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,188 @@
+"""!
+@file replay.py
+This file contains a replay driver which runs MLX90640 frame logs through the
+turret's targeting code on a PC.
+
+The targeting modules are loaded straight from @c src/mlx90640 by file path,
+so what runs here is exactly the code which runs on the board. The few
+MicroPython modules they use are given CPython stand-ins. Each logged image
+goes through the same steps as @c get_coordinates() in @c main.py: blob
+detection, falling back to the hotspot search, sub-pixel refinement, and
+aiming with @c mlx90640.aiming.aim(), which tracks the target in encoder ticks
+from the encoder positions logged with each image. Times come from the log,
+not the clock, so a replay always gives the same results and can be compared
+against a previous run.
+
+Usage:
+@code
+python tools/replay.py duel.log > targets.csv
+python tools/replay.py --profile duel.log
+@endcode
+"""
+
+import argparse
+import builtins
+import collections
+import importlib.util
+import os
+import sys
+import time
+import types
+
+from framelog import FrameLog
+
+SRC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                       os.pardir, 'src', 'mlx90640')
+
+# modules loaded from the source tree, in dependency order
+TARGETING_MODULES = ('targeting', 'blobs', 'tracker', 'aiming')
+
+# the names in sys.modules which loading them takes over
+_PACKAGE_MODULES = ('mlx90640', 'mlx90640.calibration', 'mlx90640.utils') + \
+    tuple('mlx90640.' + name for name in TARGETING_MODULES)
+
+
+def _install_stand_ins(rows, cols):
+    """! Provide the MicroPython names which the targeting modules use.
+    """
+    builtins.const = lambda value: value
+    sys.modules.setdefault('ucollections', collections)
+
+    micropython = types.ModuleType('micropython')
+    micropython.native = lambda func: func
+    sys.modules.setdefault('micropython', micropython)
+
+    utime = types.ModuleType('utime')
+    utime.ticks_ms = lambda: int(time.monotonic() * 1000) & 0x3FFFFFFF
+    utime.ticks_add = lambda ticks, delta: (ticks + delta) & 0x3FFFFFFF
+    utime.ticks_diff = (
+        lambda end, start: ((end - start + 0x20000000) & 0x3FFFFFFF) - 0x20000000
+    )
+    sys.modules.setdefault('utime', utime)
+
+    # the targeting code takes the image size and one helper from the
+    # driver package; these stand-ins give it the log's image size without
+    # loading the rest of the driver
+    package = types.ModuleType('mlx90640')
+    package.__path__ = []
+    calibration = types.ModuleType('mlx90640.calibration')
+    calibration.NUM_ROWS = rows
+    calibration.NUM_COLS = cols
+    calibration.IMAGE_SIZE = rows * cols
+    utils = types.ModuleType('mlx90640.utils')
+    utils.array_filled = _array_filled
+    sys.modules['mlx90640'] = package
+    sys.modules['mlx90640.calibration'] = calibration
+    sys.modules['mlx90640.utils'] = utils
+
+
+def _array_filled(typecode, length, fill=0):
+    from array import array
+    return array(typecode, (fill for i in range(length)))
+
+
+def load_targeting(rows, cols):
+    """! Load the targeting modules from the source tree.
+    @returns A dict of module name to module
+    """
+    # the stand-ins and the modules loaded here are only registered while
+    # loading, so that a real mlx90640 package, such as the one the tests
+    # import, is left as it was
+    saved = {name: sys.modules.get(name) for name in _PACKAGE_MODULES}
+    modules = {}
+    try:
+        _install_stand_ins(rows, cols)
+        for name in TARGETING_MODULES:
+            full_name = 'mlx90640.' + name
+            spec = importlib.util.spec_from_file_location(
+                full_name, os.path.join(SRC_DIR, name + '.py'))
+            module = importlib.util.module_from_spec(spec)
+            sys.modules[full_name] = module
+            spec.loader.exec_module(module)
+            modules[name] = module
+    finally:
+        for name, module in saved.items():
+            if module is None:
+                sys.modules.pop(name, None)
+            else:
+                sys.modules[name] = module
+    return modules
+
+
+def replay(log, lead_ms=None, profile=None):
+    """! Run every image in a log through the targeting steps.
+    @param lead_ms How far ahead the tracker predicts, by default
+           @c AIM_LEAD_MS as on the board
+    @param profile A dict to add the time taken by each step to, in seconds,
+           or @c None
+    @returns A generator of tuples (seq, timestamp, blobs, row, col, yaw,
+             pitch, accepted, yaw setpoint, pitch setpoint): the target in
+             pixels, the logged encoder positions and the setpoints the
+             board would have given the motors, in ticks
+    """
+    from array import array
+    mods = load_targeting(log.rows, log.cols)
+    targeting, blobs_mod, tracker_mod, aiming = (
+        mods['targeting'], mods['blobs'], mods['tracker'], mods['aiming'])
+    if lead_ms is None:
+        lead_ms = aiming.AIM_LEAD_MS
+    scale = targeting.SUBPIXEL_SCALE
+    blobs = blobs_mod.BlobDetector()
+    tracker = tracker_mod.Tracker(gate=aiming.TRACKER_GATE)
+    timer = time.perf_counter
+
+    for record in log.records:
+        pix = array('h', record['pix'].tobytes())
+        stamp = int(record['timestamp'])
+        position = (int(record['yaw']), int(record['pitch']))
+
+        start = timer()
+        count = blobs.detect(pix)
+        hotspot = blobs.target(pix)
+        found = timer()
+        row, col = targeting.refine_hotspot(pix, hotspot)
+        refined = timer()
+        yaw, pitch, accepted = aiming.aim(tracker, row, col, stamp, position,
+                                          lead_ms)
+        tracked = timer()
+
+        if profile is not None:
+            for step, took in (('detect', found - start),
+                               ('refine', refined - found),
+                               ('aim', tracked - refined)):
+                profile[step] = profile.get(step, 0.0) + took
+
+        yield (int(record['seq']), stamp, count, row / scale, col / scale,
+               position[0], position[1], accepted, yaw, pitch)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Run a frame log through the turret targeting code.")
+    parser.add_argument('log', help="frame log recorded on the board")
+    parser.add_argument('--lead-ms', type=int, default=None,
+                        help="tracker prediction lead (default AIM_LEAD_MS)")
+    parser.add_argument('--profile', action='store_true',
+                        help="print the time per step instead of targets")
+    args = parser.parse_args()
+
+    log = FrameLog(args.log)
+    profile = {} if args.profile else None
+    results = replay(log, lead_ms=args.lead_ms, profile=profile)
+    if profile is None:
+        print("seq,timestamp,blobs,row,col,yaw,pitch,accepted,"
+              "yaw_setpoint,pitch_setpoint")
+        for res in results:
+            print(",".join(
+                f"{val:.3f}" if isinstance(val, float) else str(int(val))
+                for val in res
+            ))
+    else:
+        for _ in results:
+            pass
+        for step, took in profile.items():
+            print(f"{step:8s} {took / max(1, len(log)) * 1e6:9.1f} us/frame")
+
+
+if __name__ == '__main__':
+    main()